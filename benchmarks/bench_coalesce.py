@@ -0,0 +1,150 @@
+"""
+Consumer CPU per stream with and without chunk coalescing.
+
+Each stream is read from chat_with_model(stream=True) and every yielded piece
+is sent over a local socket (or written to /dev/null with --sink devnull),
+standing in for a downstream write such as a server-sent event. CPU is
+measured with time.thread_time() on the consuming thread, so it covers NDJSON
+parsing, the generator and the writes, but not the server. The best of
+--repeat runs is reported. Time to first piece is reported to show it does
+not change.
+
+By default the NDJSON lines are replayed from memory so only client cost is
+measured; --send streams from the stub server instead.
+
+Usage:
+    python benchmarks/bench_coalesce.py --tokens 2000 --streams 20
+    python benchmarks/bench_coalesce.py --send
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ollama_utils import chat_with_model  # noqa: E402
+from ollama_utils.transport import Transport, use_transport  # noqa: E402
+from stub_server import TOKENS  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "Hello"}]
+
+MODES = [
+    ("per token", None),
+    ("64 chars", 64),
+    ("20 ms window", 0.02),
+    ("word", "word"),
+    ("line", "line"),
+]
+
+
+class _Response:
+    status_code = 200
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self):
+        return iter(self.lines)
+
+    def close(self):
+        pass
+
+
+class MemoryTransport(Transport):
+    """Answers every chat request with the same pre-encoded NDJSON stream."""
+
+    def __init__(self, tokens):
+        texts = [TOKENS[i % len(TOKENS)] + ("\n" if i % 50 == 49 else "")
+                 for i in range(tokens)]
+        self.lines = [json.dumps({"message": {"role": "assistant", "content": t},
+                                  "done": False}).encode() for t in texts]
+        self.lines.append(json.dumps({"message": {"role": "assistant", "content": ""},
+                                      "done": True, "eval_count": tokens}).encode())
+
+    def request(self, method, url, **kwargs):
+        return _Response(self.lines)
+
+
+def socket_sink():
+    """A connected socket whose other end is drained on a background thread."""
+    writer, reader = socket.socketpair()
+
+    def drain():
+        while reader.recv(65536):
+            pass
+    threading.Thread(target=drain, daemon=True).start()
+    return writer.fileno(), writer.close
+
+
+def devnull_sink():
+    fd = os.open(os.devnull, os.O_WRONLY)
+    return fd, lambda: os.close(fd)
+
+
+def measure(coalesce, streams, tokens, host, make_sink):
+    sink, close = make_sink()
+    cpu = 0.0
+    first = 0.0
+    pieces = 0
+    try:
+        for _ in range(streams):
+            started_cpu = time.thread_time()
+            started = time.perf_counter()
+            stream = chat_with_model("stub:latest", MESSAGES, stream=True, host=host,
+                                     coalesce=coalesce, num_predict=tokens)
+            for i, piece in enumerate(stream):
+                if i == 0:
+                    first += time.perf_counter() - started
+                os.write(sink, piece.encode("utf-8"))
+                pieces += 1
+            cpu += time.thread_time() - started_cpu
+    finally:
+        close()
+    return cpu / streams * 1000, first / streams * 1000, pieces / streams
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consumer CPU per stream with coalescing")
+    parser.add_argument("--tokens", type=int, default=2000, help="tokens per stream")
+    parser.add_argument("--streams", type=int, default=20)
+    parser.add_argument("--send", action="store_true", help="stream from the stub server")
+    parser.add_argument("--sink", choices=["socket", "devnull"], default="socket",
+                        help="where each yielded piece is written")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per mode (best is kept)")
+    args = parser.parse_args()
+    make_sink = socket_sink if args.sink == "socket" else devnull_sink
+
+    if args.send:
+        from stub_server import start_tcp
+
+        _, host = start_tcp()
+        transport = None
+    else:
+        host = None
+        transport = MemoryTransport(args.tokens)
+
+    print(f"{'mode':>13} {'pieces/stream':>14} {'CPU ms/stream':>14} {'first piece ms':>15}")
+    for label, coalesce in MODES:
+        rows = []
+        for _ in range(args.repeat):
+            if transport is None:
+                measure(coalesce, 1, args.tokens, host, make_sink)  # warm up the connection
+                rows.append(measure(coalesce, args.streams, args.tokens, host, make_sink))
+            else:
+                with use_transport(transport):
+                    rows.append(measure(coalesce, args.streams, args.tokens, host, make_sink))
+        cpu_ms, first_ms, pieces = min(rows)
+        print(f"{label:>13} {pieces:>14.0f} {cpu_ms:>14.2f} {first_ms:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
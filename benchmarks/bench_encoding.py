@@ -0,0 +1,90 @@
+"""
+Per-turn request encoding cost as a chat history grows.
+
+Simulates a conversation that gains one user and one assistant message per
+turn and measures the client-side time to produce the /api/chat request body:
+json.dumps of the whole payload (what requests does for json=) versus
+EncodedMessages, which encodes only new messages and streams cached fragments.
+
+Optionally sends every body to the stub server to include socket writes.
+
+Usage:
+    python benchmarks/bench_encoding.py --turns 500 --size 2000
+    python benchmarks/bench_encoding.py --turns 200 --send
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ollama_utils import chat_with_model  # noqa: E402
+from ollama_utils.encoding import EncodedMessages  # noqa: E402
+
+
+def message(i, size):
+    role = "user" if i % 2 == 0 else "assistant"
+    return {"role": role, "content": f"Turn {i}: " + ("lorem ipsum dolor " * size)[:size]}
+
+
+def measure(turns, size, report_every):
+    plain = []
+    encoded = EncodedMessages()
+    rows = []
+    for turn in range(turns):
+        for m in (message(2 * turn, size), message(2 * turn + 1, size)):
+            plain.append(m)
+            encoded.append(m)
+        payload = {"model": "stub:latest", "stream": True, "options": {"temperature": 0.7}}
+
+        start = time.perf_counter()
+        body = json.dumps(dict(payload, messages=plain)).encode("utf-8")
+        full_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        total = 0
+        for piece in encoded.body(payload):
+            total += len(piece)
+        incremental_ms = (time.perf_counter() - start) * 1000
+
+        if (turn + 1) % report_every == 0 or turn == 0:
+            rows.append((len(plain), len(body), full_ms, incremental_ms))
+    return rows
+
+
+def send(turns, size):
+    from stub_server import start_tcp
+
+    _, url = start_tcp()
+    encoded = EncodedMessages()
+    plain = []
+    for label, messages in (("json=", plain), ("EncodedMessages", encoded)):
+        start = time.perf_counter()
+        for turn in range(turns):
+            messages.append(message(turn, size))
+            reply = chat_with_model("stub:latest", messages, host=url)
+            assert reply == "Hello, world!", reply
+        print(f"{label:>16}: {turns} requests in {time.perf_counter() - start:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-turn chat request encoding cost")
+    parser.add_argument("--turns", type=int, default=300)
+    parser.add_argument("--size", type=int, default=2000, help="characters per message")
+    parser.add_argument("--every", type=int, default=50, help="report every N turns")
+    parser.add_argument("--send", action="store_true", help="also send to the stub server")
+    args = parser.parse_args()
+
+    print(f"{'messages':>9} {'body KB':>9} {'json.dumps ms':>14} {'encoded ms':>11}")
+    for count, nbytes, full_ms, incremental_ms in measure(args.turns, args.size, args.every):
+        print(f"{count:>9} {nbytes / 1024:>9.0f} {full_ms:>14.3f} {incremental_ms:>11.3f}")
+    if args.send:
+        send(args.turns, args.size)
+
+
+if __name__ == "__main__":
+    main()
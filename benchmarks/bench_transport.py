@@ -0,0 +1,76 @@
+"""
+Request-rate microbenchmark: loopback TCP vs Unix domain socket.
+
+Starts the stub server on both transports and measures non-streaming and
+streaming chat requests per second through chat_with_model.
+
+Usage:
+    python benchmarks/bench_transport.py --requests 2000 --threads 1 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests  # noqa: E402
+
+from ollama_utils import chat_with_model  # noqa: E402
+from ollama_utils.transport import HTTPTransport, make_transport  # noqa: E402
+from stub_server import start_tcp, start_unix  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "Hello"}]
+
+
+def run(host, transport, n, threads, stream):
+    from ollama_utils.transport import use_transport
+
+    def one(_):
+        result = chat_with_model("stub:latest", MESSAGES, stream=stream, host=host)
+        if stream:
+            result = "".join(result)
+        assert result == "Hello, world!", result
+
+    with use_transport(transport):
+        one(0)  # warm up the connection pool
+        start = time.perf_counter()
+        if threads == 1:
+            for i in range(n):
+                one(i)
+        else:
+            with ThreadPoolExecutor(threads) as pool:
+                list(pool.map(one, range(n)))
+        return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TCP vs Unix socket request rate")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    _, tcp_url = start_tcp()
+    sock_path = os.path.join(tempfile.mkdtemp(), "ollama.sock")
+    _, unix_host = start_unix(sock_path)
+
+    transports = {
+        "tcp (new connection per request)": (tcp_url, HTTPTransport(tcp_url)),
+        "tcp (keep-alive session)": (tcp_url, HTTPTransport(tcp_url, session=requests.Session())),
+        "unix socket (keep-alive)": (unix_host, make_transport(unix_host)),
+    }
+    print(f"{'transport':36} {'threads':>7} {'mode':>9} {'req/s':>10}")
+    for name, (host, transport) in transports.items():
+        for threads in args.threads:
+            for stream in (False, True):
+                rate = run(host, transport, args.requests, threads, stream)
+                mode = "stream" if stream else "blocking"
+                print(f"{name:36} {threads:>7} {mode:>9} {rate:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Minimal Ollama-compatible stub server for benchmarks.
+
+Serves /api/chat, /api/generate, /api/tags, /api/ps and /api/version with
+canned responses over TCP or a Unix domain socket, so client-side overhead can
+be measured without running a model.
+
+Usage:
+    python benchmarks/stub_server.py --port 11500
+    python benchmarks/stub_server.py --unix /tmp/ollama-stub.sock
+"""
+
+import argparse
+import json
+import os
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TOKENS = ["Hello", ",", " world", "!"]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    token_delay = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def address_string(self):
+        return "stub"
+
+    def _send_json(self, data):
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            data = b""
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return json.loads(data or b"{}")
+                data += self.rfile.read(size)
+                self.rfile.readline()
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": "stub:latest", "size": 1000000}]})
+        elif self.path == "/api/ps":
+            self._send_json({"models": []})
+        elif self.path == "/api/version":
+            self._send_json({"version": "0.0.0-stub"})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        request = self._read_body()
+        if self.path not in ("/api/chat", "/api/generate"):
+            self.send_error(404)
+            return
+
+        def chunk(text, done):
+            data = {"model": request.get("model"), "done": done}
+            if self.path == "/api/chat":
+                data["message"] = {"role": "assistant", "content": text}
+            else:
+                data["response"] = text
+            if done:
+                data.update({"eval_count": count, "prompt_eval_count": 8,
+                             "total_duration": 1000, "eval_duration": 500})
+            return data
+
+        # options.num_predict sets the number of streamed tokens (default: TOKENS once)
+        count = (request.get("options") or {}).get("num_predict") or len(TOKENS)
+        tokens = [TOKENS[i % len(TOKENS)] for i in range(count)]
+
+        if not request.get("stream", True):
+            self._send_json(chunk("".join(tokens), True))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in tokens + [""]:
+            line = json.dumps(chunk(token, token == "")).encode() + b"\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.flush()
+            if self.token_delay:
+                time.sleep(self.token_delay)
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class UnixStubHandler(StubHandler):
+    disable_nagle_algorithm = False
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("unix", 0)
+
+
+def start_tcp(port=0):
+    """Start the stub on 127.0.0.1 in a background thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def start_unix(path):
+    """Start the stub on a Unix socket in a background thread; returns (server, host)."""
+    if os.path.exists(path):
+        os.remove(path)
+    server = UnixHTTPServer(path, UnixStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"unix://{path}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--unix", help="serve on this Unix socket path instead of TCP")
+    parser.add_argument("--token-delay", type=float, default=0.0,
+                        help="seconds between streamed tokens")
+    args = parser.parse_args()
+    StubHandler.token_delay = args.token_delay
+    if args.unix:
+        server, url = start_unix(args.unix)
+    else:
+        server, url = start_tcp(args.port)
+    print(f"Stub Ollama server listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
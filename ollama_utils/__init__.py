@@ -21,12 +21,88 @@ __email__ = "malpaso@alfredcodes.com"
 __license__ = "MIT"
 
 # Core functions
-from .models import list_models, pull_model, delete_model, show_model, is_model_installed
-from .chat import chat_with_model, generate_with_model
+from .models import (
+    list_models,
+    list_running_models,
+    get_version,
+    pull_model,
+    delete_model,
+    show_model,
+    is_model_installed,
+)
+from .chat import chat_with_model, generate_with_model, embed_with_model
+
+# Multimodal input
+from .images import ImageCache, encode_image
+
+# Transport
+from .transport import HTTPTransport, UnixSocketTransport, get_transport, set_transport, use_transport
+
+# Record/replay
+from .cassette import RecordingTransport, ReplayTransport, record, replay
+
+# Instrumentation
+from .hooks import SpanRecorder, add_listener, remove_listener
+from .metrics import Metrics, start_metrics_server
+
+# Semantic caching
+from .semantic_cache import SemanticCache
+
+# Tail-latency reduction
+from .hedging import HedgedChat
+
+# Memory residency
+from .residency import ResidencyPlanner, pick_host
+
+# Server health
+from .health import HealthProbe, get_probe, set_probe
+
+# Rate limiting
+from .ratelimit import RateLimiter, TokenBucket
+
+# Model cascades
+from .cascade import Cascade, all_checks, json_check, logprob_check, schema_check, validator_check
+
+# Tool calling
+from .tools import Tool, ToolExecutor, tool
+
+# Batch jobs
+from .batch import BatchRunner, run_batch
+
+# Model benchmarking
+from .leaderboard import ModelBenchmark, leaderboard, load_leaderboard, write_leaderboard
+
+# Runtime option tuning
+from .autotune import Autotuner, ProfileStore, autotune, get_profile_store, set_profile_store
+
+# Structured output
+from .structured import (
+    JSONStreamParser,
+    SchemaViolation,
+    StructuredOutputError,
+    chat_json,
+    generate_json,
+    stream_json,
+)
+
+# Streaming utilities
+from .fanout import Broadcast, broadcast_chat
+from .background import BackgroundStream
+from .coalesce import Coalescer, coalesce
+
+# Context window management
+from .context import ContextBudget, TokenEstimator, get_context_length, trim_messages
+
+# Persistent chat history
+from .history import Conversation, ConversationStore
+from .encoding import EncodedMessages
+
+# History compaction
+from .compaction import HistoryCompactor
 
 # Streamlit helpers (optional import)
 try:
-    from .streamlit_helpers import model_selector, chat_ui
+    from .streamlit_helpers import model_selector, chat_ui, session_stream, render_stream
 except ImportError:
     # Streamlit not installed, skip these imports
     pass
@@ -35,15 +111,103 @@ except ImportError:
 __all__ = [
     # Core functions
     "list_models",
+    "list_running_models",
+    "get_version",
     "pull_model", 
     "delete_model",
     "show_model",
     "is_model_installed",
     "chat_with_model",
     "generate_with_model",
+    "embed_with_model",
+    # Multimodal input
+    "ImageCache",
+    "encode_image",
+    # Transport
+    "HTTPTransport",
+    "UnixSocketTransport",
+    "get_transport",
+    "set_transport",
+    "use_transport",
+    # Record/replay
+    "RecordingTransport",
+    "ReplayTransport",
+    "record",
+    "replay",
+    # Instrumentation
+    "SpanRecorder",
+    "add_listener",
+    "remove_listener",
+    "Metrics",
+    "start_metrics_server",
+    # Semantic caching
+    "SemanticCache",
+    # Tail-latency reduction
+    "HedgedChat",
+    # Memory residency
+    "ResidencyPlanner",
+    "pick_host",
+    # Server health
+    "HealthProbe",
+    "get_probe",
+    "set_probe",
+    # Rate limiting
+    "RateLimiter",
+    "TokenBucket",
+    # Model cascades
+    "Cascade",
+    "all_checks",
+    "json_check",
+    "logprob_check",
+    "schema_check",
+    "validator_check",
+    # Tool calling
+    "Tool",
+    "ToolExecutor",
+    "tool",
+    # Batch jobs
+    "BatchRunner",
+    "run_batch",
+    # Model benchmarking
+    "ModelBenchmark",
+    "leaderboard",
+    "load_leaderboard",
+    "write_leaderboard",
+    # Runtime option tuning
+    "Autotuner",
+    "ProfileStore",
+    "autotune",
+    "get_profile_store",
+    "set_profile_store",
+    # Structured output
+    "JSONStreamParser",
+    "SchemaViolation",
+    "StructuredOutputError",
+    "chat_json",
+    "generate_json",
+    "stream_json",
+    # Streaming utilities
+    "Broadcast",
+    "broadcast_chat",
+    "BackgroundStream",
+    "Coalescer",
+    "coalesce",
+    # Context window management
+    "ContextBudget",
+    "TokenEstimator",
+    "get_context_length",
+    "trim_messages",
+    # Persistent chat history
+    "Conversation",
+    "ConversationStore",
+    "EncodedMessages",
+    # History compaction
+    "HistoryCompactor",
     # Streamlit helpers (if available)
     "model_selector",
     "chat_ui",
+    "session_stream",
+    "render_stream",
     # Package metadata
     "__version__",
     "__author__",
@@ -0,0 +1,327 @@
+# autotune.py
+import argparse
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+
+from .context import get_context_length
+from .leaderboard import DEFAULT_PROMPTS, _pad_prompt, _rate
+from .transport import resolve_host
+
+# Environment variable naming the profile file
+PROFILE_ENV = "OLLAMA_UTILS_PROFILES"
+DEFAULT_PROFILE_PATH = os.path.join("~", ".ollama_utils", "profiles.json")
+
+# Runtime options a profile may set
+TUNED_OPTIONS = ("num_ctx", "num_batch", "num_thread")
+
+OBJECTIVES = ("decode_tps", "prefill_tps", "total_tps")
+
+
+class ProfileStore:
+    """
+    JSON file of tuned runtime options per host and model.
+
+    The file is re-read when it changes on disk (checked at most every
+    check_interval seconds), so a profile saved by another process is picked
+    up without a restart.
+
+    Args:
+        path: Profile file (default: $OLLAMA_UTILS_PROFILES or ~/.ollama_utils/profiles.json)
+        check_interval: Seconds between checks of the file's modification time
+    """
+
+    def __init__(self, path=None, check_interval=5.0):
+        self.path = os.path.expanduser(path or os.environ.get(PROFILE_ENV) or DEFAULT_PROFILE_PATH)
+        self.check_interval = check_interval
+        self._profiles = {}
+        self._mtime = None
+        self._checked = None
+        self._lock = threading.Lock()
+
+    def _reload(self):
+        now = time.monotonic()
+        if self._checked is not None and now - self._checked < self.check_interval:
+            return
+        self._checked = now
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            self._profiles, self._mtime = {}, None
+            return
+        if mtime != self._mtime:
+            try:
+                with open(self.path) as f:
+                    self._profiles = json.load(f)
+            except ValueError:
+                self._profiles = {}
+            self._mtime = mtime
+
+    def get(self, model_name, host=None):
+        """Stored profile dict for a model on a host, or None."""
+        with self._lock:
+            self._reload()
+            return self._profiles.get(resolve_host(host), {}).get(model_name)
+
+    def options(self, model_name, host=None):
+        """Tuned options for a model on a host ({} if it has not been tuned)."""
+        profile = self.get(model_name, host)
+        if not profile:
+            return {}
+        return {k: v for k, v in profile.get("options", {}).items() if k in TUNED_OPTIONS}
+
+    def _write(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp = self.path + ".tmp"
+        with open(temp, "w") as f:
+            json.dump(self._profiles, f, indent=2)
+        os.replace(temp, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    def set(self, model_name, profile, host=None):
+        """Store a profile and write the file."""
+        with self._lock:
+            self._checked = None
+            self._reload()
+            self._profiles.setdefault(resolve_host(host), {})[model_name] = profile
+            self._write()
+
+    def remove(self, model_name, host=None):
+        """Forget a model's profile."""
+        with self._lock:
+            self._checked = None
+            self._reload()
+            if self._profiles.get(resolve_host(host), {}).pop(model_name, None) is not None:
+                self._write()
+
+
+_store = None
+_disabled = False
+
+
+def get_profile_store():
+    """Return the store chat calls take profiles from (created on first use), or None."""
+    global _store
+    if _store is None and not _disabled:
+        _store = ProfileStore()
+    return _store
+
+
+def set_profile_store(store):
+    """Install the store chat calls take profiles from (None turns profiles off)."""
+    global _store, _disabled
+    _store = store
+    _disabled = store is None
+
+
+def apply_profile(model_name, host, kwargs):
+    """
+    Fill in tuned runtime options the caller did not set.
+
+    Options given explicitly always win; nothing is added when the model has
+    no profile for this host. A tuned num_ctx smaller than the model's
+    default context window is not applied, since it was only sized for the
+    tuning workload and would truncate longer chats.
+    """
+    store = get_profile_store()
+    if store is None:
+        return kwargs
+    options = store.options(model_name, host)
+    if "num_ctx" in options and "num_ctx" not in kwargs:
+        if options["num_ctx"] < get_context_length(model_name, host=host):
+            del options["num_ctx"]
+    for key, value in options.items():
+        kwargs.setdefault(key, value)
+    return kwargs
+
+
+class Autotuner:
+    """
+    Sweeps runtime options for one model on one host and keeps the best.
+
+    Every combination of num_ctx, num_batch and num_thread is loaded once
+    (changing these reloads the model) and measured on the workload: each
+    prompt is padded to context_tokens and run with num_predict tokens of
+    output. Prefill and decode throughput come from the server's own
+    counters and memory from /api/ps. Combinations whose num_ctx cannot hold
+    the workload or whose memory exceeds memory_limit are not eligible.
+
+    The default num_thread candidates come from this machine's core count,
+    so pass num_thread explicitly when tuning a remote server.
+
+    Args:
+        model_name: Model to tune
+        host: Ollama server URL
+        num_ctx, num_batch, num_thread: Candidate values for each option
+        prompts: Representative workload (default: the leaderboard prompt set)
+        context_tokens: Approximate prompt size in tokens
+        num_predict: Tokens generated per request
+        objective: "decode_tps", "prefill_tps" or "total_tps"
+        memory_limit: Largest acceptable model memory in bytes
+        store: ProfileStore results are saved to (default: get_profile_store())
+    """
+
+    def __init__(self, model_name, host=None, num_ctx=(2048, 4096, 8192),
+                 num_batch=(128, 256, 512), num_thread=None, prompts=None,
+                 context_tokens=1024, num_predict=64, objective="decode_tps",
+                 memory_limit=None, store=None):
+        if objective not in OBJECTIVES:
+            raise ValueError(f"objective must be one of {OBJECTIVES}")
+        if num_thread is None:
+            cores = os.cpu_count() or 1
+            num_thread = sorted({max(cores // 2, 1), cores})
+        self.model_name = model_name
+        self.host = host
+        self.grid = {"num_ctx": list(num_ctx), "num_batch": list(num_batch),
+                     "num_thread": list(num_thread)}
+        self.prompts = list(prompts or DEFAULT_PROMPTS)
+        self.context_tokens = context_tokens
+        self.num_predict = num_predict
+        self.objective = objective
+        self.memory_limit = memory_limit
+        self.store = store
+
+    def candidates(self):
+        """Every option combination in the sweep, as dicts."""
+        keys = list(self.grid)
+        return [dict(zip(keys, values)) for values in itertools.product(*self.grid.values())]
+
+    def _generate(self, prompt, **kwargs):
+        from .chat import generate_with_model
+
+        final = []
+        content = generate_with_model(self.model_name, prompt, on_done=final.append,
+                                      host=self.host, **kwargs)
+        return final[0] if final else {"error": content}
+
+    def measure(self, options):
+        """
+        Load the model with options and run the workload once.
+
+        Returns:
+            Trial dict with the options, throughputs, memory and errors
+        """
+        from .models import list_running_models
+
+        trial = {"options": dict(options), "prefill_tps": None, "decode_tps": None,
+                 "total_tps": None, "memory_bytes": None, "errors": 0}
+        self._generate("", keep_alive=0)
+        loaded = self._generate("", **options)
+        if "error" in loaded:
+            trial["errors"] = 1
+            trial["error"] = loaded["error"]
+            return trial
+        running = list_running_models(host=self.host)
+        if isinstance(running, list):
+            entry = next((m for m in running if m.get("name") == self.model_name), {})
+            trial["memory_bytes"] = entry.get("size")
+        results = [self._generate(_pad_prompt(p, self.context_tokens, i),
+                                  num_predict=self.num_predict, **options)
+                   for i, p in enumerate(self.prompts)]
+        done = [r for r in results if "error" not in r]
+        trial["errors"] = len(results) - len(done)
+
+        def total(key):
+            return sum(r.get(key) or 0 for r in done)
+        trial["prefill_tps"] = _rate(total("prompt_eval_count"), total("prompt_eval_duration"))
+        trial["decode_tps"] = _rate(total("eval_count"), total("eval_duration"))
+        trial["total_tps"] = _rate(total("prompt_eval_count") + total("eval_count"),
+                                   total("prompt_eval_duration") + total("eval_duration"))
+        return trial
+
+    def eligible(self, trial):
+        """True if a trial ran cleanly, holds the workload and fits memory_limit."""
+        if trial["errors"] or trial[self.objective] is None:
+            return False
+        if trial["options"].get("num_ctx", 0) < self.context_tokens + self.num_predict:
+            return False
+        memory = trial["memory_bytes"]
+        return self.memory_limit is None or memory is None or memory <= self.memory_limit
+
+    def run(self, save=True, progress=None):
+        """
+        Run the sweep and store the best profile.
+
+        Args:
+            save: Write the best profile to the store
+            progress: Optional callback receiving each trial as it finishes
+
+        Returns:
+            Profile dict ({"options", throughputs, "memory_bytes", "tuned_at",
+            "trials"}), or None if no combination was eligible
+        """
+        trials = []
+        for options in self.candidates():
+            trial = self.measure(options)
+            trials.append(trial)
+            if progress:
+                progress(trial)
+        eligible = [t for t in trials if self.eligible(t)]
+        if not eligible:
+            return None
+        # Ties go to the smaller context, which needs less memory
+        best = max(eligible, key=lambda t: (t[self.objective], -t["options"].get("num_ctx", 0)))
+        profile = {"options": best["options"], "objective": self.objective,
+                   "prefill_tps": best["prefill_tps"], "decode_tps": best["decode_tps"],
+                   "total_tps": best["total_tps"], "memory_bytes": best["memory_bytes"],
+                   "tuned_at": time.time()}
+        if save:
+            store = self.store or get_profile_store() or ProfileStore()
+            store.set(self.model_name, profile, self.host)
+        return dict(profile, trials=trials)
+
+
+def autotune(model_name, host=None, save=True, **kwargs):
+    """Tune a model's runtime options on a host; see Autotuner. Returns the profile."""
+    return Autotuner(model_name, host=host, **kwargs).run(save=save)
+
+
+def _ints(text):
+    return [int(v) for v in text.split(",") if v]
+
+
+def main(argv=None):
+    """Command-line entry point: ollama-autotune MODEL."""
+    parser = argparse.ArgumentParser(description="Tune Ollama runtime options for a model.")
+    parser.add_argument("model", help="model to tune")
+    parser.add_argument("--host", help="Ollama server URL")
+    parser.add_argument("--num-ctx", type=_ints, default=[2048, 4096, 8192], help="e.g. 2048,4096")
+    parser.add_argument("--num-batch", type=_ints, default=[128, 256, 512])
+    parser.add_argument("--num-thread", type=_ints, help="default: half and all local cores")
+    parser.add_argument("--context-tokens", type=int, default=1024)
+    parser.add_argument("--num-predict", type=int, default=64)
+    parser.add_argument("--objective", choices=OBJECTIVES, default="decode_tps")
+    parser.add_argument("--memory-limit", type=int, help="bytes")
+    parser.add_argument("--profiles", help=f"profile file (default: ${PROFILE_ENV} or "
+                                           f"{DEFAULT_PROFILE_PATH})")
+    parser.add_argument("--dry-run", action="store_true", help="do not save the profile")
+    args = parser.parse_args(argv)
+
+    tuner = Autotuner(args.model, host=args.host, num_ctx=args.num_ctx,
+                      num_batch=args.num_batch, num_thread=args.num_thread,
+                      context_tokens=args.context_tokens, num_predict=args.num_predict,
+                      objective=args.objective, memory_limit=args.memory_limit,
+                      store=ProfileStore(args.profiles) if args.profiles else None)
+
+    def report(trial):
+        print(f"{trial['options']}: prefill {trial['prefill_tps']} tok/s, "
+              f"decode {trial['decode_tps']} tok/s, memory {trial['memory_bytes']}, "
+              f"{trial['errors']} errors", file=sys.stderr, flush=True)
+
+    profile = tuner.run(save=not args.dry_run, progress=report)
+    if profile is None:
+        print("No option combination completed the workload.", file=sys.stderr)
+        return 1
+    profile.pop("trials")
+    json.dump(profile, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
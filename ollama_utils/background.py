@@ -0,0 +1,128 @@
+# background.py
+import threading
+import time
+from collections import deque
+
+
+class BackgroundStream:
+    """
+    Read a chunk stream on a worker thread so a slow consumer never stalls it.
+
+    The worker appends every chunk to a pending buffer of at most ``maxsize``
+    entries; when the consumer falls behind, new chunks are merged into the
+    last entry instead of blocking, so the socket is always read at network
+    speed and memory stays bounded by the response itself.
+
+    The full text received so far is kept, so a consumer that restarts (such
+    as a Streamlit rerun) can call drain() again and get everything from the
+    beginning without the request being sent twice.
+
+    Args:
+        source: Iterable of text chunks, e.g. chat_with_model(..., stream=True),
+                or a zero-argument callable returning one (called on the worker)
+        maxsize: Maximum pending entries before chunks are merged
+    """
+
+    def __init__(self, source, maxsize=256):
+        self._source = source
+        self.maxsize = maxsize
+        self._parts = []
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._done = False
+        self._cancelled = False
+        self._thread = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+
+    def start(self):
+        """Start reading on a daemon thread. Returns self."""
+        with self._cond:
+            if self._thread is None:
+                self.started_at = time.time()
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self):
+        source = self._source
+        try:
+            if callable(source):
+                source = source()
+            if isinstance(source, str):
+                # chat_with_model reports errors as a plain string
+                source = [source]
+            for chunk in source:
+                if self._cancelled:
+                    break
+                self._put(chunk)
+        except Exception as e:
+            self.error = e
+        finally:
+            close = getattr(source, "close", None)
+            if self._cancelled and close:
+                close()
+            with self._cond:
+                self._done = True
+                self.finished_at = time.time()
+                self._cond.notify_all()
+
+    def _put(self, chunk):
+        with self._cond:
+            self._parts.append(chunk)
+            if len(self._pending) >= self.maxsize:
+                self._pending[-1] += chunk
+            else:
+                self._pending.append(chunk)
+            self._cond.notify_all()
+
+    def drain(self, replay=True, timeout=None):
+        """
+        Yield text as it arrives until the stream ends.
+
+        Everything buffered since the previous read is yielded as one piece. A
+        stream error is re-raised once the received text has been yielded.
+
+        Args:
+            replay: First yield all text received so far (for a fresh consumer)
+            timeout: Seconds to wait for new text before raising TimeoutError
+        """
+        with self._cond:
+            self._pending.clear()
+            backlog = "".join(self._parts) if replay else ""
+        if backlog:
+            yield backlog
+        while True:
+            with self._cond:
+                while not self._pending and not self._done:
+                    if not self._cond.wait(timeout):
+                        raise TimeoutError("No chunk received within timeout")
+                piece = "".join(self._pending)
+                self._pending.clear()
+                done = self._done
+            if piece:
+                yield piece
+            if done:
+                break
+        if self.error is not None:
+            raise self.error
+
+    def cancel(self):
+        """Stop reading after the current chunk and close the source."""
+        self._cancelled = True
+
+    def join(self, timeout=None):
+        """Wait for the worker thread to finish."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def done(self):
+        return self._done
+
+    @property
+    def text(self):
+        """All text received so far."""
+        with self._cond:
+            return "".join(self._parts)
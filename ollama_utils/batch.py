@@ -0,0 +1,488 @@
+# batch.py
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# HTTP statuses worth retrying; errors with no status never reached the server
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def _retryable(error):
+    """True if an error string from chat/generate is a connection failure or transient status."""
+    match = re.search(r" error \((\d{3})\)", error)
+    return match is None or int(match.group(1)) in RETRY_STATUSES
+
+
+def _read_records(path, skip):
+    """Yield (index, record) for each non-empty input line not in skip(index)."""
+    with open(path, "r", encoding="utf-8") as f:
+        index = -1
+        for line in f:
+            if not line.strip():
+                continue
+            index += 1
+            if skip(index):
+                continue
+            yield index, json.loads(line)
+
+
+def _count_records(path):
+    with open(path, "rb") as f:
+        return sum(1 for line in f if line.strip())
+
+
+def _truncate_partial_line(path):
+    """Drop a trailing half-written line left by a crash; return the file size."""
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return 0
+        pos = size
+        while pos > 0:
+            step = min(4096, pos)
+            f.seek(pos - step)
+            block = f.read(step)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                end = pos - step + newline + 1
+                break
+            pos -= step
+        else:
+            end = 0
+        if end != size:
+            f.truncate(end)
+        return end
+
+
+class _ModelGrouper:
+    """
+    Reorders (index, record) pairs so records for the same model run back to
+    back, reading at most ``window`` records ahead. A record is never
+    dispatched more than ``max_defer`` positions after its place in input
+    order, which bounds the extra latency grouping can add.
+
+    ``loads`` counts model changes in dispatch order and ``baseline_loads``
+    the changes the same records would have caused in input order.
+    """
+
+    def __init__(self, records, model_of, window=256, max_defer=None, planner=None):
+        self._records = records
+        self._model_of = model_of
+        self.window = window
+        self.max_defer = window if max_defer is None else max_defer
+        self.planner = planner
+        self._groups = OrderedDict()
+        self._pending = 0
+        self._seq = 0
+        self._emitted = 0
+        self._exhausted = False
+        self._current = None
+        self._last_read = None
+        self.loads = 0
+        self.baseline_loads = 0
+
+    def __iter__(self):
+        return self
+
+    def _fill(self):
+        while not self._exhausted and self._pending < self.window:
+            try:
+                index, record = next(self._records)
+            except StopIteration:
+                self._exhausted = True
+                break
+            model = self._model_of(record)
+            if model != self._last_read:
+                self.baseline_loads += 1
+                self._last_read = model
+            self._groups.setdefault(model, deque()).append((self._seq, index, record))
+            self._seq += 1
+            self._pending += 1
+
+    def _next_model(self):
+        oldest = min(self._groups, key=lambda m: self._groups[m][0][0])
+        if self._emitted - self._groups[oldest][0][0] >= self.max_defer:
+            return oldest
+        if self._current in self._groups:
+            return self._current
+        if self.planner is not None:
+            for model in self._groups:
+                if model is not None and self.planner.is_resident(model):
+                    return model
+        return oldest
+
+    def __next__(self):
+        self._fill()
+        if not self._pending:
+            raise StopIteration
+        model = self._next_model()
+        group = self._groups[model]
+        _, index, record = group.popleft()
+        if not group:
+            del self._groups[model]
+        self._pending -= 1
+        self._emitted += 1
+        if model != self._current:
+            self.loads += 1
+            self._current = model
+        return index, record
+
+
+class _Checkpoint:
+    """
+    Tracks completed record indices compactly: everything below ``watermark``
+    is done, plus the sparse set ``above`` of done indices past it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.watermark = 0
+        self.above = set()
+        self.offset = 0
+        self.completed = 0
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            data = json.load(f)
+        self.watermark = data["watermark"]
+        self.above = set(data["above"])
+        self.offset = data["offset"]
+        self.completed = data["completed"]
+
+    def is_done(self, index):
+        return index < self.watermark or index in self.above
+
+    def mark(self, index):
+        if self.is_done(index):
+            return
+        self.completed += 1
+        self.above.add(index)
+        while self.watermark in self.above:
+            self.above.remove(self.watermark)
+            self.watermark += 1
+
+    def save(self, offset):
+        self.offset = offset
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"watermark": self.watermark, "above": sorted(self.above),
+                       "offset": offset, "completed": self.completed}, f)
+        os.replace(tmp, self.path)
+
+
+class BatchRunner:
+    """
+    Run a JSONL file of prompts through Ollama with bounded concurrency.
+
+    Each input line is a JSON object with either "prompt" (sent to
+    generate_with_model) or "messages" (sent to chat_with_model), and optionally
+    "id", "model" and "options". Results are appended to the output JSONL as
+    they complete, in completion order, each tagged with the input "index".
+
+    Progress is checkpointed next to the output file; rerunning the same job
+    skips every record that already has a result, so a crash loses at most the
+    requests that were in flight. Connection errors and transient statuses
+    (RETRY_STATUSES) are retried with exponential backoff; a request that
+    still fails is written with an "error" field and counts as done, unless
+    the job is resumed with retry_errors, which runs those records again (the
+    newer line for an index supersedes the older one).
+
+    With group_by_model, records are reordered within a read-ahead window so
+    each model's work runs while it is loaded, instead of Ollama swapping
+    models on every change in a mixed file. No record is delayed more than
+    max_defer positions past its input order; the final stats report
+    model_loads and loads_avoided.
+
+    Args:
+        model: Default model for records without a "model" field
+        concurrency: Maximum requests in flight
+        checkpoint_every: Write the checkpoint after this many results
+        progress: Callable receiving a stats dict every report_interval seconds
+        report_interval: Seconds between progress reports
+        host: Ollama server URL
+        group_by_model: Reorder records to minimize model reloads
+        reorder_window: Records read ahead when grouping
+        max_defer: Maximum positions a record may be pushed back (default: reorder_window)
+        planner: Optional ResidencyPlanner; groups for resident models go first
+        retries: Extra attempts for a request that fails with a retryable error
+        retry_backoff: Seconds before the first retry, doubled for each further one
+        **options: Default model options (temperature, num_predict, etc.)
+    """
+
+    def __init__(self, model=None, concurrency=4, checkpoint_every=100,
+                 progress=None, report_interval=5.0, host=None, group_by_model=False,
+                 reorder_window=256, max_defer=None, planner=None, retries=3,
+                 retry_backoff=1.0, **options):
+        self.model = model
+        self.concurrency = concurrency
+        self.checkpoint_every = checkpoint_every
+        self.progress = progress
+        self.report_interval = report_interval
+        self.host = host
+        self.group_by_model = group_by_model
+        self.reorder_window = reorder_window
+        self.max_defer = max_defer
+        self.planner = planner
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.options = options
+        self._stop = threading.Event()
+        self._grouper = None
+
+    def stop(self):
+        """Finish in-flight requests, checkpoint and return from run()."""
+        self._stop.set()
+
+    def _send(self, model, record, options, on_done):
+        from .chat import chat_with_model, generate_with_model
+
+        if "messages" in record:
+            return chat_with_model(model, record["messages"], on_done=on_done,
+                                   host=self.host, **options)
+        return generate_with_model(model, record.get("prompt", ""), on_done=on_done,
+                                   host=self.host, **options)
+
+    def process(self, index, record):
+        """
+        Run one record (retrying connection errors) and return its output dict.
+
+        A record that raises, such as a malformed line, gives an error result
+        like any failed request, so it is marked done and retry_errors reruns it.
+        """
+        started = time.perf_counter()
+        try:
+            return self._process(index, record, started)
+        except Exception as e:
+            return {"index": index, "error": f"Record error: {type(e).__name__}: {e}",
+                    "seconds": round(time.perf_counter() - started, 3)}
+
+    def _process(self, index, record, started):
+        model = record.get("model", self.model)
+        options = dict(self.options)
+        options.update(record.get("options", {}))
+        final = []
+        attempts = 0
+        if model is None:
+            content = "Generation error: no model given"
+        else:
+            while True:
+                attempts += 1
+                content = self._send(model, record, options, final.append)
+                if final or attempts > self.retries or not _retryable(content):
+                    break
+                # Back off so a restarting server is not hammered; stop() cuts the wait short
+                if self._stop.wait(self.retry_backoff * 2 ** (attempts - 1)):
+                    break
+        result = {"index": index, "model": model}
+        if "id" in record:
+            result["id"] = record["id"]
+        if final:
+            result["response"] = content
+            result["eval_count"] = final[0].get("eval_count")
+            result["prompt_eval_count"] = final[0].get("prompt_eval_count")
+        else:
+            # No final response dict means content is the error string
+            result["error"] = content
+        if attempts > 1:
+            result["attempts"] = attempts
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        return result
+
+    def _records(self, input_path, checkpoint, rerun=()):
+        records = _read_records(input_path,
+                                lambda i: checkpoint.is_done(i) and i not in rerun)
+        if not self.group_by_model:
+            self._grouper = None
+            return records
+        self._grouper = _ModelGrouper(records, lambda r: r.get("model", self.model),
+                                      self.reorder_window, self.max_defer, self.planner)
+        return self._grouper
+
+    def run(self, input_path, output_path, resume=True, retry_errors=False):
+        """
+        Process input_path into output_path.
+
+        Args:
+            input_path: JSONL file of records
+            output_path: JSONL file results are appended to
+            resume: Skip records completed by a previous run (otherwise start over)
+            retry_errors: When resuming, run records whose last result was an error again
+
+        Returns:
+            Stats dict with total, completed, errors, rate and elapsed seconds
+        """
+        checkpoint = _Checkpoint(output_path + ".ckpt")
+        rerun = set()
+        if resume and os.path.exists(output_path):
+            checkpoint.load()
+            end = _truncate_partial_line(output_path)
+            # Results written after the last checkpoint are recovered from the output;
+            # retry_errors needs every result, to find the records whose last one failed
+            with open(output_path, "rb") as f:
+                f.seek(0 if retry_errors else min(checkpoint.offset, end))
+                for line in f:
+                    result = json.loads(line)
+                    index = result["index"]
+                    checkpoint.mark(index)
+                    if "error" in result:
+                        rerun.add(index)
+                    else:
+                        rerun.discard(index)
+            if not retry_errors:
+                rerun = set()
+        elif os.path.exists(output_path):
+            os.remove(output_path)
+            if os.path.exists(checkpoint.path):
+                os.remove(checkpoint.path)
+
+        stats = {"total": _count_records(input_path),
+                 "completed": checkpoint.completed - len(rerun),
+                 "errors": 0, "started": time.time(), "done_this_run": 0}
+        records = self._records(input_path, checkpoint, rerun)
+        last_report = time.monotonic()
+        since_checkpoint = 0
+
+        with open(output_path, "a", encoding="utf-8") as out, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            in_flight = set()
+            exhausted = False
+            while in_flight or not exhausted:
+                while not exhausted and not self._stop.is_set() and len(in_flight) < self.concurrency:
+                    try:
+                        index, record = next(records)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    in_flight.add(pool.submit(self.process, index, record))
+                if self._stop.is_set():
+                    exhausted = True
+                if not in_flight:
+                    break
+
+                finished, in_flight = wait(in_flight, timeout=self.report_interval,
+                                           return_when=FIRST_COMPLETED)
+                for future in finished:
+                    result = future.result()
+                    out.write(json.dumps(result) + "\n")
+                    rerun.discard(result["index"])
+                    checkpoint.mark(result["index"])
+                    stats["completed"] += 1
+                    stats["done_this_run"] += 1
+                    stats["errors"] += "error" in result
+                    since_checkpoint += 1
+                if finished:
+                    out.flush()
+                if since_checkpoint >= self.checkpoint_every:
+                    checkpoint.save(out.tell())
+                    since_checkpoint = 0
+                if self.progress and time.monotonic() - last_report >= self.report_interval:
+                    last_report = time.monotonic()
+                    self.progress(self._progress(stats))
+            out.flush()
+            checkpoint.save(out.tell())
+
+        report = self._progress(stats)
+        if self.progress:
+            self.progress(report)
+        return report
+
+    def _progress(self, stats):
+        elapsed = time.time() - stats["started"]
+        rate = stats["done_this_run"] / elapsed if elapsed > 0 else 0.0
+        remaining = stats["total"] - stats["completed"]
+        report = {
+            "total": stats["total"],
+            "completed": stats["completed"],
+            "errors": stats["errors"],
+            "elapsed": elapsed,
+            "rate": rate,
+            "eta": remaining / rate if rate > 0 else None,
+        }
+        if self._grouper is not None:
+            report["model_loads"] = self._grouper.loads
+            report["loads_avoided"] = self._grouper.baseline_loads - self._grouper.loads
+        return report
+
+
+def format_progress(stats):
+    """Render a progress stats dict as a one-line status."""
+    eta = stats["eta"]
+    eta_text = "--" if eta is None else time.strftime("%H:%M:%S", time.gmtime(eta))
+    text = (f"{stats['completed']}/{stats['total']} done, {stats['errors']} errors, "
+            f"{stats['rate']:.2f} req/s, ETA {eta_text}")
+    if "loads_avoided" in stats:
+        text += f", {stats['loads_avoided']} model loads avoided"
+    return text
+
+
+def run_batch(input_path, output_path, model=None, concurrency=4, resume=True,
+              retry_errors=False, **kwargs):
+    """
+    Run a JSONL batch job; see BatchRunner for the record format.
+
+    Returns:
+        Final progress stats dict
+    """
+    runner = BatchRunner(model=model, concurrency=concurrency, **kwargs)
+    return runner.run(input_path, output_path, resume=resume, retry_errors=retry_errors)
+
+
+def main(argv=None):
+    """Command-line entry point: ollama-batch INPUT OUTPUT --model NAME."""
+    parser = argparse.ArgumentParser(description="Run a JSONL batch of prompts through Ollama.")
+    parser.add_argument("input", help="input JSONL with 'prompt' or 'messages' per line")
+    parser.add_argument("output", help="output JSONL (appended; also used to resume)")
+    parser.add_argument("--model", help="default model for records without 'model'")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--host", help="Ollama server URL")
+    parser.add_argument("--checkpoint-every", type=int, default=100)
+    parser.add_argument("--report-interval", type=float, default=5.0)
+    parser.add_argument("--restart", action="store_true", help="ignore previous progress")
+    parser.add_argument("--retry-errors", action="store_true",
+                        help="run records that failed in a previous run again")
+    parser.add_argument("--retries", type=int, default=3,
+                        help="retries for connection errors and transient statuses")
+    parser.add_argument("--group-by-model", action="store_true",
+                        help="reorder records to minimize model reloads")
+    parser.add_argument("--reorder-window", type=int, default=256)
+    parser.add_argument("--max-defer", type=int, help="max positions a record may be delayed")
+    parser.add_argument("--option", action="append", default=[], metavar="KEY=VALUE",
+                        help="model option, e.g. --option temperature=0 (repeatable)")
+    args = parser.parse_args(argv)
+
+    options = {}
+    for item in args.option:
+        key, _, value = item.partition("=")
+        try:
+            options[key] = json.loads(value)
+        except ValueError:
+            options[key] = value
+
+    def report(stats):
+        print(format_progress(stats), file=sys.stderr, flush=True)
+
+    runner = BatchRunner(model=args.model, concurrency=args.concurrency,
+                         checkpoint_every=args.checkpoint_every, progress=report,
+                         report_interval=args.report_interval, host=args.host,
+                         group_by_model=args.group_by_model, reorder_window=args.reorder_window,
+                         max_defer=args.max_defer, retries=args.retries, **options)
+    try:
+        stats = runner.run(args.input, args.output, resume=not args.restart,
+                           retry_errors=args.retry_errors)
+    except KeyboardInterrupt:
+        print("Interrupted; rerun the same command to resume.", file=sys.stderr)
+        return 130
+    return 1 if stats["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+# cascade.py
+import json
+import threading
+import time
+
+from .schema import validate
+
+
+# Acceptance checks take (content, data) where data is the final response
+# dict, and return True to accept or a string explaining the rejection.
+
+def json_check():
+    """Accept only responses that parse as JSON."""
+    def check(content, data):
+        try:
+            json.loads(content)
+        except ValueError as e:
+            return f"invalid JSON: {e}"
+        return True
+    return check
+
+
+def schema_check(schema):
+    """Accept only JSON responses that satisfy a JSON Schema."""
+    def check(content, data):
+        try:
+            value = json.loads(content)
+        except ValueError as e:
+            return f"invalid JSON: {e}"
+        error = validate(value, schema)
+        return error or True
+    return check
+
+
+def logprob_check(threshold):
+    """
+    Accept responses whose mean token log-probability is at least threshold.
+
+    Requires the server to return logprobs, i.e. call the cascade with
+    logprobs=True on an Ollama version that supports it. Responses without
+    logprobs are rejected so they escalate rather than pass unchecked.
+    """
+    def check(content, data):
+        logprobs = [t.get("logprob") for t in data.get("logprobs") or []]
+        logprobs = [lp for lp in logprobs if lp is not None]
+        if not logprobs:
+            return "no logprobs in response"
+        mean = sum(logprobs) / len(logprobs)
+        if mean < threshold:
+            return f"mean logprob {mean:.3f} below {threshold}"
+        return True
+    return check
+
+
+def validator_check(func):
+    """Wrap a predicate over the response text as an acceptance check."""
+    def check(content, data):
+        try:
+            ok = func(content)
+        except Exception as e:
+            return f"validator raised {e!r}"
+        return True if ok else "rejected by validator"
+    return check
+
+
+def all_checks(*checks):
+    """Accept only if every check accepts; report the first rejection."""
+    def check(content, data):
+        for c in checks:
+            result = c(content, data)
+            if result is not True:
+                return result
+        return True
+    return check
+
+
+class TierResult:
+    """Outcome of one model attempt within a cascade."""
+
+    def __init__(self, model, content, accepted, reason, latency, data):
+        self.model = model
+        self.content = content
+        self.accepted = accepted
+        self.reason = reason
+        self.latency = latency
+        self.eval_count = data.get("eval_count", 0)
+        self.prompt_eval_count = data.get("prompt_eval_count", 0)
+        # Server-side compute time; the closest proxy Ollama reports for CPU-seconds
+        self.server_seconds = data.get("total_duration", 0) / 1e9
+
+    def __repr__(self):
+        status = "accepted" if self.accepted else f"rejected ({self.reason})"
+        return f"<TierResult {self.model} {status} {self.latency:.2f}s>"
+
+
+class CascadeResult:
+    """Final answer of a cascade plus the per-tier attempts that produced it."""
+
+    def __init__(self, tiers):
+        self.tiers = tiers
+        final = tiers[-1]
+        self.content = final.content
+        self.model = final.model
+        self.accepted = final.accepted
+
+    @property
+    def latency(self):
+        return sum(t.latency for t in self.tiers)
+
+    @property
+    def server_seconds(self):
+        return sum(t.server_seconds for t in self.tiers)
+
+
+class Cascade:
+    """
+    Answer with the cheapest model that passes an acceptance check.
+
+    Tiers are tried in order; a response is returned as soon as one passes
+    ``accept``, otherwise the next (larger) model is asked. The last tier's
+    answer is returned even if rejected. Per-tier counts, latency and server
+    time accumulate in ``stats``.
+
+    Args:
+        tiers: Model names ordered from cheapest to most capable
+        accept: Acceptance check (see json_check, schema_check, logprob_check,
+                validator_check, all_checks); None accepts everything
+    """
+
+    def __init__(self, tiers, accept=None):
+        if not tiers:
+            raise ValueError("At least one tier is required")
+        self.tiers = list(tiers)
+        self.accept = accept
+        self._lock = threading.Lock()
+        self.stats = {model: {"calls": 0, "accepted": 0, "errors": 0, "latency": 0.0,
+                              "server_seconds": 0.0, "eval_count": 0}
+                      for model in self.tiers}
+
+    def _record(self, result, error=False):
+        with self._lock:
+            s = self.stats[result.model]
+            s["calls"] += 1
+            s["accepted"] += result.accepted
+            s["errors"] += error
+            s["latency"] += result.latency
+            s["server_seconds"] += result.server_seconds
+            s["eval_count"] += result.eval_count
+
+    def chat(self, messages, **kwargs):
+        """
+        Run the cascade over chat_with_model.
+
+        Args:
+            messages: List of chat messages
+            **kwargs: Passed through to chat_with_model for every tier
+
+        Returns:
+            CascadeResult
+        """
+        from .chat import chat_with_model
+        return self._run(lambda model, on_done: chat_with_model(
+            model, messages, on_done=on_done, **kwargs))
+
+    def generate(self, prompt, **kwargs):
+        """Run the cascade over generate_with_model. Returns a CascadeResult."""
+        from .chat import generate_with_model
+        return self._run(lambda model, on_done: generate_with_model(
+            model, prompt, on_done=on_done, **kwargs))
+
+    def _run(self, call):
+        attempts = []
+        for i, model in enumerate(self.tiers):
+            final = []
+            started = time.perf_counter()
+            content = call(model, final.append)
+            latency = time.perf_counter() - started
+            if not final:
+                # No final response: the call failed and content is the error string
+                result = TierResult(model, content, False, content, latency, {})
+                self._record(result, error=True)
+            else:
+                verdict = self.accept(content, final[0]) if self.accept else True
+                accepted = verdict is True
+                result = TierResult(model, content, accepted,
+                                    None if accepted else verdict, latency, final[0])
+                self._record(result)
+            attempts.append(result)
+            if result.accepted:
+                break
+        return CascadeResult(attempts)
+
+    def report(self):
+        """Per-tier summary: calls, acceptance rate, mean latency and server seconds."""
+        with self._lock:
+            rows = []
+            for model in self.tiers:
+                s = self.stats[model]
+                calls = s["calls"] or 1
+                rows.append({
+                    "model": model,
+                    "calls": s["calls"],
+                    "accepted": s["accepted"],
+                    "errors": s["errors"],
+                    "acceptance_rate": s["accepted"] / calls,
+                    "mean_latency": s["latency"] / calls,
+                    "mean_server_seconds": s["server_seconds"] / calls,
+                    "total_server_seconds": s["server_seconds"],
+                })
+            return rows
@@ -0,0 +1,261 @@
+# cassette.py
+import contextlib
+import gzip
+import json
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import requests
+
+from .transport import Transport, get_transport, use_transport
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _request_key(method, url, kwargs):
+    """Identify a request by method, API path and canonical JSON body."""
+    body = kwargs.get("json")
+    if body is None and kwargs.get("data") is not None:
+        data = kwargs["data"]
+        try:
+            body = json.loads(data)
+        except (TypeError, ValueError):
+            body = data.decode("utf-8", "replace") if isinstance(data, bytes) else str(data)
+    return json.dumps([method.upper(), urlsplit(url).path, body], sort_keys=True)
+
+
+def _materialize_body(kwargs):
+    # A streamed (generator) body can only be read once: keep the bytes for both
+    # the key and the real request
+    data = kwargs.get("data")
+    if data is not None and not isinstance(data, (bytes, str, dict, list)):
+        kwargs = dict(kwargs)
+        kwargs["data"] = b"".join(data)
+    return kwargs
+
+
+class _RecordingResponse:
+    """Wraps a live response and records its body with inter-line timing."""
+
+    def __init__(self, response, entry, started, save):
+        self._response = response
+        self._entry = entry
+        self._last = started
+        self._save = save
+        self._saved = False
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def _finish(self):
+        if not self._saved:
+            self._saved = True
+            self._save(self._entry)
+
+    def iter_lines(self, *args, **kwargs):
+        chunks = self._entry.setdefault("chunks", [])
+        try:
+            for line in self._response.iter_lines(*args, **kwargs):
+                now = time.perf_counter()
+                chunks.append([round((now - self._last) * 1000, 1),
+                               line.decode("utf-8") if isinstance(line, bytes) else line])
+                self._last = now
+                yield line
+        finally:
+            self._finish()
+
+    def json(self, **kwargs):
+        self._record_body()
+        return self._response.json(**kwargs)
+
+    @property
+    def text(self):
+        self._record_body()
+        return self._response.text
+
+    @property
+    def content(self):
+        self._record_body()
+        return self._response.content
+
+    def _record_body(self):
+        if "body" not in self._entry and "chunks" not in self._entry:
+            self._entry["body"] = self._response.text
+            self._finish()
+
+    def close(self):
+        self._finish()
+        self._response.close()
+
+
+class RecordingTransport(Transport):
+    """
+    Transport that forwards to a real transport and appends every exchange to
+    a cassette file: the request, status, time to headers and each streamed
+    line with the delay before it. Paths ending in ".gz" are compressed.
+    """
+
+    def __init__(self, inner, path):
+        self.inner = inner
+        self.base_url = inner.base_url
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = _open(path, "a")
+
+    def _save(self, entry):
+        with self._lock:
+            self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            self._file.flush()
+
+    def request(self, method, url, **kwargs):
+        kwargs = _materialize_body(kwargs)
+        entry = {"key": _request_key(method, url, kwargs)}
+        started = time.perf_counter()
+        send = getattr(self.inner, method.lower(), None)
+        if send is not None:
+            response = send(url, **kwargs)
+        else:
+            response = self.inner.request(method, url, **kwargs)
+        entry["status"] = response.status_code
+        entry["wait_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        recorder = _RecordingResponse(response, entry, time.perf_counter(), self._save)
+        if not kwargs.get("stream"):
+            recorder._record_body()
+        return recorder
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class CassetteResponse:
+    """A recorded response, replayed with scaled timing."""
+
+    def __init__(self, entry, url, speed):
+        self.status_code = entry["status"]
+        self.url = url
+        self._entry = entry
+        self._speed = speed
+        self._closed = False
+
+    def _sleep(self, ms):
+        if self._speed:
+            time.sleep(ms / 1000 / self._speed)
+
+    @property
+    def text(self):
+        if "body" in self._entry:
+            return self._entry["body"]
+        return "\n".join(line for _, line in self._entry.get("chunks", []))
+
+    @property
+    def content(self):
+        return self.text.encode("utf-8")
+
+    def json(self, **kwargs):
+        return json.loads(self.text, **kwargs)
+
+    def iter_lines(self, *args, **kwargs):
+        if "chunks" not in self._entry:
+            for line in self.text.splitlines():
+                yield line.encode("utf-8")
+            return
+        for delay, line in self._entry["chunks"]:
+            if self._closed:
+                return
+            self._sleep(delay)
+            yield line.encode("utf-8")
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}",
+                                     response=self)
+
+    def close(self):
+        self._closed = True
+
+
+class ReplayTransport(Transport):
+    """
+    Transport that serves responses from a cassette without any server.
+
+    Requests are matched on method, path and JSON body; repeated identical
+    requests get the recorded responses in order, then wrap around when loop
+    is True (useful for load tests). Unmatched requests fall back to the
+    recordings for the same method and path when strict is False.
+
+    Args:
+        path: Cassette file written by RecordingTransport
+        speed: 1.0 replays at recorded speed, 10 ten times faster,
+               0 or None instantly
+        loop: Reuse recordings once exhausted
+        strict: Raise instead of falling back for unmatched requests
+    """
+
+    base_url = "http://cassette"
+
+    def __init__(self, path, speed=1.0, loop=True, strict=False):
+        self.speed = speed
+        self.loop = loop
+        self.strict = strict
+        self._lock = threading.Lock()
+        self._exact = defaultdict(list)
+        self._by_path = defaultdict(list)
+        self._cursors = defaultdict(int)
+        with _open(path, "r") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    method, api_path, _ = json.loads(entry["key"])
+                    self._exact[entry["key"]].append(entry)
+                    self._by_path[(method, api_path)].append(entry)
+
+    def _next(self, bucket, entries):
+        with self._lock:
+            i = self._cursors[bucket]
+            if i >= len(entries):
+                if not self.loop:
+                    return None
+                i = i % len(entries)
+            self._cursors[bucket] = i + 1
+            return entries[i]
+
+    def request(self, method, url, **kwargs):
+        kwargs = _materialize_body(kwargs)
+        key = _request_key(method, url, kwargs)
+        entry = None
+        if key in self._exact:
+            entry = self._next(key, self._exact[key])
+        elif not self.strict:
+            fallback = (method.upper(), urlsplit(url).path)
+            if fallback in self._by_path:
+                entry = self._next(fallback, self._by_path[fallback])
+        if entry is None:
+            raise requests.ConnectionError(f"No cassette recording for {method} {url}")
+        response = CassetteResponse(entry, url, self.speed)
+        response._sleep(entry.get("wait_ms", 0))
+        return response
+
+
+@contextlib.contextmanager
+def record(path, host=None):
+    """Record every request made inside the block to a cassette file."""
+    transport = RecordingTransport(get_transport(host), path)
+    try:
+        with use_transport(transport):
+            yield transport
+    finally:
+        transport.close()
+
+
+@contextlib.contextmanager
+def replay(path, speed=1.0, loop=True, strict=False):
+    """Serve every request made inside the block from a cassette file."""
+    with use_transport(ReplayTransport(path, speed=speed, loop=loop, strict=strict)) as t:
+        yield t
@@ -2,96 +2,370 @@
 import requests
 import json
 
-def chat_with_model(model_name, messages, stream=False, **kwargs):
+from . import autotune, hooks, stopping
+from .coalesce import make_coalescer
+from .encoding import EncodedMessages
+from .images import encode_image, resolve_images
+from .transport import get_transport
+
+# Request fields that Ollama expects at the top level rather than in "options"
+TOP_LEVEL_FIELDS = ("format", "keep_alive", "logprobs", "top_logprobs", "think", "tools")
+EMBED_TOP_LEVEL_FIELDS = ("keep_alive", "truncate", "dimensions")
+
+def _apply_kwargs(payload, kwargs, fields=TOP_LEVEL_FIELDS):
+    """Add top-level request fields and model options from **kwargs to payload."""
+    options = {}
+    for key, value in kwargs.items():
+        if key in fields:
+            payload[key] = value
+        else:
+            options[key] = value
+    if options:
+        payload["options"] = options
+
+def _chat_content(chunk):
+    return chunk.get("message", {}).get("content")
+
+def _generate_content(chunk):
+    return chunk.get("response")
+
+def _stopped_chunk(chunk, received, saved):
+    """Final response dict for a stream ended by a stop predicate."""
+    final = dict(chunk, done=True, done_reason="stop_predicate",
+                 eval_count=received, tokens_saved=saved)
+    if "message" in chunk:
+        final["message"] = dict(chunk["message"], content="")
+    elif "response" in chunk:
+        final["response"] = ""
+    return final
+
+def _iter_stream(response, extract, call, on_done, stop=None, model_name=None,
+                 num_predict=None, coalescer=None, stopped=None):
+    """
+    Yield the text of each streamed NDJSON chunk, firing hooks and on_done.
+
+    With stop predicates, the text is cut where one fires and the stream is
+    closed at once, so the server stops generating. Text already yielded
+    cannot be taken back: if a predicate cuts before the start of the latest
+    chunk, the earlier chunks past the cut have been streamed, so the full
+    text up to the cut is appended to the stopped list for callers that
+    join the result. With a Coalescer, chunks after the first are merged
+    into larger pieces before they are yielded; "chunk" hooks still fire
+    once per chunk received.
+    """
+    batch = coalescer.batch() if coalescer is not None else None
+    first = True
+    finished = False
+    tool_calls = []
+    generated = ""
+    received = 0
+    try:
+        for line in response.iter_lines():
+            if line:
+                if first:
+                    first = False
+                    if call:
+                        hooks.emit("first_byte", call)
+                chunk = json.loads(line)
+                message = chunk.get("message")
+                if message and message.get("tool_calls"):
+                    tool_calls.extend(message["tool_calls"])
+                text = extract(chunk)
+                cut = None
+                if text and stop:
+                    received += 1
+                    start = len(generated)
+                    generated += text
+                    cut = stopping.check(stop, generated)
+                    if cut is not None:
+                        text = generated[start:cut] if cut > start else ""
+                        if stopped is not None:
+                            stopped.append(generated[:cut])
+                # Hooks see every chunk as received, before any coalescing
+                if text and call:
+                    hooks.emit("chunk", call, text=text)
+                if text and batch is not None:
+                    text = batch.add(text)
+                if text:
+                    yield text
+                if batch is not None and (cut is not None or chunk.get("done")):
+                    text = batch.flush()
+                    if text:
+                        yield text
+                if cut is not None and not chunk.get("done"):
+                    finished = True
+                    saved = stopping.record_stop(model_name, received, num_predict)
+                    chunk = _stopped_chunk(chunk, received, saved)
+                if chunk.get("done"):
+                    finished = True
+                    # Tool calls arrive in earlier chunks; hand them all to on_done
+                    if tool_calls and not chunk.get("message", {}).get("tool_calls"):
+                        chunk.setdefault("message", {})["tool_calls"] = tool_calls
+                    if chunk.get("done_reason") != "stop_predicate":
+                        stopping.record_completion(model_name, chunk.get("eval_count"))
+                    hooks.emit("done", call, data=chunk)
+                    if on_done:
+                        on_done(chunk)
+                    if cut is not None:
+                        break
+        if not finished:
+            text = batch.flush() if batch is not None else ""
+            if text:
+                yield text
+            hooks.emit("done", call, data=None)
+            finished = True
+    except Exception as e:
+        finished = True
+        hooks.emit("error", call, error=e)
+        raise
+    finally:
+        if not finished:
+            # Closed by the consumer before the end; still finish the call for listeners
+            hooks.emit("done", call, data=None, cancelled=True)
+        # Release the connection so an abandoned stream stops the server generating
+        response.close()
+
+class _Stream:
+    """
+    Iterator over _iter_stream that finishes the call when exhausted, closed
+    or garbage collected, including when it is never iterated (a generator's
+    finally block only runs once it has started).
+    """
+
+    def __init__(self, chunks, response, call):
+        self._chunks = chunks
+        self._response = response
+        self._call = call
+        self._started = False
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self._started = True
+        return next(self._chunks)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._started:
+            self._chunks.close()
+            return
+        self._chunks.close()
+        hooks.emit("done", self._call, data=None, cancelled=True)
+        self._response.close()
+
+    def __del__(self):
+        self.close()
+
+
+def chat_with_model(model_name, messages, stream=False, on_done=None, host=None,
+                    **kwargs):
     """
     Interact with a model via Ollama's /api/chat endpoint.
     
     Args:
         model_name: Name of the model to use
-        messages: List of {"role": "user"|"assistant", "content": "..."}
-        stream: If True, returns a generator of response chunks
-        **kwargs: Additional parameters (temperature, top_p, top_k, etc.)
+        messages: List of {"role": "user"|"assistant", "content": "..."};
+                  an "images" list may hold paths, bytes, file objects or
+                  base64 strings; an EncodedMessages list is sent from its
+                  cached encoding
+        stream: If True, returns an iterator of response chunks
+        on_done: Optional callback receiving the final response dict
+                 (token counts and timings such as prompt_eval_count; any
+                 tool calls are in its message["tool_calls"])
+        host: Ollama server URL (defaults to $OLLAMA_HOST or http://localhost:11434;
+              "unix:///path" connects over a Unix domain socket)
+        **kwargs: Additional parameters (temperature, top_p, top_k, etc.);
+                  format, keep_alive, logprobs, top_logprobs, think and tools
+                  are sent as top-level request fields; stop_when (a regex,
+                  max chars, callable or list of these, see stopping) ends
+                  the response early on the client (a stream may already
+                  have yielded text past a cut inside an earlier chunk); num_ctx, num_batch and
+                  num_thread not given are taken from the model's autotune
+                  profile for this host, if any; coalesce (an int of
+                  characters, a float of seconds, "word", "line" or a
+                  Coalescer) merges streamed chunks into larger pieces
     
     Returns:
         If stream=False: Complete response content as string
-        If stream=True: Generator yielding response chunks
+        If stream=True: Iterator yielding response chunks; close() it to stop early
     """
+    call = None
+    stop = stopping.compile_stop(kwargs.pop("stop_when", None))
+    coalescer = make_coalescer(kwargs.pop("coalesce", None))
+    # Tuned num_ctx/num_batch/num_thread for this model and host, unless given
+    autotune.apply_profile(model_name, host, kwargs)
+    # Stop predicates need the text as it is generated
+    streaming = stream or bool(stop)
     try:
+        if not isinstance(messages, EncodedMessages):
+            messages = resolve_images(messages)
         payload = {
             "model": model_name,
             "messages": messages,
-            "stream": stream
+            "stream": streaming
         }
         
         # Add any additional parameters
-        if kwargs:
-            payload["options"] = kwargs
+        _apply_kwargs(payload, kwargs)
         
-        response = requests.post("http://localhost:11434/api/chat", 
-                               json=payload,
-                               stream=stream)
+        transport = get_transport(host)
+        url = transport.url("/api/chat")
+        call = hooks.start("chat", url, model_name)
+        if isinstance(messages, EncodedMessages):
+            # Stream the body from cached per-message JSON instead of re-encoding it
+            del payload["messages"]
+            response = transport.post(url,
+                                   data=messages.body(payload),
+                                   headers={"Content-Type": "application/json"},
+                                   stream=streaming)
+        else:
+            response = transport.post(url, 
+                                   json=payload,
+                                   stream=streaming)
+        if call:
+            hooks.emit("connection", call, status=response.status_code)
         response.raise_for_status()
         
-        if stream:
-            # Return generator for streaming responses
-            def generate():
-                for line in response.iter_lines():
-                    if line:
-                        chunk = json.loads(line)
-                        if chunk.get("message", {}).get("content"):
-                            yield chunk["message"]["content"]
-            return generate()
+        if streaming:
+            stopped = []
+            chunks = _iter_stream(response, _chat_content, call, on_done, stop,
+                                  model_name, kwargs.get("num_predict"), coalescer, stopped)
+            if stream:
+                # Return an iterator for streaming responses
+                return _Stream(chunks, response, call)
+            text = "".join(chunks)
+            return stopped[0] if stopped else text
         else:
             # Return complete response
-            return response.json()["message"]["content"]
+            data = response.json()
+            hooks.emit("done", call, data=data)
+            stopping.record_completion(model_name, data.get("eval_count"))
+            if on_done:
+                on_done(data)
+            return data["message"]["content"]
     except requests.RequestException as e:
+        hooks.emit("error", call, error=e)
         if hasattr(e, 'response') and e.response is not None:
             return f"Chat error ({e.response.status_code}): {e.response.text}"
         return f"Chat error: {e}"
 
-def generate_with_model(model_name, prompt, stream=False, **kwargs):
+def generate_with_model(model_name, prompt, stream=False, on_done=None, host=None,
+                        **kwargs):
     """
     Generate a response from a model using the /api/generate endpoint.
     
     Args:
         model_name: Name of the model to use
         prompt: Text prompt for generation
-        stream: If True, returns a generator of response chunks
-        **kwargs: Additional parameters (temperature, top_p, top_k, etc.)
+        stream: If True, returns an iterator of response chunks
+        on_done: Optional callback receiving the final response dict
+                 (token counts and timings such as eval_count)
+        host: Ollama server URL (defaults to $OLLAMA_HOST or http://localhost:11434;
+              "unix:///path" connects over a Unix domain socket)
+        **kwargs: Additional parameters (temperature, top_p, top_k, etc.);
+                  format, keep_alive, logprobs, top_logprobs and think are
+                  sent as top-level request fields; images (paths, bytes,
+                  file objects or base64 strings) are encoded and cached;
+                  stop_when, coalesce and autotune profiles work as in
+                  chat_with_model
     
     Returns:
         If stream=False: Complete response as string
-        If stream=True: Generator yielding response chunks
+        If stream=True: Iterator yielding response chunks; close() it to stop early
     """
+    call = None
+    stop = stopping.compile_stop(kwargs.pop("stop_when", None))
+    coalescer = make_coalescer(kwargs.pop("coalesce", None))
+    # Tuned num_ctx/num_batch/num_thread for this model and host, unless given
+    autotune.apply_profile(model_name, host, kwargs)
+    streaming = stream or bool(stop)
     try:
         payload = {
             "model": model_name,
             "prompt": prompt,
-            "stream": stream
+            "stream": streaming
         }
+        images = kwargs.pop("images", None)
+        if images:
+            payload["images"] = [encode_image(image) for image in images]
         
         # Add any additional parameters
-        if kwargs:
-            payload["options"] = kwargs
+        _apply_kwargs(payload, kwargs)
             
-        response = requests.post("http://localhost:11434/api/generate", 
+        transport = get_transport(host)
+        url = transport.url("/api/generate")
+        call = hooks.start("generate", url, model_name)
+        response = transport.post(url, 
                                json=payload,
-                               stream=stream)
+                               stream=streaming)
+        if call:
+            hooks.emit("connection", call, status=response.status_code)
         response.raise_for_status()
         
-        if stream:
-            # Return generator for streaming responses
-            def generate():
-                for line in response.iter_lines():
-                    if line:
-                        chunk = json.loads(line)
-                        if chunk.get("response"):
-                            yield chunk["response"]
-            return generate()
+        if streaming:
+            stopped = []
+            chunks = _iter_stream(response, _generate_content, call, on_done, stop,
+                                  model_name, kwargs.get("num_predict"), coalescer, stopped)
+            if stream:
+                # Return an iterator for streaming responses
+                return _Stream(chunks, response, call)
+            text = "".join(chunks)
+            return stopped[0] if stopped else text
         else:
             # Return complete response
-            return response.json()["response"]
+            data = response.json()
+            hooks.emit("done", call, data=data)
+            stopping.record_completion(model_name, data.get("eval_count"))
+            if on_done:
+                on_done(data)
+            return data["response"]
     except requests.RequestException as e:
+        hooks.emit("error", call, error=e)
         if hasattr(e, 'response') and e.response is not None:
             return f"Generation error ({e.response.status_code}): {e.response.text}"
         return f"Generation error: {e}"
+
+def embed_with_model(model_name, input, on_done=None, host=None, **kwargs):
+    """
+    Embed text using the /api/embed endpoint.
+    
+    Args:
+        model_name: Name of an embedding model (e.g. "nomic-embed-text")
+        input: A string or a list of strings
+        on_done: Optional callback receiving the full response dict
+        host: Ollama server URL (defaults to $OLLAMA_HOST or http://localhost:11434)
+        **kwargs: Model options; keep_alive, truncate and dimensions are sent
+                  as top-level request fields
+    
+    Returns:
+        List of embedding vectors (one per input string), or an error string
+    """
+    call = None
+    try:
+        payload = {
+            "model": model_name,
+            "input": input
+        }
+        _apply_kwargs(payload, kwargs, EMBED_TOP_LEVEL_FIELDS)
+        
+        transport = get_transport(host)
+        url = transport.url("/api/embed")
+        call = hooks.start("embed", url, model_name)
+        response = transport.post(url, json=payload)
+        if call:
+            hooks.emit("connection", call, status=response.status_code)
+        response.raise_for_status()
+        data = response.json()
+        hooks.emit("done", call, data=data)
+        if on_done:
+            on_done(data)
+        return data["embeddings"]
+    except requests.RequestException as e:
+        hooks.emit("error", call, error=e)
+        if hasattr(e, 'response') and e.response is not None:
+            return f"Embedding error ({e.response.status_code}): {e.response.text}"
+        return f"Embedding error: {e}"
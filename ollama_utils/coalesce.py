@@ -0,0 +1,136 @@
+# coalesce.py
+import time
+
+# Characters that end a unit for boundary coalescing
+BOUNDARIES = {"word": (" ", "\n", "\t"), "line": ("\n",)}
+
+
+class Coalescer:
+    """
+    Settings for merging streamed text chunks into fewer, larger pieces.
+
+    The first chunk is always passed through at once, so time to first token
+    is unchanged. After that, chunks are buffered and handed on when any
+    condition is met: min_chars are buffered, interval seconds have passed
+    since the last piece, or a word/line boundary arrives (text up to the
+    last boundary is released). The interval is checked as chunks arrive, so
+    a piece waits at most until the next chunk after the window; whatever is
+    buffered is released when the stream ends.
+
+    Args:
+        min_chars: Release once this many characters are buffered
+        interval: Release once this many seconds have passed since the last piece
+        boundary: "word" or "line" to release whole words or lines
+    """
+
+    def __init__(self, min_chars=None, interval=None, boundary=None):
+        if boundary is not None and boundary not in BOUNDARIES:
+            raise ValueError(f"boundary must be one of {tuple(BOUNDARIES)}")
+        if min_chars is None and interval is None and boundary is None:
+            raise ValueError("Give at least one of min_chars, interval or boundary")
+        self.min_chars = min_chars
+        self.interval = interval
+        self.boundary = boundary
+
+    def batch(self):
+        """Return the per-stream buffer used to coalesce one stream."""
+        return _Batch(self)
+
+    def wrap(self, chunks):
+        """Coalesce any iterable of text chunks."""
+        batch = self.batch()
+        for text in chunks:
+            piece = batch.add(text)
+            if piece:
+                yield piece
+        rest = batch.flush()
+        if rest:
+            yield rest
+
+
+class _Batch:
+    __slots__ = ("min_chars", "interval", "boundary", "parts", "size", "last", "first")
+
+    def __init__(self, coalescer):
+        self.min_chars = coalescer.min_chars
+        self.interval = coalescer.interval
+        self.boundary = coalescer.boundary
+        self.parts = []
+        self.size = 0
+        self.last = None
+        self.first = True
+
+    def _take(self, now=None):
+        text = "".join(self.parts)
+        self.parts = []
+        self.size = 0
+        if self.interval is not None:
+            self.last = time.monotonic() if now is None else now
+        return text
+
+    def add(self, text):
+        """Buffer a chunk; returns the text to hand on now, or None."""
+        if self.first:
+            self.first = False
+            if self.interval is not None:
+                self.last = time.monotonic()
+            return text
+        self.parts.append(text)
+        self.size += len(text)
+        if self.min_chars is not None and self.size >= self.min_chars:
+            return self._take()
+        if self.interval is not None:
+            now = time.monotonic()
+            if now - self.last >= self.interval:
+                return self._take(now)
+        if self.boundary is not None:
+            # Only the newest chunk can hold the last boundary in the buffer
+            if self.boundary == "line":
+                found = text.rfind("\n")
+                cut = found + 1
+            else:
+                # Release up to the whitespace that starts the last (unfinished) word
+                found = cut = max(text.rfind(" "), text.rfind("\n"), text.rfind("\t"))
+            if found >= 0 and (cut > 0 or len(self.parts) > 1):
+                self.parts.pop()
+                head = "".join(self.parts) + text[:cut]
+                rest = text[cut:]
+                self.parts = [rest] if rest else []
+                self.size = len(rest)
+                if self.interval is not None:
+                    self.last = time.monotonic()
+                return head
+        return None
+
+    def flush(self):
+        """Return whatever is still buffered ("" if nothing)."""
+        return self._take(self.last) if self.parts else ""
+
+
+def make_coalescer(spec):
+    """
+    Build a Coalescer from a coalesce argument.
+
+    Accepts None (no coalescing), an int (min_chars), a float (interval in
+    seconds), "word" or "line" (boundary), a dict of Coalescer arguments or
+    a Coalescer.
+    """
+    if spec is None or isinstance(spec, Coalescer):
+        return spec
+    if isinstance(spec, bool):
+        raise TypeError("coalesce must be an int, float, 'word', 'line', dict or Coalescer")
+    if isinstance(spec, int):
+        return Coalescer(min_chars=spec)
+    if isinstance(spec, float):
+        return Coalescer(interval=spec)
+    if isinstance(spec, str):
+        return Coalescer(boundary=spec)
+    if isinstance(spec, dict):
+        return Coalescer(**spec)
+    raise TypeError("coalesce must be an int, float, 'word', 'line', dict or Coalescer")
+
+
+def coalesce(chunks, spec):
+    """Coalesce an iterable of text chunks; spec is as for make_coalescer."""
+    coalescer = make_coalescer(spec)
+    return iter(chunks) if coalescer is None else coalescer.wrap(chunks)
@@ -0,0 +1,187 @@
+# compaction.py
+import hashlib
+import json
+import threading
+import time
+
+from .context import default_estimator
+
+SUMMARY_INSTRUCTIONS = (
+    "Summarize the conversation so far for your own future reference. Keep every "
+    "fact, name, number, decision and open question the user may refer back to. "
+    "Be concise and do not add anything that was not said."
+)
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+
+def _message_key(message):
+    return json.dumps([message.get("role"), message.get("content")]).encode("utf-8")
+
+
+class HistoryCompactor:
+    """
+    Keeps chat prompts near a constant size by summarizing older turns.
+
+    Once the turns not yet covered by a summary exceed ``threshold`` tokens,
+    everything except the last ``keep_recent`` messages is summarized by
+    ``summary_model`` in a background thread, folding in the previous summary
+    so each summarization only reads the newly aged-out turns. Until the
+    summary is ready, compact() keeps using the previous one and sends the
+    uncovered turns verbatim, so no request waits on summarization; at most
+    one summary per conversation is in flight.
+
+    A summary is anchored to the last message it covers (identified by that
+    message and the one before it), not to the start of the history, so it
+    still applies when the history is a sliding window such as
+    Conversation.recent(), and the same history (e.g. across Streamlit reruns)
+    is never summarized twice. If the anchor is no longer in the history the
+    summary is not used. Leading system messages are always kept.
+
+    Args:
+        summary_model: Small model used to write summaries
+        threshold: Uncovered history size in tokens that triggers summarization
+        keep_recent: Most recent messages always sent verbatim
+        background: Summarize in a background thread (False summarizes inline)
+        estimator: TokenEstimator used for sizes (defaults to the shared estimator)
+        max_cached: Conversations whose latest summary is kept
+        host: Ollama server URL for summary requests
+        **options: Model options for summary requests (temperature, num_predict, etc.)
+    """
+
+    def __init__(self, summary_model, threshold=1500, keep_recent=6, background=True,
+                 estimator=None, max_cached=64, host=None, **options):
+        self.summary_model = summary_model
+        self.threshold = threshold
+        self.keep_recent = keep_recent
+        self.background = background
+        self.estimator = estimator or default_estimator
+        self.max_cached = max_cached
+        self.host = host
+        self.options = options
+        # conversation id -> {"anchor", "summary", "running"}
+        self._conversations = {}
+        self._threads = []
+        self._lock = threading.Lock()
+        self.stats = {"turns": 0, "summaries": 0, "summary_errors": 0, "summary_seconds": 0.0,
+                      "prompt_tokens_before": 0, "prompt_tokens_after": 0,
+                      "tokens_saved": 0, "last_tokens_saved": 0}
+
+    def _split_system(self, messages):
+        head = 0
+        while head < len(messages) and messages[head].get("role") == "system":
+            head += 1
+        return list(messages[:head]), list(messages[head:])
+
+    def _anchor(self, turns, index):
+        """Key of the boundary after turns[index]: that message and the one before it."""
+        hasher = hashlib.sha1()
+        if index > 0:
+            hasher.update(_message_key(turns[index - 1]))
+        hasher.update(_message_key(turns[index]))
+        return hasher.hexdigest()
+
+    def _covered(self, conversation_id, turns):
+        """Return (count, summary) for the conversation's summary, or (0, None)."""
+        with self._lock:
+            state = self._conversations.get(conversation_id)
+            if state is None or state["summary"] is None:
+                return 0, None
+            anchor, summary = state["anchor"], state["summary"]
+        for index in range(len(turns) - 1, -1, -1):
+            if self._anchor(turns, index) == anchor:
+                return index + 1, summary
+        return 0, None
+
+    def compact(self, model_name, messages, conversation_id=None):
+        """
+        Return the messages to send: system messages, the latest summary and
+        the turns it does not cover. May start a background summarization.
+
+        Pass conversation_id when one compactor serves several conversations.
+        """
+        system, turns = self._split_system(messages)
+        covered, summary = self._covered(conversation_id, turns)
+
+        split = len(turns) - self.keep_recent
+        uncovered = turns[covered:split] if split > covered else []
+        if uncovered and self.estimator.estimate_messages(uncovered, model_name) >= self.threshold:
+            self._schedule(conversation_id, uncovered, summary, self._anchor(turns, split - 1))
+            if not self.background:
+                covered, summary = self._covered(conversation_id, turns)
+
+        result = system
+        if summary is not None:
+            result = result + [{"role": "system", "content": SUMMARY_PREFIX + summary}]
+        result = result + turns[covered:]
+
+        before = self.estimator.estimate_messages(messages, model_name)
+        after = self.estimator.estimate_messages(result, model_name)
+        with self._lock:
+            self.stats["turns"] += 1
+            self.stats["prompt_tokens_before"] += before
+            self.stats["prompt_tokens_after"] += after
+            self.stats["tokens_saved"] += before - after
+            self.stats["last_tokens_saved"] = before - after
+        return result
+
+    def _schedule(self, conversation_id, new_turns, previous, anchor):
+        with self._lock:
+            state = self._conversations.get(conversation_id)
+            if state is None:
+                state = self._conversations[conversation_id] = {
+                    "anchor": None, "summary": None, "running": False}
+                while len(self._conversations) > self.max_cached:
+                    self._conversations.pop(next(iter(self._conversations)))
+            if state["running"]:
+                return
+            state["running"] = True
+        if not self.background:
+            self._summarize(state, new_turns, previous, anchor)
+            return
+        thread = threading.Thread(target=self._summarize,
+                                  args=(state, new_turns, previous, anchor), daemon=True)
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()] + [thread]
+        thread.start()
+
+    def _summarize(self, state, new_turns, previous, anchor):
+        from .chat import chat_with_model
+
+        transcript = "\n".join(f"{m.get('role')}: {m.get('content', '')}" for m in new_turns)
+        if previous:
+            transcript = f"Earlier summary:\n{previous}\n\nLater turns:\n{transcript}"
+        final = []
+        started = time.perf_counter()
+        try:
+            summary = chat_with_model(
+                self.summary_model,
+                [{"role": "system", "content": SUMMARY_INSTRUCTIONS},
+                 {"role": "user", "content": transcript}],
+                on_done=final.append, host=self.host, **self.options)
+        except Exception:
+            final = []
+        with self._lock:
+            state["running"] = False
+            self.stats["summary_seconds"] += time.perf_counter() - started
+            if not final:
+                # No final response dict means summary is the error string
+                self.stats["summary_errors"] += 1
+                return
+            self.stats["summaries"] += 1
+            state["anchor"] = anchor
+            state["summary"] = summary.strip()
+
+    def wait(self, timeout=None):
+        """Block until background summarizations finish."""
+        with self._lock:
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join(timeout)
+
+    def report(self):
+        """Turns compacted, summaries written and average prompt tokens saved per turn."""
+        with self._lock:
+            s = dict(self.stats)
+        turns = s["turns"] or 1
+        s["mean_tokens_saved"] = s["tokens_saved"] / turns
+        return s
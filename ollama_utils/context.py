@@ -0,0 +1,211 @@
+# context.py
+import re
+import threading
+
+import requests
+
+from . import hooks
+from .transport import get_transport
+
+DEFAULT_NUM_CTX = 2048
+DEFAULT_CHARS_PER_TOKEN = 4.0
+# Per-message framing tokens added by chat templates (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_context_lengths = {}
+_context_lock = threading.Lock()
+
+
+def get_context_length(model_name, default=DEFAULT_NUM_CTX, host=None):
+    """
+    Return the context window Ollama will use for a model, cached per model.
+
+    The window is the Modelfile's num_ctx parameter if set, otherwise Ollama's
+    default, capped by the model's trained context length. Lookup failures
+    return the default without caching so the next call retries.
+    """
+    with _context_lock:
+        if model_name in _context_lengths:
+            return _context_lengths[model_name]
+    transport = get_transport(host)
+    url = transport.url("/api/show")
+    call = hooks.start("show", url, model_name)
+    try:
+        response = transport.post(url, json={
+            "model": model_name
+        })
+        hooks.emit("connection", call, status=response.status_code)
+        response.raise_for_status()
+        info = response.json()
+        hooks.emit("done", call)
+    except requests.exceptions.RequestException as e:
+        hooks.emit("error", call, error=e)
+        return default
+
+    num_ctx = default
+    match = re.search(r"^\s*num_ctx\s+(\d+)", info.get("parameters", ""), re.MULTILINE)
+    if match:
+        num_ctx = int(match.group(1))
+    for key, value in info.get("model_info", {}).items():
+        if key.endswith(".context_length") and isinstance(value, int):
+            num_ctx = min(num_ctx, value)
+            break
+
+    with _context_lock:
+        _context_lengths[model_name] = num_ctx
+    return num_ctx
+
+
+def set_context_length(model_name, num_ctx):
+    """Override the cached context length (e.g. when passing num_ctx per request)."""
+    with _context_lock:
+        _context_lengths[model_name] = num_ctx
+
+
+class TokenEstimator:
+    """
+    Character-based token estimator calibrated per model from server counts.
+
+    Each model starts at DEFAULT_CHARS_PER_TOKEN; observe() folds the
+    server-reported prompt_eval_count into a moving average. Ollama only
+    counts the part of the prompt not already in its KV cache, so only counts
+    for prompts evaluated in full are used: a count lower than the previous
+    one for a prompt at least as long, or below half the current estimate,
+    means a cached prefix was skipped and the sample is dropped.
+    """
+
+    def __init__(self, chars_per_token=DEFAULT_CHARS_PER_TOKEN, alpha=0.2):
+        self.default_ratio = chars_per_token
+        self.alpha = alpha
+        self._ratios = {}
+        # Last fully evaluated prompt per model: (characters, tokens)
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def ratio(self, model_name=None):
+        """Current characters-per-token estimate for a model."""
+        return self._ratios.get(model_name, self.default_ratio)
+
+    def estimate(self, text, model_name=None):
+        """Estimate the token count of a piece of text."""
+        if not text:
+            return 0
+        return int(len(text) / self.ratio(model_name)) + 1
+
+    def estimate_message(self, message, model_name=None):
+        """Estimate the token count of one chat message, including framing."""
+        return self.estimate(message.get("content", ""), model_name) + MESSAGE_OVERHEAD_TOKENS
+
+    def estimate_messages(self, messages, model_name=None):
+        """Estimate the token count of a list of chat messages."""
+        return sum(self.estimate_message(m, model_name) for m in messages)
+
+    def observe(self, model_name, messages, prompt_eval_count):
+        """Calibrate the model's ratio from a server-reported prompt token count."""
+        if not prompt_eval_count:
+            return
+        framing = MESSAGE_OVERHEAD_TOKENS * len(messages)
+        tokens = prompt_eval_count - framing
+        chars = sum(len(m.get("content", "")) for m in messages)
+        if tokens <= 0 or chars == 0:
+            return
+        observed = chars / tokens
+        if not 1.0 <= observed <= 10.0:
+            return
+        with self._lock:
+            current = self._ratios.get(model_name, self.default_ratio)
+            last = self._last.get(model_name)
+            if last is not None and chars >= last[0] and tokens < last[1]:
+                return
+            if tokens < 0.5 * chars / current:
+                return
+            self._last[model_name] = (chars, tokens)
+            self._ratios[model_name] = current + self.alpha * (observed - current)
+
+
+default_estimator = TokenEstimator()
+
+
+def trim_messages(messages, budget, model_name=None, estimator=None,
+                  keep_system=True, pinned=None):
+    """
+    Drop the oldest messages until the estimated prompt fits in budget tokens.
+
+    The last message is always kept. System messages (if keep_system) and pinned
+    messages are never dropped, so the result can still exceed the budget when
+    they alone do.
+
+    Args:
+        messages: List of chat messages
+        budget: Maximum prompt size in tokens
+        model_name: Model used for token estimation
+        estimator: TokenEstimator to use (defaults to the shared estimator)
+        keep_system: Never drop messages with role "system"
+        pinned: Callable taking a message and returning True if it must be kept
+
+    Returns:
+        New list of messages in the original order
+    """
+    estimator = estimator or default_estimator
+    sizes = [estimator.estimate_message(m, model_name) for m in messages]
+    total = sum(sizes)
+    if total <= budget:
+        return list(messages)
+
+    keep = [True] * len(messages)
+    last = len(messages) - 1
+    for i, message in enumerate(messages):
+        if total <= budget:
+            break
+        if i == last:
+            continue
+        if keep_system and message.get("role") == "system":
+            continue
+        if pinned is not None and pinned(message):
+            continue
+        keep[i] = False
+        total -= sizes[i]
+    return [m for m, k in zip(messages, keep) if k]
+
+
+class ContextBudget:
+    """
+    Client-side context window budgeting for chat requests.
+
+    Args:
+        reserve: Tokens left free for the model's reply
+        keep_system: Never drop system messages when trimming
+        pinned: Callable marking messages that must never be dropped
+        estimator: TokenEstimator to use (defaults to the shared estimator)
+        context_length: Fixed window size; looked up per model if None
+    """
+
+    def __init__(self, reserve=512, keep_system=True, pinned=None,
+                 estimator=None, context_length=None):
+        self.reserve = reserve
+        self.keep_system = keep_system
+        self.pinned = pinned
+        self.estimator = estimator or default_estimator
+        self.context_length = context_length
+
+    def budget(self, model_name):
+        """Prompt token budget for a model."""
+        num_ctx = self.context_length or get_context_length(model_name)
+        return max(num_ctx - self.reserve, 0)
+
+    def fit(self, model_name, messages):
+        """Return the messages trimmed to fit the model's context window."""
+        return trim_messages(
+            messages,
+            self.budget(model_name),
+            model_name=model_name,
+            estimator=self.estimator,
+            keep_system=self.keep_system,
+            pinned=self.pinned,
+        )
+
+    def observer(self, model_name, messages):
+        """Return an on_done callback that calibrates the estimator."""
+        def on_done(data):
+            self.estimator.observe(model_name, messages, data.get("prompt_eval_count"))
+        return on_done
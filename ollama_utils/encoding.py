@@ -0,0 +1,87 @@
+# encoding.py
+import json
+
+from .images import resolve_message
+
+# Bytes gathered before a piece of the request body is handed to the socket
+BODY_CHUNK_SIZE = 64 * 1024
+
+
+def _encode(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class EncodedMessages(list):
+    """
+    A list of chat messages that remembers each message's JSON encoding.
+
+    chat_with_model sends an EncodedMessages history by streaming the cached
+    fragments instead of re-encoding the whole list, so each turn only
+    encodes the messages added since the last request. Fragments are cached
+    per message object and shared with slices and copies, so a trimmed or
+    extended history reuses them too.
+
+    Messages must not be modified in place after they have been sent; replace
+    the dict instead (or call forget(message)).
+    """
+
+    def __init__(self, messages=(), cache=None):
+        super().__init__(messages)
+        self.cache = {} if cache is None else cache
+
+    def __getitem__(self, index):
+        result = super().__getitem__(index)
+        if isinstance(index, slice):
+            return EncodedMessages(result, self.cache)
+        return result
+
+    def __add__(self, other):
+        return EncodedMessages(list.__add__(self, list(other)), self.cache)
+
+    def copy(self):
+        return EncodedMessages(self, self.cache)
+
+    def share(self, messages):
+        """Wrap another list of messages so it uses this cache."""
+        return EncodedMessages(messages, self.cache)
+
+    def fragment(self, message):
+        """Cached JSON bytes for one message."""
+        entry = self.cache.get(id(message))
+        if entry is None or entry[0] is not message:
+            # Images are base64-encoded here, once per message
+            entry = (message, _encode(resolve_message(message)))
+            self.cache[id(message)] = entry
+        return entry[1]
+
+    def forget(self, message):
+        """Drop the cached encoding of a message that was modified in place."""
+        self.cache.pop(id(message), None)
+
+    def _prune(self):
+        # Entries keep their message alive; drop those no longer in this list
+        if len(self.cache) > 2 * len(self) + 64:
+            live = {id(m) for m in self}
+            for key in [k for k in self.cache if k not in live]:
+                del self.cache[key]
+
+    def body(self, payload, chunk_size=BODY_CHUNK_SIZE):
+        """
+        Yield the request body for payload with these messages as "messages",
+        in pieces of about chunk_size bytes.
+        """
+        self._prune()
+        head = _encode(payload)
+        if head == b"{}":
+            buffer = bytearray(b'{"messages":[')
+        else:
+            buffer = bytearray(head[:-1] + b',"messages":[')
+        for i, message in enumerate(self):
+            if i:
+                buffer += b","
+            buffer += self.fragment(message)
+            if len(buffer) >= chunk_size:
+                yield bytes(buffer)
+                buffer = bytearray()
+        buffer += b"]}"
+        yield bytes(buffer)
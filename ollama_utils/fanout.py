@@ -0,0 +1,243 @@
+# fanout.py
+import threading
+
+
+class Subscription:
+    """
+    One consumer of a Broadcast. Iterate it from a thread (``for chunk in sub``)
+    or from an asyncio task (``async for chunk in sub``).
+    """
+
+    def __init__(self, broadcast, cursor):
+        self._broadcast = broadcast
+        self._cursor = cursor
+        self._floor = broadcast._end()
+        self._waiters = []
+        self.dropped = False
+        self.skipped = 0
+
+    def _ready(self):
+        """Return (chunk, done) without blocking; chunk is None if nothing is buffered."""
+        b = self._broadcast
+        if self.dropped:
+            return None, True
+        if self._cursor < b._end():
+            chunk = b._chunks[self._cursor - b._base]
+            self._cursor += 1
+            return chunk, False
+        return None, b._done
+
+    def get(self, timeout=None):
+        """
+        Return the next chunk, blocking until one is available.
+
+        Raises:
+            StopIteration: When the stream has finished or this subscriber was dropped
+            TimeoutError: If timeout elapses with no new chunk
+        """
+        b = self._broadcast
+        with b._cond:
+            while True:
+                chunk, done = self._ready()
+                if chunk is not None:
+                    b._trim()
+                    return chunk
+                if done:
+                    self._finish()
+                    raise StopIteration
+                if not b._cond.wait(timeout):
+                    raise TimeoutError("No chunk received within timeout")
+
+    def close(self):
+        """Unsubscribe; the producer stops buffering for this consumer."""
+        with self._broadcast._cond:
+            self._finish()
+
+    def _finish(self):
+        b = self._broadcast
+        if self in b._subscribers:
+            b._subscribers.remove(self)
+            b._trim()
+
+    def _wake(self):
+        # Called with the broadcast lock held
+        for loop, future in self._waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+        self._waiters = []
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.get()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        import asyncio
+
+        b = self._broadcast
+        while True:
+            with b._cond:
+                chunk, done = self._ready()
+                if chunk is not None:
+                    b._trim()
+                    return chunk
+                if done:
+                    self._finish()
+                    raise StopAsyncIteration
+                loop = asyncio.get_running_loop()
+                future = loop.create_future()
+                self._waiters.append((loop, future))
+            await future
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class Broadcast:
+    """
+    Tee one upstream stream of chunks to any number of subscribers.
+
+    The producer runs on its own thread and never waits for consumers. Each
+    subscriber may fall at most ``maxsize`` chunks behind; beyond that it is
+    either dropped or skipped forward to the newest chunks, depending on policy.
+
+    Args:
+        source: Iterable of chunks, e.g. chat_with_model(..., stream=True)
+        maxsize: Maximum number of unread chunks per subscriber
+        policy: "catchup" to skip a slow subscriber ahead, "drop" to disconnect it
+        replay: Keep every chunk so late subscribers can start from the beginning
+    """
+
+    def __init__(self, source, maxsize=256, policy="catchup", replay=True):
+        if policy not in ("catchup", "drop"):
+            raise ValueError("policy must be 'catchup' or 'drop'")
+        self._source = source
+        self.maxsize = maxsize
+        self.policy = policy
+        self.replay = replay
+        self._chunks = []
+        self._base = 0
+        self._subscribers = []
+        self._cond = threading.Condition()
+        self._done = False
+        self._stopped = False
+        self._thread = None
+        self.error = None
+
+    def _end(self):
+        return self._base + len(self._chunks)
+
+    def _trim(self):
+        # Without replay, forget chunks every live subscriber has already read
+        if self.replay or not self._chunks:
+            return
+        low = min((s._cursor for s in self._subscribers), default=self._end())
+        if low > self._base:
+            del self._chunks[:low - self._base]
+            self._base = low
+
+    def start(self):
+        """Start pulling from the source on a background thread. Returns self."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            for chunk in self._source:
+                if self._stopped:
+                    break
+                self._publish(chunk)
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._cond:
+                self._done = True
+                for sub in self._subscribers:
+                    sub._wake()
+                self._cond.notify_all()
+
+    def _publish(self, chunk):
+        with self._cond:
+            self._chunks.append(chunk)
+            end = self._end()
+            for sub in list(self._subscribers):
+                lag = end - max(sub._cursor, sub._floor)
+                if lag > self.maxsize:
+                    if self.policy == "drop":
+                        sub.dropped = True
+                        self._subscribers.remove(sub)
+                    else:
+                        target = end - self.maxsize
+                        sub.skipped += target - sub._cursor
+                        sub._cursor = target
+                sub._wake()
+            self._trim()
+            self._cond.notify_all()
+
+    def subscribe(self, replay=None):
+        """
+        Add a subscriber.
+
+        Args:
+            replay: Start from the first chunk instead of the live position
+                    (defaults to the broadcast's replay setting)
+
+        Returns:
+            Subscription to iterate over
+        """
+        replay = self.replay if replay is None else replay
+        if replay and not self.replay:
+            raise ValueError("Broadcast was created with replay=False")
+        with self._cond:
+            cursor = self._base if replay else self._end()
+            sub = Subscription(self, cursor)
+            self._subscribers.append(sub)
+            return sub
+
+    def stop(self):
+        """Stop reading from the source after the current chunk."""
+        self._stopped = True
+
+    def join(self, timeout=None):
+        """Wait for the producer thread to finish."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def done(self):
+        return self._done
+
+    @property
+    def text(self):
+        """Concatenation of all chunks received so far (requires replay)."""
+        with self._cond:
+            return "".join(self._chunks)
+
+
+def broadcast_chat(model_name, messages, maxsize=256, policy="catchup", replay=True, **kwargs):
+    """
+    Start one streaming chat generation and return a Broadcast of its chunks.
+
+    Args:
+        model_name: Name of the model to use
+        messages: List of {"role": "user"|"assistant", "content": "..."}
+        maxsize, policy, replay: See Broadcast
+        **kwargs: Passed through to chat_with_model
+
+    Returns:
+        A started Broadcast; call subscribe() for each consumer
+    """
+    from .chat import chat_with_model
+
+    source = chat_with_model(model_name, messages, stream=True, **kwargs)
+    if isinstance(source, str):
+        # chat_with_model reports errors as a plain string
+        source = [source]
+    return Broadcast(source, maxsize=maxsize, policy=policy, replay=replay).start()
@@ -0,0 +1,209 @@
+# health.py
+import threading
+import time
+
+import requests
+
+from .transport import get_transport, resolve_host
+
+
+class HostState:
+    """Last known state of one Ollama server."""
+
+    def __init__(self, host):
+        self.host = host
+        self.alive = False
+        self.version = None
+        self.installed = []
+        self.running = []
+        self.latency = None
+        self.checked_at = None
+        self.error = None
+        self.failures = 0
+
+    @property
+    def models(self):
+        """Names of installed models."""
+        return [m["name"] for m in self.installed]
+
+    @property
+    def loaded(self):
+        """Names of models currently in memory."""
+        return [m["name"] for m in self.running]
+
+    def as_dict(self):
+        return {"host": self.host, "alive": self.alive, "version": self.version,
+                "models": self.models, "loaded": self.loaded, "latency": self.latency,
+                "checked_at": self.checked_at, "error": self.error, "failures": self.failures}
+
+    def __repr__(self):
+        status = f"up {self.version}" if self.alive else f"down ({self.error})"
+        return f"<HostState {self.host} {status}>"
+
+
+class HealthProbe:
+    """
+    Polls Ollama servers in the background and caches their state.
+
+    Every interval, each host's /api/version (liveness, version and round-trip
+    latency), /api/ps (loaded models) and /api/tags (installed models) are
+    fetched with a short timeout. Readers such as model_selector, HedgedChat
+    and pick_host() use the cached state and never block on the network.
+
+    Install a probe with set_probe() (or start(default=True)) to make it the
+    one library helpers consult.
+
+    Args:
+        hosts: Server URLs to watch (default: the default host)
+        interval: Seconds between polls
+        timeout: Per-request timeout in seconds
+        planners: Optional {host: ResidencyPlanner} kept up to date from /api/ps
+    """
+
+    def __init__(self, hosts=None, interval=10.0, timeout=2.0, planners=None):
+        self.hosts = [resolve_host(h) for h in (hosts or [None])]
+        self.interval = interval
+        self.timeout = timeout
+        self.planners = {resolve_host(h): p for h, p in (planners or {}).items()}
+        self._states = {h: HostState(h) for h in self.hosts}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _get(self, host, path):
+        transport = get_transport(host)
+        response = transport.get(transport.url(path), timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def check(self, host):
+        """Poll one host now and return its updated HostState."""
+        host = resolve_host(host)
+        started = time.perf_counter()
+        try:
+            version = self._get(host, "/api/version").get("version")
+            latency = time.perf_counter() - started
+            running = self._get(host, "/api/ps").get("models", [])
+            installed = self._get(host, "/api/tags").get("models", [])
+        except (requests.exceptions.RequestException, ValueError) as e:
+            with self._lock:
+                state = self._states.setdefault(host, HostState(host))
+                state.alive = False
+                state.error = str(e)
+                state.failures += 1
+                state.checked_at = time.time()
+            return state
+        with self._lock:
+            state = self._states.setdefault(host, HostState(host))
+            state.alive = True
+            state.version = version
+            state.latency = latency
+            state.running = running
+            state.installed = installed
+            state.error = None
+            state.failures = 0
+            state.checked_at = time.time()
+        planner = self.planners.get(host)
+        if planner is not None:
+            planner.update(running, installed)
+        return state
+
+    def poll(self):
+        """Poll every host once."""
+        for host in self.hosts:
+            self.check(host)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.poll()
+            self._stop.wait(self.interval)
+
+    def start(self, default=True):
+        """
+        Start polling on a daemon thread. Returns self.
+
+        Args:
+            default: Also install this probe with set_probe()
+        """
+        if default:
+            set_probe(self)
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop polling (and uninstall it if it is the default probe)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.timeout * 3 + 1)
+            self._thread = None
+        if _probe is self:
+            set_probe(None)
+
+    def state(self, host=None):
+        """Cached HostState for a host, or None if it was never polled."""
+        with self._lock:
+            state = self._states.get(resolve_host(host))
+        return state if state is not None and state.checked_at is not None else None
+
+    def states(self):
+        """Cached state of every host as a list of dicts."""
+        with self._lock:
+            return [s.as_dict() for s in self._states.values()]
+
+    def is_alive(self, host=None):
+        """False only if the host was polled and found down; unknown hosts count as alive."""
+        state = self.state(host)
+        return state is None or state.alive
+
+    def models(self, host=None):
+        """Cached installed model list for a host, or None if unknown."""
+        state = self.state(host)
+        if state is None or not state.alive:
+            return None
+        return list(state.installed)
+
+    def pick_host(self, model_name=None):
+        """
+        Choose a live host for a model from cached state: hosts with the model
+        loaded first, then hosts with it installed, each ordered by latency.
+        Returns None if no live host has the model.
+        """
+        with self._lock:
+            live = [s for s in self._states.values() if s.alive]
+
+        def rank(state):
+            if model_name is None:
+                return (0, state.latency)
+            if model_name in state.loaded:
+                return (0, state.latency)
+            if model_name in state.models:
+                return (1, state.latency)
+            return None
+
+        ranked = [(rank(s), s.host) for s in live if rank(s) is not None]
+        return min(ranked)[1] if ranked else None
+
+
+_probe = None
+
+
+def set_probe(probe):
+    """Install the probe library helpers consult (None removes it)."""
+    global _probe
+    _probe = probe
+
+
+def get_probe():
+    """Return the installed HealthProbe, or None."""
+    return _probe
+
+
+def order_by_health(hosts):
+    """Return hosts with those the installed probe reports down moved last."""
+    probe = _probe
+    if probe is None:
+        return list(hosts)
+    return sorted(hosts, key=lambda h: not probe.is_alive(h))
@@ -0,0 +1,179 @@
+# hedging.py
+import itertools
+import math
+import queue
+import threading
+import time
+from collections import deque
+
+from .health import order_by_health
+from .transport import AbortHandle, abortable
+
+
+class HedgedChat:
+    """
+    Opt-in hedged chat requests across several Ollama hosts.
+
+    Each call goes to one host. If no first token arrives within the hedge
+    delay, a duplicate request is sent to the next host; the first to stream
+    wins and the connections of every other attempt are shut down at once,
+    even mid-prefill, so those servers abandon the generation and free the
+    slot (with custom transports, a loser is closed at its next chunk). A request that fails
+    outright is retried on the next host immediately. Hosts that an installed
+    HealthProbe reports down are tried last.
+
+    The delay is the given percentile of recently observed time-to-first-token,
+    clamped to [min_delay, max_delay], or initial_delay until enough samples exist.
+
+    Args:
+        hosts: Ollama server URLs, e.g. ["http://gpu-a:11434", "http://gpu-b:11434"]
+        percentile: Percentile of observed time-to-first-token used as the delay
+        min_delay, max_delay: Bounds on the delay in seconds
+        initial_delay: Delay used before min_samples observations exist
+        min_samples: Observations needed before the percentile is trusted
+        max_hedges: Duplicate requests allowed per call
+        window: Number of recent time-to-first-token samples kept
+    """
+
+    def __init__(self, hosts, percentile=95, min_delay=0.05, max_delay=10.0,
+                 initial_delay=1.0, min_samples=20, max_hedges=1, window=500):
+        if not hosts:
+            raise ValueError("At least one host is required")
+        self.hosts = list(hosts)
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.max_hedges = max_hedges
+        self._ttft = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._next_host = itertools.cycle(range(len(self.hosts)))
+        self.stats = {"requests": 0, "hedges_fired": 0, "hedge_wins": 0,
+                      "failovers": 0, "failures": 0}
+
+    def hedge_delay(self):
+        """Current delay in seconds before a hedge is sent."""
+        with self._lock:
+            samples = sorted(self._ttft)
+        if len(samples) < self.min_samples:
+            return self.initial_delay
+        # Nearest-rank percentile
+        index = min(max(math.ceil(len(samples) * self.percentile / 100) - 1, 0), len(samples) - 1)
+        return min(max(samples[index], self.min_delay), self.max_delay)
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _attempt(self, index, host, model_name, messages, kwargs, events, handle):
+        from .chat import chat_with_model
+
+        started = time.perf_counter()
+        with abortable(handle):
+            result = chat_with_model(model_name, messages, stream=True, host=host, **kwargs)
+            if isinstance(result, str):
+                # chat_with_model reports errors as a plain string
+                events.put(("error", index, result))
+                return
+            first = True
+            try:
+                for chunk in result:
+                    if first:
+                        first = False
+                        with self._lock:
+                            self._ttft.append(time.perf_counter() - started)
+                    if handle.aborted:
+                        break
+                    events.put(("chunk", index, chunk))
+                events.put(("end", index, None))
+            except Exception as e:
+                events.put(("error", index, f"Chat error: {e}"))
+            finally:
+                result.close()
+
+    def stream(self, model_name, messages, **kwargs):
+        """
+        Hedged equivalent of chat_with_model(..., stream=True).
+
+        Yields the chunks of whichever attempt streams first. If every attempt
+        fails, yields the last error string, as chat_with_model would return it.
+        """
+        self._count("requests")
+        events = queue.Queue()
+        first_host = next(self._next_host)
+        order = [self.hosts[(first_host + i) % len(self.hosts)] for i in range(len(self.hosts))]
+        # Hosts a running HealthProbe reports down are only tried last
+        order = order_by_health(order)
+        cancel = []
+        hedges = set()
+        pending = 0
+        winner = None
+        last_error = None
+
+        def launch():
+            nonlocal pending
+            index = len(cancel)
+            cancel.append(AbortHandle())
+            pending += 1
+            threading.Thread(
+                target=self._attempt,
+                args=(index, order[index], model_name, messages, kwargs,
+                      events, cancel[index]),
+                daemon=True,
+            ).start()
+
+        def can_launch():
+            return len(cancel) <= self.max_hedges and len(cancel) < len(order)
+
+        launch()
+        deadline = time.monotonic() + self.hedge_delay()
+        try:
+            while True:
+                timeout = None
+                if winner is None and can_launch():
+                    timeout = max(deadline - time.monotonic(), 0)
+                try:
+                    kind, index, value = events.get(timeout=timeout)
+                except queue.Empty:
+                    self._count("hedges_fired")
+                    hedges.add(len(cancel))
+                    launch()
+                    deadline = time.monotonic() + self.hedge_delay()
+                    continue
+
+                if winner is not None and index != winner:
+                    continue
+                if kind == "chunk":
+                    if winner is None:
+                        winner = index
+                        if index in hedges:
+                            self._count("hedge_wins")
+                        for i, handle in enumerate(cancel):
+                            if i != index:
+                                handle.abort()
+                    yield value
+                elif kind == "end":
+                    # An attempt that finishes without any text is still an answer
+                    return
+                else:
+                    pending -= 1
+                    last_error = value
+                    if winner is not None:
+                        yield value
+                        return
+                    if can_launch():
+                        self._count("failovers")
+                        launch()
+                        deadline = time.monotonic() + self.hedge_delay()
+                    elif pending == 0:
+                        self._count("failures")
+                        yield last_error
+                        return
+        finally:
+            for handle in cancel:
+                handle.abort()
+
+    def chat(self, model_name, messages, **kwargs):
+        """Hedged equivalent of chat_with_model(..., stream=False)."""
+        return "".join(self.stream(model_name, messages, **kwargs))
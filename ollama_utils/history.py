@@ -0,0 +1,209 @@
+# history.py
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+from .encoding import EncodedMessages
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    conversation_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    extra TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (conversation_id, seq)
+) WITHOUT ROWID
+"""
+
+
+def _row_to_message(row):
+    role, content, extra = row
+    message = {"role": role, "content": content}
+    if extra:
+        message.update(json.loads(extra))
+    return message
+
+
+class Conversation:
+    """
+    One chat history backed by a ConversationStore.
+
+    Only the most recent ``tail_size`` messages are kept in memory; older turns
+    stay on disk and are read lazily when asked for. Appending writes a single
+    row, so a turn never re-serializes the rest of the history. recent()
+    returns an EncodedMessages list, so the request body for each turn reuses
+    the JSON encoding of every message already sent.
+    """
+
+    def __init__(self, store, conversation_id, tail_size):
+        self.store = store
+        self.conversation_id = conversation_id
+        self.tail_size = tail_size
+        self._tail = None
+        self._count = None
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    def _load_tail(self):
+        if self._tail is None:
+            self._count = self.store.count(self.conversation_id)
+            start = max(self._count - self.tail_size, 0)
+            self._tail = deque(self.store.load(self.conversation_id, start=start),
+                               maxlen=self.tail_size)
+
+    def append(self, role, content, **extra):
+        """Append a message to the history and return it."""
+        message = {"role": role, "content": content}
+        message.update(extra)
+        with self._lock:
+            self._load_tail()
+            self.store._insert(self.conversation_id, self._count, message)
+            self._tail.append(message)
+            self._count += 1
+        return message
+
+    def recent(self, n=None):
+        """
+        Return the last n messages (all cached messages if n is None).
+
+        Requests beyond the in-memory tail are served from disk.
+        """
+        with self._lock:
+            self._load_tail()
+            if n is None or n <= len(self._tail):
+                tail = EncodedMessages(self._tail, self._encoded)
+                return tail if n is None else tail[len(tail) - n:]
+            start = max(self._count - n, 0)
+        return self.store.load(self.conversation_id, start=start)
+
+    def messages(self):
+        """Return the full history as a list (reads older turns from disk)."""
+        return self.store.load(self.conversation_id)
+
+    def clear(self):
+        """Delete the conversation from the store."""
+        with self._lock:
+            self.store.delete(self.conversation_id)
+            self._encoded = {}
+            self._tail = deque(maxlen=self.tail_size)
+            self._count = 0
+
+    def __iter__(self):
+        return self.store.iter_messages(self.conversation_id)
+
+    def __len__(self):
+        with self._lock:
+            self._load_tail()
+            return self._count
+
+
+class ConversationStore:
+    """
+    Append-only SQLite store for chat histories.
+
+    A single store can be shared by every session in a process. At most
+    ``max_open`` Conversation objects are cached (least recently used first out),
+    each holding at most ``tail_size`` messages, so memory stays bounded
+    regardless of how many or how long the conversations are.
+
+    Args:
+        path: SQLite database file (":memory:" for a throwaway store)
+        tail_size: Recent messages kept in memory per conversation
+        max_open: Conversations kept in memory at once
+    """
+
+    def __init__(self, path="ollama_history.db", tail_size=50, max_open=1024):
+        self.path = path
+        self.tail_size = tail_size
+        self.max_open = max_open
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._open = OrderedDict()
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(_SCHEMA)
+            self._conn.commit()
+
+    def conversation(self, conversation_id):
+        """Return the Conversation for an id, creating it on first append."""
+        with self._lock:
+            conv = self._open.get(conversation_id)
+            if conv is None:
+                conv = Conversation(self, conversation_id, self.tail_size)
+                self._open[conversation_id] = conv
+                while len(self._open) > self.max_open:
+                    self._open.popitem(last=False)
+            else:
+                self._open.move_to_end(conversation_id)
+            return conv
+
+    def _insert(self, conversation_id, seq, message):
+        extra = {k: v for k, v in message.items() if k not in ("role", "content")}
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?)",
+                (conversation_id, seq, message["role"], message["content"],
+                 json.dumps(extra) if extra else None, time.time()),
+            )
+            self._conn.commit()
+
+    def append(self, conversation_id, role, content, **extra):
+        """Append a message to a conversation."""
+        return self.conversation(conversation_id).append(role, content, **extra)
+
+    def count(self, conversation_id):
+        """Number of messages stored for a conversation."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE conversation_id = ?",
+                (conversation_id,),
+            ).fetchone()
+        return row[0]
+
+    def load(self, conversation_id, start=0, limit=None):
+        """Return messages [start, start + limit) of a conversation."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, content, extra FROM messages "
+                "WHERE conversation_id = ? AND seq >= ? ORDER BY seq LIMIT ?",
+                (conversation_id, start, -1 if limit is None else limit),
+            ).fetchall()
+        return [_row_to_message(r) for r in rows]
+
+    def iter_messages(self, conversation_id, batch_size=200):
+        """Lazily iterate over a conversation, reading batch_size rows at a time."""
+        start = 0
+        while True:
+            batch = self.load(conversation_id, start=start, limit=batch_size)
+            yield from batch
+            if len(batch) < batch_size:
+                return
+            start += batch_size
+
+    def conversations(self):
+        """Return the ids of all stored conversations."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT conversation_id FROM messages"
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def delete(self, conversation_id):
+        """Delete every message of a conversation."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM messages WHERE conversation_id = ?", (conversation_id,)
+            )
+            self._conn.commit()
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._open.clear()
+            self._conn.close()
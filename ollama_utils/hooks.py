@@ -0,0 +1,217 @@
+# hooks.py
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Events fired for every HTTP call, in order:
+#   request_start - before the request is sent
+#   connection    - response headers received (for non-streaming calls, the full body)
+#   first_byte    - first line of a streaming body
+#   chunk         - each streamed chunk of generated text, as received (before coalescing)
+#   done          - call finished; info carries the final response data if any,
+#                   and cancelled=True when a stream was closed before its end
+#   error         - call failed; info carries the exception
+# Events fired with event() on their own, outside any HTTP call:
+#   cache         - response cache lookup; info carries hit and similarity
+#   rate_limit    - rate limiter decision; info carries tenant, result and delay
+EVENTS = ("request_start", "connection", "first_byte", "chunk", "done", "error", "cache",
+          "rate_limit")
+
+_listeners = []
+_lock = threading.Lock()
+_call_ids = itertools.count(1)
+
+
+class Call:
+    """One instrumented HTTP call; passed to every listener with each event."""
+
+    __slots__ = ("id", "operation", "url", "model", "started_at", "extra")
+
+    def __init__(self, operation, url, model=None, **extra):
+        self.id = next(_call_ids)
+        self.operation = operation
+        self.url = url
+        self.model = model
+        self.started_at = time.perf_counter()
+        self.extra = extra
+
+
+def add_listener(listener):
+    """
+    Register a callback for instrumentation events.
+
+    Args:
+        listener: Callable taking (event, call, info) where event is one of
+                  EVENTS, call is the Call being tracked and info is a dict
+                  with event-specific fields and a perf_counter "time"
+    """
+    global _listeners
+    with _lock:
+        _listeners = _listeners + [listener]
+
+
+def remove_listener(listener):
+    """Unregister a callback added with add_listener."""
+    global _listeners
+    with _lock:
+        _listeners = [l for l in _listeners if l is not listener]
+
+
+def start(operation, url, model=None, **extra):
+    """
+    Begin tracking a call. Returns None when nobody is listening, so call
+    sites can skip all further instrumentation with a single check.
+    """
+    if not _listeners:
+        return None
+    call = Call(operation, url, model, **extra)
+    emit("request_start", call)
+    return call
+
+
+def emit(event, call, **info):
+    """Send an event for a tracked call to every listener."""
+    if call is None:
+        return
+    info["time"] = time.perf_counter()
+    for listener in _listeners:
+        try:
+            listener(event, call, info)
+        except Exception:
+            # Instrumentation must never break the request itself
+            pass
+
+
+def event(name, operation, url, model=None, **info):
+    """
+    Send an event that is not part of an HTTP call, such as a cache lookup.
+    Listeners get a fresh Call with no request_start or done, so it is never
+    counted as a request.
+    """
+    if not _listeners:
+        return
+    emit(name, Call(operation, url, model), **info)
+
+
+class SpanRecorder:
+    """
+    Listener that turns events into per-call spans for offline latency analysis.
+
+    Args:
+        max_spans: Number of finished spans to keep (oldest dropped first)
+    """
+
+    def __init__(self, max_spans=10000):
+        self.spans = deque(maxlen=max_spans)
+        self._open = {}
+        self._lock = threading.Lock()
+        self._epoch = time.perf_counter()
+        self._wall_epoch = time.time()
+
+    def __call__(self, event, call, info):
+        t = info["time"]
+        with self._lock:
+            if event == "request_start":
+                self._open[call.id] = {
+                    "id": call.id,
+                    "operation": call.operation,
+                    "url": call.url,
+                    "model": call.model,
+                    "start": t,
+                    "connection": None,
+                    "first_byte": None,
+                    "end": None,
+                    "chunks": 0,
+                    "status": None,
+                    "error": None,
+                    "cancelled": False,
+                }
+                return
+            span = self._open.get(call.id)
+            if span is None:
+                return
+            if event == "connection":
+                span["connection"] = t
+                span["status"] = info.get("status")
+            elif event == "first_byte":
+                span["first_byte"] = t
+            elif event == "chunk":
+                span["chunks"] += 1
+            elif event in ("done", "error"):
+                span["end"] = t
+                if event == "error":
+                    span["error"] = str(info.get("error"))
+                span["cancelled"] = bool(info.get("cancelled"))
+                self.spans.append(self._open.pop(call.id))
+
+    def start(self):
+        """Register this recorder as a listener. Returns self."""
+        add_listener(self)
+        return self
+
+    def stop(self):
+        """Unregister this recorder."""
+        remove_listener(self)
+
+    def summary(self):
+        """Return finished spans as dicts of durations in milliseconds."""
+        with self._lock:
+            spans = list(self.spans)
+        rows = []
+        for s in spans:
+            def ms(key):
+                return None if s[key] is None else (s[key] - s["start"]) * 1000
+            rows.append({
+                "id": s["id"],
+                "operation": s["operation"],
+                "model": s["model"],
+                "status": s["status"],
+                "error": s["error"],
+                "cancelled": s["cancelled"],
+                "chunks": s["chunks"],
+                "connect_ms": ms("connection"),
+                "ttfb_ms": ms("first_byte"),
+                "total_ms": ms("end"),
+            })
+        return rows
+
+    def export_chrome_trace(self, path):
+        """
+        Write spans in Chrome trace-event format (open in Perfetto or chrome://tracing).
+
+        Each call becomes a complete event with nested phases for waiting on the
+        connection, waiting for the first byte and streaming the body.
+        """
+        def us(t):
+            return (t - self._epoch) * 1e6
+
+        pid = os.getpid()
+        events = []
+        with self._lock:
+            spans = list(self.spans)
+        for s in spans:
+            tid = s["id"]
+            name = s["operation"] + (f" {s['model']}" if s["model"] else "")
+            args = {k: s[k] for k in ("url", "status", "chunks", "error", "cancelled")}
+            events.append({"name": name, "ph": "X", "pid": pid, "tid": tid,
+                           "ts": us(s["start"]), "dur": us(s["end"]) - us(s["start"]),
+                           "args": args})
+            marks = [("connect", s["start"], s["connection"]),
+                     ("first_byte", s["connection"], s["first_byte"]),
+                     ("stream", s["first_byte"] or s["connection"], s["end"])]
+            for phase, begin, end in marks:
+                if begin is not None and end is not None:
+                    events.append({"name": phase, "ph": "X", "pid": pid, "tid": tid,
+                                   "ts": us(begin), "dur": us(end) - us(begin)})
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms",
+                       "otherData": {"epoch": self._wall_epoch}}, f)
+
+    def export_jsonl(self, path):
+        """Write one JSON summary line per finished span."""
+        with open(path, "w") as f:
+            for row in self.summary():
+                f.write(json.dumps(row) + "\n")
@@ -0,0 +1,156 @@
+# images.py
+import base64
+import hashlib
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+# Raw bytes per base64 step; a multiple of 3 so pieces concatenate cleanly
+ENCODE_CHUNK_SIZE = 3 * 256 * 1024
+
+
+def _b64_pieces(buffer):
+    """Base64-encode a buffer piece by piece without copying it whole."""
+    view = memoryview(buffer)
+    for start in range(0, len(view), ENCODE_CHUNK_SIZE):
+        yield base64.b64encode(view[start:start + ENCODE_CHUNK_SIZE]).decode("ascii")
+
+
+class ImageCache:
+    """
+    Base64 encodings of images keyed by content hash (SHA-256), LRU-bounded
+    by total encoded size. File paths are also remembered by (size, mtime)
+    so an unchanged file is neither re-read nor re-hashed.
+
+    Args:
+        max_bytes: Total size of cached encodings before the oldest are dropped
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._encoded = OrderedDict()
+        self._paths = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "bytes_encoded": 0}
+
+    def _get(self, digest):
+        with self._lock:
+            encoded = self._encoded.get(digest)
+            if encoded is not None:
+                self._encoded.move_to_end(digest)
+                self.stats["hits"] += 1
+            return encoded
+
+    def _put(self, digest, encoded, raw_size):
+        with self._lock:
+            self.stats["misses"] += 1
+            self.stats["bytes_encoded"] += raw_size
+            if digest not in self._encoded:
+                self._encoded[digest] = encoded
+                self._size += len(encoded)
+            while self._size > self.max_bytes and len(self._encoded) > 1:
+                _, dropped = self._encoded.popitem(last=False)
+                self._size -= len(dropped)
+
+    def encode_buffer(self, buffer):
+        """Encode bytes-like data, reusing the cached result for identical content."""
+        digest = hashlib.sha256(buffer).hexdigest()
+        encoded = self._get(digest)
+        if encoded is None:
+            encoded = "".join(_b64_pieces(buffer))
+            self._put(digest, encoded, len(buffer))
+        return encoded
+
+    def encode_path(self, path):
+        """Encode an image file, memory-mapping it instead of reading it into memory."""
+        path = os.fspath(path)
+        st = os.stat(path)
+        key = (path, st.st_size, st.st_mtime_ns)
+        with self._lock:
+            digest = self._paths.get(key)
+        if digest is not None:
+            encoded = self._get(digest)
+            if encoded is not None:
+                return encoded
+        with open(path, "rb") as f:
+            if st.st_size == 0:
+                data = b""
+            else:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                digest = hashlib.sha256(data).hexdigest()
+                encoded = self._get(digest)
+                if encoded is None:
+                    encoded = "".join(_b64_pieces(data))
+                    self._put(digest, encoded, st.st_size)
+            finally:
+                if st.st_size:
+                    data.close()
+        with self._lock:
+            self._paths[key] = digest
+        return encoded
+
+    def clear(self):
+        with self._lock:
+            self._encoded.clear()
+            self._paths.clear()
+            self._size = 0
+
+
+default_image_cache = ImageCache()
+
+
+def encode_image(image, cache=None):
+    """
+    Return the base64 string Ollama expects for one image.
+
+    Args:
+        image: Path (str or os.PathLike), bytes/bytearray/memoryview, a
+               binary file object, or an already base64-encoded string
+        cache: ImageCache to use (defaults to the shared cache)
+    """
+    cache = cache or default_image_cache
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return cache.encode_buffer(image)
+    if isinstance(image, os.PathLike):
+        return cache.encode_path(image)
+    if isinstance(image, str):
+        # Anything that is not an existing file is taken to be base64 already
+        if len(image) < 4096 and os.path.isfile(image):
+            return cache.encode_path(image)
+        return image
+    if hasattr(image, "read"):
+        fileno = getattr(image, "fileno", None)
+        name = getattr(image, "name", None)
+        if fileno is not None and isinstance(name, str) and os.path.isfile(name):
+            return cache.encode_path(name)
+        return cache.encode_buffer(image.read())
+    raise TypeError(f"Unsupported image type: {type(image).__name__}")
+
+
+def resolve_images(messages, cache=None):
+    """
+    Return messages with every "images" entry encoded for the API.
+
+    Messages without images are passed through as the same objects; those
+    with images are shallow-copied, so the caller's messages are not modified.
+    """
+    resolved = None
+    for i, message in enumerate(messages):
+        if message.get("images"):
+            if resolved is None:
+                resolved = list(messages)
+            resolved[i] = resolve_message(message, cache)
+    return messages if resolved is None else resolved
+
+
+def resolve_message(message, cache=None):
+    """Return one message with its images encoded (the message itself if none)."""
+    images = message.get("images")
+    if not images:
+        return message
+    message = dict(message)
+    message["images"] = [encode_image(image, cache) for image in images]
+    return message
@@ -0,0 +1,263 @@
+# leaderboard.py
+import argparse
+import csv
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .context import DEFAULT_CHARS_PER_TOKEN
+
+# A small fixed task mix: open-ended writing, reasoning and extraction
+DEFAULT_PROMPTS = (
+    "Write a short paragraph explaining how a hash table handles collisions.",
+    "A train leaves at 9:40 and arrives at 13:15. How long is the journey? Explain briefly.",
+    "List the programming languages mentioned in the text above, one per line.",
+)
+
+FILLER = ("The quick brown fox jumps over the lazy dog while the committee reviews the "
+          "quarterly report on Python, Rust and Go adoption across the engineering teams. ")
+
+COLUMNS = ("rank", "model", "family", "parameter_size", "quantization", "context", "concurrency",
+           "requests", "errors", "prefill_tps", "decode_tps", "throughput_tps", "latency_s",
+           "load_s", "memory_bytes", "vram_bytes", "throughput_per_gb")
+
+# Columns where a smaller value ranks higher
+LOWER_IS_BETTER = ("latency_s", "load_s", "memory_bytes", "vram_bytes")
+
+
+def _pad_prompt(prompt, context, index):
+    """Build a prompt of roughly context tokens that never shares a cached prefix."""
+    chars = int(context * DEFAULT_CHARS_PER_TOKEN) - len(prompt)
+    filler = (FILLER * (chars // len(FILLER) + 1))[:max(chars, 0)]
+    # The leading nonce defeats the server's prompt (KV) cache between requests
+    return f"[run {time.time_ns()}-{index}]\n{filler}\n\n{prompt}"
+
+
+def _rate(count, duration_ns):
+    return round(count / (duration_ns / 1e9), 2) if duration_ns else None
+
+
+class ModelBenchmark:
+    """
+    Benchmarks installed models on this server and ranks them.
+
+    For every model and context length the model is unloaded and reloaded
+    with that num_ctx, recording the server-reported load time and the memory
+    /api/ps reports for it. The prompt set is then run at each concurrency
+    level, with every prompt padded to the context length and given a unique
+    prefix so the server's prompt cache cannot skip prefill. Throughput comes
+    from the server's own counters (prompt_eval_*, eval_*), not client timing.
+
+    Args:
+        models: Model names to benchmark (default: every installed model)
+        prompts: Prompt set (default: DEFAULT_PROMPTS)
+        context_lengths: Approximate prompt sizes in tokens
+        concurrency: Numbers of simultaneous requests to test
+        num_predict: Tokens generated per request
+        host: Ollama server URL
+        **options: Extra model options sent with every request
+    """
+
+    def __init__(self, models=None, prompts=None, context_lengths=(512, 2048),
+                 concurrency=(1, 4), num_predict=128, host=None, **options):
+        self.models = list(models) if models else None
+        self.prompts = list(prompts or DEFAULT_PROMPTS)
+        self.context_lengths = list(context_lengths)
+        self.concurrency = list(concurrency)
+        self.num_predict = num_predict
+        self.host = host
+        self.options = options
+
+    def _installed(self):
+        from .models import list_models
+
+        models = list_models(host=self.host)
+        if isinstance(models, dict):
+            raise RuntimeError(models["error"])
+        return {m["name"]: m for m in models}
+
+    def _generate(self, model_name, prompt, **kwargs):
+        from .chat import generate_with_model
+
+        final = []
+        content = generate_with_model(model_name, prompt, on_done=final.append,
+                                      host=self.host, **kwargs)
+        return final[0] if final else {"error": content}
+
+    def _load(self, model_name, num_ctx):
+        """Unload the model, load it with num_ctx and return (load seconds, /api/ps entry)."""
+        from .models import list_running_models
+
+        self._generate(model_name, "", keep_alive=0)
+        data = self._generate(model_name, "", num_ctx=num_ctx, **self.options)
+        if "error" in data:
+            return None, {}
+        running = list_running_models(host=self.host)
+        entry = {}
+        if isinstance(running, list):
+            entry = next((m for m in running if m.get("name") == model_name), {})
+        return data.get("load_duration", 0) / 1e9, entry
+
+    def run_config(self, model_name, context, concurrency):
+        """
+        Run the prompt set once per concurrency slot at one context length.
+
+        Returns:
+            Dict of aggregate counters and throughput for this configuration
+        """
+        num_ctx = context + self.num_predict + 64
+        requests = [_pad_prompt(self.prompts[i % len(self.prompts)], context, i)
+                    for i in range(max(len(self.prompts), concurrency))]
+        kwargs = dict(self.options, num_ctx=num_ctx, num_predict=self.num_predict)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(lambda p: self._generate(model_name, p, **kwargs), requests))
+        wall = time.perf_counter() - started
+        done = [r for r in results if "error" not in r]
+
+        def total(key):
+            return sum(r.get(key) or 0 for r in done)
+        return {
+            "requests": len(results),
+            "errors": len(results) - len(done),
+            "prefill_tps": _rate(total("prompt_eval_count"), total("prompt_eval_duration")),
+            "decode_tps": _rate(total("eval_count"), total("eval_duration")),
+            "throughput_tps": round(total("eval_count") / wall, 2) if wall else None,
+            "latency_s": round(total("total_duration") / len(done) / 1e9, 3) if done else None,
+        }
+
+    def run(self, progress=None):
+        """
+        Benchmark every model at every context length and concurrency level.
+
+        Args:
+            progress: Optional callback receiving each result row as it finishes
+
+        Returns:
+            List of result rows (see COLUMNS), unranked
+        """
+        installed = self._installed()
+        rows = []
+        for model_name in self.models or sorted(installed):
+            details = installed.get(model_name, {}).get("details", {})
+            for context in self.context_lengths:
+                load_s, entry = self._load(model_name, context + self.num_predict + 64)
+                for concurrency in self.concurrency:
+                    row = {
+                        "model": model_name,
+                        "family": details.get("family"),
+                        "parameter_size": details.get("parameter_size"),
+                        "quantization": details.get("quantization_level"),
+                        "context": context,
+                        "concurrency": concurrency,
+                        "load_s": None if load_s is None else round(load_s, 3),
+                        "memory_bytes": entry.get("size"),
+                        "vram_bytes": entry.get("size_vram"),
+                    }
+                    if load_s is None:
+                        row.update(requests=0, errors=1, prefill_tps=None, decode_tps=None,
+                                   throughput_tps=None, latency_s=None)
+                    else:
+                        row.update(self.run_config(model_name, context, concurrency))
+                    memory = row["memory_bytes"]
+                    row["throughput_per_gb"] = (round(row["throughput_tps"] / (memory / 1e9), 2)
+                                                if memory and row["throughput_tps"] else None)
+                    rows.append(row)
+                    if progress:
+                        progress(row)
+        return rows
+
+
+def leaderboard(rows, sort_by="throughput_tps"):
+    """
+    Rank result rows, best first; rows without a value for sort_by go last.
+    Columns in LOWER_IS_BETTER rank ascending, all others descending.
+
+    Returns:
+        New list of rows, each with a "rank" field
+    """
+    sign = 1 if sort_by in LOWER_IS_BETTER else -1
+    ranked = sorted(rows, key=lambda r: (r.get(sort_by) is None, sign * (r.get(sort_by) or 0)))
+    return [dict(row, rank=i + 1) for i, row in enumerate(ranked)]
+
+
+def write_leaderboard(rows, path):
+    """Write rows as JSON (.json) or CSV (any other extension)."""
+    with open(path, "w", newline="") as f:
+        if path.endswith(".json"):
+            json.dump(rows, f, indent=2)
+            f.write("\n")
+        else:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def load_leaderboard(path):
+    """Read a leaderboard written by write_leaderboard back into a list of rows."""
+    with open(path, newline="") as f:
+        if path.endswith(".json"):
+            return json.load(f)
+        rows = []
+        for row in csv.DictReader(f):
+            parsed = {}
+            for key, value in row.items():
+                if value == "":
+                    parsed[key] = None
+                    continue
+                try:
+                    parsed[key] = json.loads(value)
+                except ValueError:
+                    parsed[key] = value
+            rows.append(parsed)
+        return rows
+
+
+def format_row(row):
+    """Render a result row as a one-line summary."""
+    def num(value, unit=""):
+        return "--" if value is None else f"{value}{unit}"
+    return (f"{row['model']} ctx={row['context']} x{row['concurrency']}: "
+            f"prefill {num(row['prefill_tps'])} tok/s, decode {num(row['decode_tps'])} tok/s, "
+            f"total {num(row['throughput_tps'])} tok/s, load {num(row['load_s'], 's')}, "
+            f"{row['errors']} errors")
+
+
+def main(argv=None):
+    """Command-line entry point: ollama-leaderboard --output board.json."""
+    parser = argparse.ArgumentParser(description="Benchmark installed Ollama models and rank them.")
+    parser.add_argument("--models", nargs="+", help="models to test (default: all installed)")
+    parser.add_argument("--contexts", nargs="+", type=int, default=[512, 2048],
+                        help="prompt sizes in tokens")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4])
+    parser.add_argument("--num-predict", type=int, default=128)
+    parser.add_argument("--prompts", help="file with one prompt per line")
+    parser.add_argument("--sort-by", default="throughput_tps", choices=COLUMNS[9:])
+    parser.add_argument("--host", help="Ollama server URL")
+    parser.add_argument("--output", "-o", help="write the leaderboard to .json or .csv")
+    args = parser.parse_args(argv)
+
+    prompts = None
+    if args.prompts:
+        with open(args.prompts) as f:
+            prompts = [line.strip() for line in f if line.strip()]
+    bench = ModelBenchmark(models=args.models, prompts=prompts, context_lengths=args.contexts,
+                           concurrency=args.concurrency, num_predict=args.num_predict,
+                           host=args.host)
+    try:
+        rows = bench.run(progress=lambda row: print(format_row(row), file=sys.stderr, flush=True))
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    rows = leaderboard(rows, args.sort_by)
+    if args.output:
+        write_leaderboard(rows, args.output)
+    else:
+        json.dump(rows, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+# metrics.py
+import threading
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from . import hooks
+
+# Latency buckets in seconds, from a cached prompt to a long generation
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# name -> (type, help)
+METRICS = {
+    "ollama_client_requests_total": (
+        "counter", "Requests completed, by operation, model, host and status."),
+    "ollama_client_requests_in_flight": (
+        "gauge", "Requests started but not yet finished."),
+    "ollama_client_request_duration_seconds": (
+        "histogram", "End-to-end request latency, including streaming the body."),
+    "ollama_client_time_to_first_token_seconds": (
+        "histogram", "Time from sending a streaming request to its first line."),
+    "ollama_client_generated_tokens_total": (
+        "counter", "Tokens generated, from the server's eval_count."),
+    "ollama_client_prompt_tokens_total": (
+        "counter", "Prompt tokens evaluated, from the server's prompt_eval_count."),
+    "ollama_client_streamed_bytes_total": (
+        "counter", "UTF-8 bytes of generated text received in streams."),
+    "ollama_client_cache_lookups_total": (
+        "counter", "Response cache lookups, by namespace and result."),
+    "ollama_client_rate_limit_decisions_total": (
+        "counter", "Rate limiter decisions, by tenant and result (admitted, delayed, rejected)."),
+    "ollama_client_rate_limit_delay_seconds": (
+        "histogram", "Time requests waited in the rate limiter before admission or rejection."),
+}
+
+
+class _Shard:
+    """Per-thread metric values; only the owning thread writes to it."""
+
+    __slots__ = ("counters", "histograms")
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+
+    def add(self, other):
+        """Add another shard's values to this one."""
+        for key, value in other.counters.copy().items():
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, h in other.histograms.copy().items():
+            total = self.histograms.setdefault(key, [0] * len(h))
+            for i, v in enumerate(list(h)):
+                total[i] += v
+
+
+class _Owner:
+    """Kept in the thread-local; collected when its thread exits."""
+
+    __slots__ = ("shard", "__weakref__")
+
+    def __init__(self, shard):
+        self.shard = shard
+
+
+def _retire(metrics_ref, shard):
+    metrics = metrics_ref()
+    if metrics is not None:
+        metrics._retire(shard)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value)
+
+
+class Metrics:
+    """
+    Listener that keeps Prometheus counters and histograms for every call.
+
+    Updates go to a shard owned by the calling thread, so the hot path takes
+    no lock; shards are only summed when the metrics are rendered. When a
+    thread exits, its shard is folded into a shared base, so short-lived
+    threads do not accumulate. Register with start() and expose with serve()
+    or render().
+
+    Args:
+        buckets: Histogram bucket upper bounds in seconds
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._local = threading.local()
+        self._shards = []
+        # Values of threads that have exited
+        self._base = _Shard()
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def _shard(self):
+        owner = getattr(self._local, "owner", None)
+        if owner is None:
+            owner = self._local.owner = _Owner(_Shard())
+            weakref.finalize(owner, _retire, weakref.ref(self), owner.shard)
+            with self._lock:
+                self._shards.append(owner.shard)
+        return owner.shard
+
+    def _retire(self, shard):
+        with self._lock:
+            self._base.add(shard)
+            self._shards = [s for s in self._shards if s is not shard]
+
+    def _inc(self, name, labels, amount=1):
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + amount
+
+    def _observe(self, name, labels, value):
+        histograms = self._shard().histograms
+        key = (name, labels)
+        h = histograms.get(key)
+        if h is None:
+            # Per-bucket counts, then +Inf, sum and count
+            h = histograms[key] = [0] * (len(self.buckets) + 3)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                h[i] += 1
+                break
+        else:
+            h[len(self.buckets)] += 1
+        h[-2] += value
+        h[-1] += 1
+
+    def __call__(self, event, call, info):
+        if event == "request_start":
+            self._calls[call.id] = {"status": None}
+            self._inc("ollama_client_requests_in_flight", ())
+            return
+        if event == "cache":
+            result = "hit" if info.get("hit") else "miss"
+            self._inc("ollama_client_cache_lookups_total",
+                      (("namespace", call.model or ""), ("result", result)))
+            return
+        if event == "rate_limit":
+            tenant = (("tenant", info.get("tenant", "")),)
+            self._inc("ollama_client_rate_limit_decisions_total",
+                      tenant + (("result", info.get("result", "")),))
+            self._observe("ollama_client_rate_limit_delay_seconds", tenant, info.get("delay", 0.0))
+            return
+        state = self._calls.get(call.id)
+        if state is None:
+            return
+        model = call.model or ""
+        if event == "connection":
+            state["status"] = info.get("status")
+        elif event == "first_byte":
+            self._observe("ollama_client_time_to_first_token_seconds", (("model", model),),
+                          info["time"] - call.started_at)
+        elif event == "chunk":
+            self._inc("ollama_client_streamed_bytes_total", (("model", model),),
+                      len(info.get("text", "").encode("utf-8")))
+        elif event in ("done", "error"):
+            self._calls.pop(call.id, None)
+            self._inc("ollama_client_requests_in_flight", (), -1)
+            if event == "error":
+                response = getattr(info.get("error"), "response", None)
+                status = getattr(response, "status_code", None) or "error"
+            elif info.get("cancelled"):
+                status = "cancelled"
+            else:
+                status = state["status"] or "ok"
+            host = urlsplit(call.url).netloc if call.url else ""
+            labels = (("operation", call.operation), ("model", model), ("host", host))
+            self._inc("ollama_client_requests_total", labels + (("status", str(status)),))
+            self._observe("ollama_client_request_duration_seconds", labels,
+                          info["time"] - call.started_at)
+            data = info.get("data") or {}
+            if data.get("eval_count"):
+                self._inc("ollama_client_generated_tokens_total", (("model", model),),
+                          data["eval_count"])
+            if data.get("prompt_eval_count"):
+                self._inc("ollama_client_prompt_tokens_total", (("model", model),),
+                          data["prompt_eval_count"])
+
+    def start(self):
+        """Register as an instrumentation listener. Returns self."""
+        hooks.add_listener(self)
+        return self
+
+    def stop(self):
+        """Unregister; collected values are kept."""
+        hooks.remove_listener(self)
+
+    def collect(self):
+        """Sum every thread's values: ({(name, labels): value}, {(name, labels): buckets})."""
+        total = _Shard()
+        # Held throughout so a shard is never counted both live and retired
+        with self._lock:
+            total.add(self._base)
+            for shard in self._shards:
+                total.add(shard)
+        return total.counters, total.histograms
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        counters, histograms = self.collect()
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for (metric, labels), h in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(self.buckets + (float("inf"),), h):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))}"
+                                     f" {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labels)} {_number(h[-2])}")
+                    lines.append(f"{name}_count{_labels(labels)} {h[-1]}")
+            else:
+                rows = [(labels, v) for (metric, labels), v in sorted(counters.items())
+                        if metric == name]
+                if kind == "gauge" and not rows:
+                    rows = [((), 0)]
+                for labels, value in rows:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9464, addr="127.0.0.1"):
+        """
+        Serve /metrics over HTTP on a daemon thread.
+
+        Returns:
+            The HTTP server; call shutdown() on it to stop
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((addr, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def start_metrics_server(port=9464, addr="127.0.0.1"):
+    """Start collecting metrics and serve them on /metrics. Returns the Metrics."""
+    metrics = Metrics().start()
+    metrics.server = metrics.serve(port, addr)
+    return metrics
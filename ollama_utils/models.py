@@ -1,46 +1,106 @@
 # models.py
 import requests
 
-def list_models():
+from . import hooks
+from .transport import get_transport
+
+def list_models(host=None):
     """Return a list of locally installed Ollama models."""
+    transport = get_transport(host)
+    url = transport.url("/api/tags")
+    call = hooks.start("list_models", url)
     try:
-        response = requests.get("http://localhost:11434/api/tags")
+        response = transport.get(url)
+        hooks.emit("connection", call, status=response.status_code)
         response.raise_for_status()
-        return response.json().get("models", [])
+        models = response.json().get("models", [])
+        hooks.emit("done", call)
+        return models
     except requests.exceptions.RequestException as e:
+        hooks.emit("error", call, error=e)
         return {"error": f"Failed to list models: {str(e)}"}
 
-def pull_model(model_name):
+def list_running_models(host=None):
+    """Return the models currently loaded in memory (Ollama's /api/ps)."""
+    transport = get_transport(host)
+    url = transport.url("/api/ps")
+    call = hooks.start("list_running_models", url)
+    try:
+        response = transport.get(url)
+        hooks.emit("connection", call, status=response.status_code)
+        response.raise_for_status()
+        models = response.json().get("models", [])
+        hooks.emit("done", call)
+        return models
+    except requests.exceptions.RequestException as e:
+        hooks.emit("error", call, error=e)
+        return {"error": f"Failed to list running models: {str(e)}"}
+
+def get_version(host=None):
+    """Return the Ollama server version string (Ollama's /api/version)."""
+    transport = get_transport(host)
+    url = transport.url("/api/version")
+    call = hooks.start("version", url)
+    try:
+        response = transport.get(url)
+        hooks.emit("connection", call, status=response.status_code)
+        response.raise_for_status()
+        version = response.json().get("version", "")
+        hooks.emit("done", call)
+        return version
+    except requests.exceptions.RequestException as e:
+        hooks.emit("error", call, error=e)
+        return {"error": f"Failed to get version: {str(e)}"}
+
+def pull_model(model_name, host=None):
     """Pull a model from the Ollama registry."""
+    transport = get_transport(host)
+    url = transport.url("/api/pull")
+    call = hooks.start("pull_model", url, model_name)
     try:
-        response = requests.post("http://localhost:11434/api/pull", json={
+        response = transport.post(url, json={
             "name": model_name,
             "stream": False
         })
+        hooks.emit("connection", call, status=response.status_code)
         response.raise_for_status()
-        return {"success": True, "output": response.json()}
+        output = response.json()
+        hooks.emit("done", call, data=output)
+        return {"success": True, "output": output}
     except requests.exceptions.RequestException as e:
+        hooks.emit("error", call, error=e)
         return {"success": False, "error": str(e)}
 
-def delete_model(model_name):
+def delete_model(model_name, host=None):
     """Remove a model from the local cache."""
+    transport = get_transport(host)
+    url = transport.url("/api/delete")
+    call = hooks.start("delete_model", url, model_name)
     try:
-        response = requests.delete("http://localhost:11434/api/delete", json={
+        response = transport.delete(url, json={
             "model": model_name
         })
+        hooks.emit("connection", call, status=response.status_code)
         response.raise_for_status()
+        hooks.emit("done", call)
         return {"success": True, "output": "Model deleted successfully"}
     except requests.exceptions.RequestException as e:
+        hooks.emit("error", call, error=e)
         if hasattr(e, 'response') and e.response.status_code == 404:
             return {"success": False, "error": "Model not found"}
         return {"success": False, "error": str(e)}
 
-def show_model(model_name):
+def show_model(model_name, host=None):
     """Show metadata for a specific model."""
+    transport = get_transport(host)
+    url = transport.url("/api/tags")
+    call = hooks.start("show_model", url, model_name)
     try:
-        response = requests.get("http://localhost:11434/api/tags")
+        response = transport.get(url)
+        hooks.emit("connection", call, status=response.status_code)
         response.raise_for_status()
         models = response.json().get("models", [])
+        hooks.emit("done", call)
         
         for model in models:
             if model.get("name") == model_name:
@@ -62,11 +122,12 @@ def show_model(model_name):
         
         return f"Error showing model info: Model '{model_name}' not found"
     except requests.exceptions.RequestException as e:
+        hooks.emit("error", call, error=e)
         return f"Error showing model info: {str(e)}"
 
-def is_model_installed(model_name):
+def is_model_installed(model_name, host=None):
     """Check if a model is already installed locally."""
-    models = list_models()
+    models = list_models(host)
     if isinstance(models, list):
         return any(m['name'] == model_name for m in models)
     return False
@@ -0,0 +1,391 @@
+# ratelimit.py
+import itertools
+import threading
+import time
+
+from . import hooks
+from .coalesce import make_coalescer
+
+
+class TokenBucket:
+    """
+    Bucket refilled at rate units per second, holding at most burst.
+
+    debit() may take the level below zero, so usage that is only known after
+    a request finishes (the server's eval_count) is charged in full and delays
+    the next request instead of being forgiven.
+    """
+
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self.level = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.burst, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now=None):
+        """Seconds until amount can be taken (0.0 if it can be taken now)."""
+        self._refill(time.monotonic() if now is None else now)
+        # A request larger than the burst is admitted from a full bucket
+        needed = min(amount, self.burst)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) / self.rate
+
+    def debit(self, amount, now=None):
+        """Take amount (a negative amount refunds, up to burst)."""
+        self._refill(time.monotonic() if now is None else now)
+        self.level = min(self.burst, self.level - amount)
+
+
+class _TenantState:
+    def __init__(self, name, requests_per_second=None, tokens_per_second=None, weight=1.0,
+                 burst=None, token_burst=None, max_queue=None):
+        if weight <= 0:
+            raise ValueError("weight must be positive")
+        self.name = name
+        self.weight = weight
+        self.max_queue = max_queue
+        self.requests = TokenBucket(requests_per_second, burst) if requests_per_second else None
+        self.tokens = TokenBucket(tokens_per_second, token_burst) if tokens_per_second else None
+        self.finish = 0.0
+        self.queued = 0
+        self.mean_tokens = None
+        self.stats = {"requests": 0, "admitted": 0, "rejected": 0, "delayed": 0,
+                      "delay_seconds": 0.0, "in_flight": 0,
+                      "tokens_reserved": 0, "tokens_used": 0}
+
+    def wait_time(self, tokens, now):
+        wait = 0.0
+        if self.requests is not None:
+            wait = self.requests.wait_time(1, now)
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        return wait
+
+
+class Permit:
+    """
+    Admission of one request; release it when the request finishes.
+
+    Usable as a context manager. The tokens reserved at admission are
+    reconciled with the actual count given to release().
+    """
+
+    def __init__(self, limiter, state, reserved, delay):
+        self.limiter = limiter
+        self.tenant = state.name
+        self.reserved = reserved
+        self.delay = delay
+        self._state = state
+        self._released = False
+
+    def release(self, tokens_used=None):
+        """
+        Free the concurrency slot and settle the token bucket.
+
+        Args:
+            tokens_used: Tokens actually generated (None keeps the reservation)
+        """
+        self.limiter._release(self, self.reserved if tokens_used is None else tokens_used)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class _PermitStream:
+    """
+    Stream that releases its permit when exhausted, closed or garbage
+    collected, including when it is never iterated.
+
+    Coalescing is done here rather than by the wrapped stream, so chunks
+    are counted as received and still approximate tokens.
+    """
+
+    def __init__(self, chunks, permit, used, coalescer=None):
+        self._chunks = chunks
+        self._iter = iter(chunks)
+        self._permit = permit
+        self._used = used
+        self._count = 0
+        self._batch = coalescer.batch() if coalescer is not None else None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            try:
+                chunk = next(self._iter)
+            except StopIteration:
+                rest = self._batch.flush() if self._batch is not None else ""
+                self.close()
+                if rest:
+                    return rest
+                raise
+            except BaseException:
+                self.close()
+                raise
+            self._count += 1
+            if self._batch is None:
+                return chunk
+            piece = self._batch.add(chunk)
+            if piece:
+                return piece
+
+    def close(self):
+        close = getattr(self._chunks, "close", None)
+        if close is not None:
+            close()
+        # A stream closed early has no eval_count; count chunks instead
+        used = self._used
+        self._permit.release(used[0] if used and used[0] is not None else self._count)
+
+    def __del__(self):
+        self.close()
+
+
+class RateLimiter:
+    """
+    Per-tenant rate limiting with weighted fair queueing for a shared Ollama pool.
+
+    Each tenant may be limited in requests per second and in generated tokens
+    per second. Token limits are enforced by reserving an estimate when a
+    request is admitted (num_predict if set, otherwise the tenant's recent
+    average) and settling it against the server-reported eval_count when the
+    request finishes, so overshoot is paid back from the next requests.
+
+    Requests that cannot start at once wait. When several tenants are waiting
+    for a free slot (max_concurrency), the one with the smallest virtual
+    finish time goes first, so each tenant gets a share of the pool
+    proportional to its weight and a busy tenant cannot starve the others. A
+    request that would wait longer than max_wait, or arrives when its tenant's
+    queue is full, is rejected.
+
+    Every decision fires a "rate_limit" instrumentation event; Metrics exports
+    them as ollama_client_rate_limit_* series.
+
+    Args:
+        tenants: {name: limits} where limits may hold requests_per_second,
+                 tokens_per_second, weight, burst, token_burst and max_queue
+        default: Limits for tenants not listed (None leaves them unlimited)
+        max_concurrency: Requests allowed in flight across all tenants
+        max_wait: Longest time in seconds a request may wait before rejection
+        token_estimate: Tokens reserved before a tenant has any history
+    """
+
+    def __init__(self, tenants=None, default=None, max_concurrency=None, max_wait=30.0,
+                 token_estimate=256):
+        self.default = dict(default or {})
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self.token_estimate = token_estimate
+        self._tenants = {}
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._in_flight = 0
+        self._virtual = 0.0
+        self._seq = itertools.count()
+        for name, limits in (tenants or {}).items():
+            self.add_tenant(name, **limits)
+
+    def add_tenant(self, name, requests_per_second=None, tokens_per_second=None, weight=1.0,
+                   burst=None, token_burst=None, max_queue=None):
+        """
+        Set (or replace) a tenant's limits.
+
+        Args:
+            name: Tenant name
+            requests_per_second: Request rate limit (None for no limit)
+            tokens_per_second: Generated-token rate limit (None for no limit)
+            weight: Share of contended capacity relative to other tenants
+            burst: Requests that may be sent at once (default: one second's worth)
+            token_burst: Tokens that may be reserved at once (default: one second's worth)
+            max_queue: Waiting requests allowed before new ones are rejected
+        """
+        state = _TenantState(name, requests_per_second, tokens_per_second, weight,
+                             burst, token_burst, max_queue)
+        with self._cond:
+            old = self._tenants.get(name)
+            if old is not None:
+                state.stats = old.stats
+                state.mean_tokens = old.mean_tokens
+            self._tenants[name] = state
+            self._cond.notify_all()
+
+    def _tenant(self, name):
+        state = self._tenants.get(name)
+        if state is None:
+            state = self._tenants[name] = _TenantState(name, **self.default)
+        return state
+
+    def estimate(self, tenant, options=None):
+        """Tokens to reserve for a request with the given model options."""
+        predict = (options or {}).get("num_predict")
+        if predict is not None and predict > 0:
+            return predict
+        with self._cond:
+            mean = self._tenant(tenant).mean_tokens
+        return self.token_estimate if mean is None else max(int(mean), 1)
+
+    def _eligible(self, now):
+        ready = [w for w in self._waiting if w[2].wait_time(w[3], now) == 0.0]
+        return min(ready, key=lambda w: (w[0], w[1])) if ready else None
+
+    def _next_ready(self, now):
+        waits = [w[2].wait_time(w[3], now) for w in self._waiting]
+        waits = [w for w in waits if w > 0]
+        return min(waits) if waits else None
+
+    def acquire(self, tenant, tokens=None, model=None, timeout=None):
+        """
+        Wait for a tenant's request to be admitted.
+
+        Args:
+            tenant: Tenant name
+            tokens: Tokens to reserve (default: estimate(tenant))
+            model: Model name, for instrumentation only
+            timeout: Longest wait in seconds (default: max_wait)
+
+        Returns:
+            A Permit, or None if the request was rejected
+        """
+        if tokens is None:
+            tokens = self.estimate(tenant)
+        max_wait = self.max_wait if timeout is None else timeout
+        started = time.monotonic()
+        with self._cond:
+            permit = self._wait(self._tenant(tenant), tokens, started, started + max_wait)
+        delay = time.monotonic() - started
+        if permit is None:
+            result = "rejected"
+        else:
+            result = "delayed" if permit.delay > 0.001 else "admitted"
+        hooks.event("rate_limit", "rate_limit", f"rate-limit://{tenant}", model,
+                    tenant=tenant, result=result, delay=delay)
+        return permit
+
+    def _wait(self, state, tokens, started, deadline):
+        state.stats["requests"] += 1
+        if state.max_queue is not None and state.queued >= state.max_queue:
+            state.stats["rejected"] += 1
+            return None
+        # Weighted fair queueing: an idle tenant re-enters at the current virtual time
+        tag = max(self._virtual, state.finish) + max(tokens, 1) / state.weight
+        state.finish = tag
+        waiter = (tag, next(self._seq), state, tokens)
+        self._waiting.append(waiter)
+        state.queued += 1
+        try:
+            while True:
+                now = time.monotonic()
+                own_wait = state.wait_time(tokens, now)
+                slot_free = self.max_concurrency is None or self._in_flight < self.max_concurrency
+                if own_wait == 0.0 and slot_free and self._eligible(now) is waiter:
+                    return self._admit(waiter, now, now - started)
+                if now + own_wait > deadline or now >= deadline:
+                    state.stats["rejected"] += 1
+                    if state.finish == tag:
+                        # A rejected request does not count against the tenant's share
+                        state.finish = tag - max(tokens, 1) / state.weight
+                    return None
+                timeout = deadline - now
+                if own_wait > 0:
+                    timeout = min(timeout, own_wait)
+                elif slot_free:
+                    # Another tenant goes first; wake when any bucket refills
+                    next_ready = self._next_ready(now)
+                    if next_ready is not None:
+                        timeout = min(timeout, next_ready)
+                self._cond.wait(timeout)
+        finally:
+            self._waiting.remove(waiter)
+            state.queued -= 1
+            self._cond.notify_all()
+
+    def _admit(self, waiter, now, delay):
+        tag, _, state, tokens = waiter
+        if state.requests is not None:
+            state.requests.debit(1, now)
+        if state.tokens is not None:
+            state.tokens.debit(tokens, now)
+        self._virtual = max(self._virtual, tag - max(tokens, 1) / state.weight)
+        self._in_flight += 1
+        stats = state.stats
+        stats["admitted"] += 1
+        stats["in_flight"] += 1
+        stats["tokens_reserved"] += tokens
+        if delay > 0.001:
+            stats["delayed"] += 1
+            stats["delay_seconds"] += delay
+        return Permit(self, state, tokens, delay)
+
+    def _release(self, permit, tokens_used):
+        with self._cond:
+            if permit._released:
+                return
+            permit._released = True
+            state = permit._state
+            if state.tokens is not None:
+                state.tokens.debit(tokens_used - permit.reserved)
+            state.mean_tokens = (tokens_used if state.mean_tokens is None
+                                 else 0.8 * state.mean_tokens + 0.2 * tokens_used)
+            state.stats["tokens_used"] += tokens_used
+            state.stats["in_flight"] -= 1
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _call(self, func, tenant, model_name, arg, stream, kwargs):
+        permit = self.acquire(tenant, self.estimate(tenant, kwargs), model=model_name)
+        if permit is None:
+            return f"Rate limit exceeded for tenant '{tenant}'"
+        on_done = kwargs.pop("on_done", None)
+        coalescer = make_coalescer(kwargs.pop("coalesce", None))
+        used = []
+
+        def done(data):
+            used.append(data.get("eval_count"))
+            if on_done:
+                on_done(data)
+        try:
+            result = func(model_name, arg, stream=stream, on_done=done, **kwargs)
+        except BaseException:
+            permit.release(0)
+            raise
+        if stream and not isinstance(result, str):
+            return _PermitStream(result, permit, used, coalescer)
+        # An error string means nothing was generated
+        permit.release(used[0] if used else 0)
+        return result
+
+    def chat(self, tenant, model_name, messages, stream=False, **kwargs):
+        """
+        chat_with_model on behalf of a tenant, once its limits allow.
+
+        Returns:
+            As chat_with_model, or an error string if the request was rejected.
+            A returned stream holds its slot until it is exhausted, closed or
+            garbage collected.
+        """
+        from .chat import chat_with_model
+
+        return self._call(chat_with_model, tenant, model_name, messages, stream, kwargs)
+
+    def generate(self, tenant, model_name, prompt, stream=False, **kwargs):
+        """generate_with_model on behalf of a tenant, once its limits allow."""
+        from .chat import generate_with_model
+
+        return self._call(generate_with_model, tenant, model_name, prompt, stream, kwargs)
+
+    def report(self):
+        """Per-tenant counters: {tenant: stats}."""
+        with self._cond:
+            return {name: dict(s.stats) for name, s in self._tenants.items()}
@@ -0,0 +1,240 @@
+# residency.py
+import os
+import threading
+import time
+
+# Loaded size relative to the on-disk size for models never seen in /api/ps
+# (KV cache and compute buffers on top of the weights)
+DEFAULT_LOAD_OVERHEAD = 1.2
+# Ollama's default OLLAMA_MAX_LOADED_MODELS on CPU-only hosts
+DEFAULT_MAX_LOADED = 3
+
+
+def host_memory():
+    """
+    Return {"total": bytes, "available": bytes} for this machine, or None.
+
+    Only meaningful when Ollama runs on the same host as the caller.
+    """
+    try:
+        info = {}
+        with open("/proc/meminfo") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                info[key] = int(rest.split()[0]) * 1024
+        return {"total": info["MemTotal"], "available": info.get("MemAvailable", info["MemFree"])}
+    except (OSError, KeyError, ValueError, IndexError):
+        pass
+    try:
+        page = os.sysconf("SC_PAGE_SIZE")
+        return {"total": os.sysconf("SC_PHYS_PAGES") * page,
+                "available": os.sysconf("SC_AVPHYS_PAGES") * page}
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class ResidencyPrediction:
+    """Whether running a model would load it and which models it would evict."""
+
+    def __init__(self, model, resident, required, free, evicts):
+        self.model = model
+        self.resident = resident
+        self.required = required
+        self.free = free
+        self.evicts = evicts
+
+    @property
+    def will_load(self):
+        return not self.resident
+
+    @property
+    def will_evict(self):
+        return bool(self.evicts)
+
+    def __repr__(self):
+        if self.resident:
+            return f"<ResidencyPrediction {self.model} resident>"
+        return (f"<ResidencyPrediction {self.model} load {self.required / 1e9:.1f}GB, "
+                f"evicts {self.evicts or 'nothing'}>")
+
+
+class ResidencyPlanner:
+    """
+    Tracks which models an Ollama server has in memory and predicts evictions.
+
+    Loaded models and their footprint come from /api/ps, sizes of models not
+    yet loaded from list_models() (scaled by load_overhead), and the memory
+    ceiling from memory_limit or, for a local server, host memory. State is
+    cached and refreshed at most every refresh_interval seconds.
+
+    Args:
+        host: Ollama server URL
+        memory_limit: Bytes Ollama may use for models (default: host memory
+                      available to it, minus headroom)
+        headroom: Fraction of total host memory kept free when memory_limit is None
+        max_loaded: Maximum models loaded at once (OLLAMA_MAX_LOADED_MODELS)
+        load_overhead: Loaded/on-disk size ratio for models never seen loaded
+        refresh_interval: Seconds before cached state is considered stale
+    """
+
+    def __init__(self, host=None, memory_limit=None, headroom=0.1, max_loaded=None,
+                 load_overhead=DEFAULT_LOAD_OVERHEAD, refresh_interval=5.0):
+        self.host = host
+        self.memory_limit = memory_limit
+        self.headroom = headroom
+        if max_loaded is None:
+            max_loaded = int(os.environ.get("OLLAMA_MAX_LOADED_MODELS") or DEFAULT_MAX_LOADED)
+        self.max_loaded = max_loaded
+        self.load_overhead = load_overhead
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._loaded = {}
+        self._disk_sizes = {}
+        self._seen_sizes = {}
+        self._memory = None
+        self._refreshed = 0.0
+
+    def refresh(self, force=False):
+        """Re-read /api/ps, model sizes and host memory if stale (or forced)."""
+        from .models import list_models, list_running_models
+
+        if not force and time.monotonic() - self._refreshed < self.refresh_interval:
+            return
+        running = list_running_models(self.host)
+        installed = list_models(self.host) if not self._disk_sizes or force else None
+        memory = host_memory() if self.memory_limit is None else None
+        with self._lock:
+            if isinstance(running, list):
+                self._loaded = {m["name"]: m for m in running}
+                for name, m in self._loaded.items():
+                    self._seen_sizes[name] = m.get("size", 0)
+            if isinstance(installed, list):
+                self._disk_sizes = {m["name"]: m.get("size", 0) for m in installed}
+            if memory is not None:
+                self._memory = memory
+            self._refreshed = time.monotonic()
+
+    def update(self, running, installed=None, memory=None):
+        """Feed state obtained elsewhere (e.g. a health probe) instead of polling."""
+        with self._lock:
+            self._loaded = {m["name"]: m for m in running}
+            for name, m in self._loaded.items():
+                self._seen_sizes[name] = m.get("size", 0)
+            if installed is not None:
+                self._disk_sizes = {m["name"]: m.get("size", 0) for m in installed}
+            if memory is not None:
+                self._memory = memory
+            self._refreshed = time.monotonic()
+
+    def loaded(self):
+        """Return {model name: /api/ps entry} for the models currently in memory."""
+        self.refresh()
+        with self._lock:
+            return dict(self._loaded)
+
+    def is_resident(self, model_name):
+        return model_name in self.loaded()
+
+    def model_size(self, model_name):
+        """Expected memory footprint of a model once loaded, in bytes."""
+        self.refresh()
+        with self._lock:
+            if model_name in self._seen_sizes:
+                return self._seen_sizes[model_name]
+            return int(self._disk_sizes.get(model_name, 0) * self.load_overhead)
+
+    def capacity(self):
+        """Bytes Ollama can use for models, or None if unknown."""
+        if self.memory_limit is not None:
+            return self.memory_limit
+        with self._lock:
+            if self._memory is None:
+                return None
+            in_use = sum(m.get("size", 0) for m in self._loaded.values())
+            reserve = self._memory["total"] * self.headroom
+            return max(self._memory["available"] + in_use - reserve, 0)
+
+    def predict(self, model_name):
+        """
+        Predict the effect of sending a request for model_name now.
+
+        Eviction candidates are taken in order of earliest keep-alive expiry,
+        which is the least recently used model.
+        """
+        self.refresh()
+        required = self.model_size(model_name)
+        capacity = self.capacity()
+        with self._lock:
+            loaded = dict(self._loaded)
+        if model_name in loaded:
+            return ResidencyPrediction(model_name, True, loaded[model_name].get("size", 0),
+                                       None, [])
+
+        in_use = sum(m.get("size", 0) for m in loaded.values())
+        free = None if capacity is None else capacity - in_use
+        victims = []
+        order = sorted(loaded.values(), key=lambda m: m.get("expires_at", ""))
+        count = len(loaded)
+        for m in order:
+            too_many = count >= self.max_loaded
+            too_big = free is not None and free < required
+            if not too_many and not too_big:
+                break
+            victims.append(m["name"])
+            count -= 1
+            if free is not None:
+                free += m.get("size", 0)
+        return ResidencyPrediction(model_name, False, required, free, victims)
+
+    def will_evict(self, model_name):
+        """True if a request for model_name is expected to unload another model."""
+        return self.predict(model_name).will_evict
+
+    def choose(self, candidates):
+        """
+        Pick the cheapest model to serve from candidates (in preference order):
+        a resident one, else one that loads without evicting, else the first.
+        """
+        predictions = [self.predict(m) for m in candidates]
+        for p in predictions:
+            if p.resident:
+                return p.model
+        for p in predictions:
+            if not p.will_evict:
+                return p.model
+        return candidates[0] if candidates else None
+
+    def warm_up(self, model_name, keep_alive=None, allow_evict=False):
+        """
+        Load a model ahead of traffic with an empty generate request.
+
+        Skipped (returns False) when the model would evict another one and
+        allow_evict is False. Returns True when the model is resident afterwards.
+        """
+        from .chat import generate_with_model
+
+        prediction = self.predict(model_name)
+        if prediction.resident:
+            return True
+        if prediction.will_evict and not allow_evict:
+            return False
+        kwargs = {} if keep_alive is None else {"keep_alive": keep_alive}
+        loaded = []
+        generate_with_model(model_name, "", host=self.host, on_done=loaded.append, **kwargs)
+        self.refresh(force=True)
+        return bool(loaded)
+
+
+def pick_host(model_name, planners):
+    """
+    Route a model to the best host: one where it is resident, else one where it
+    loads without evicting, else the first. planners maps host -> ResidencyPlanner.
+    """
+    predictions = {host: p.predict(model_name) for host, p in planners.items()}
+    for host, p in predictions.items():
+        if p.resident:
+            return host
+    for host, p in predictions.items():
+        if not p.will_evict:
+            return host
+    return next(iter(planners), None)
@@ -0,0 +1,80 @@
+# schema.py
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+    "null": type(None),
+}
+
+
+def _is_type(value, name):
+    if name in ("number", "integer"):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return False
+        return name == "number" or float(value).is_integer()
+    return isinstance(value, _TYPES.get(name, object))
+
+
+def validate(value, schema, path="$"):
+    """
+    Check a decoded JSON value against a JSON Schema subset.
+
+    Supports type, enum, const, properties, required, additionalProperties
+    (boolean), items, minItems, maxItems, minLength, maxLength, minimum and
+    maximum, which covers the schemas Ollama accepts for structured output.
+
+    Returns:
+        None if the value is valid, otherwise a message naming the failing path
+    """
+    if not schema:
+        return None
+    expected = schema.get("type")
+    if expected is not None:
+        names = expected if isinstance(expected, list) else [expected]
+        if not any(_is_type(value, n) for n in names):
+            return f"{path}: expected {expected}, got {type(value).__name__}"
+    if "enum" in schema and value not in schema["enum"]:
+        return f"{path}: {value!r} not in enum"
+    if "const" in schema and value != schema["const"]:
+        return f"{path}: expected {schema['const']!r}"
+
+    if isinstance(value, dict):
+        for key in schema.get("required", []):
+            if key not in value:
+                return f"{path}: missing required property '{key}'"
+        for key, item in value.items():
+            error = validate_property(key, item, schema, path)
+            if error:
+                return error
+    elif isinstance(value, list):
+        if "minItems" in schema and len(value) < schema["minItems"]:
+            return f"{path}: fewer than {schema['minItems']} items"
+        if "maxItems" in schema and len(value) > schema["maxItems"]:
+            return f"{path}: more than {schema['maxItems']} items"
+        for i, item in enumerate(value):
+            error = validate(item, schema.get("items"), f"{path}[{i}]")
+            if error:
+                return error
+    elif isinstance(value, str):
+        if "minLength" in schema and len(value) < schema["minLength"]:
+            return f"{path}: shorter than {schema['minLength']}"
+        if "maxLength" in schema and len(value) > schema["maxLength"]:
+            return f"{path}: longer than {schema['maxLength']}"
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        if "minimum" in schema and value < schema["minimum"]:
+            return f"{path}: below minimum {schema['minimum']}"
+        if "maximum" in schema and value > schema["maximum"]:
+            return f"{path}: above maximum {schema['maximum']}"
+    return None
+
+
+def validate_property(key, value, schema, path="$"):
+    """Validate one property of an object schema, including additionalProperties."""
+    properties = schema.get("properties", {})
+    if key in properties:
+        return validate(value, properties[key], f"{path}.{key}")
+    if schema.get("additionalProperties") is False:
+        return f"{path}: unexpected property '{key}'"
+    return None
@@ -0,0 +1,311 @@
+# semantic_cache.py
+import hashlib
+import itertools
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from . import hooks
+
+try:
+    import numpy as np
+except ImportError:
+    # Optional: without numpy the index is searched in pure Python
+    np = None
+
+HISTOGRAM_BUCKETS = 20
+
+
+def _context_key(model_name, messages, options):
+    """Digest of everything but the last message that shapes the answer."""
+    hasher = hashlib.sha1()
+    hasher.update(json.dumps([model_name, messages, options], sort_keys=True,
+                             default=str).encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def _replay(answer):
+    yield answer
+
+
+def _normalize(vector):
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+class _Index:
+    """
+    Nearest-neighbour index of unit vectors for one namespace.
+
+    Each entry carries a context key and only matches lookups with the same
+    context, so all contexts of a namespace share one index and one entry
+    limit. With numpy the vectors live in one preallocated matrix and a
+    lookup is a single matrix-vector product; freed rows are reused. Without
+    numpy they are kept as lists and scanned.
+    """
+
+    def __init__(self, capacity=64):
+        # slot -> [query, answer, created, vector, context]; LRU order
+        self.entries = OrderedDict()
+        self._free = []
+        self._next = 0
+        self._matrix = None
+        self._live = None
+        self._contexts = None
+        self._capacity = capacity
+        # context -> [id, live entries]
+        self._context_ids = {}
+        self._ids = itertools.count()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _slot(self, dim):
+        if self._free:
+            return self._free.pop()
+        slot = self._next
+        self._next += 1
+        if np is not None:
+            if self._matrix is None:
+                self._matrix = np.zeros((self._capacity, dim), dtype=np.float32)
+                self._live = np.zeros(self._capacity, dtype=bool)
+                self._contexts = np.zeros(self._capacity, dtype=np.int64)
+            elif slot >= len(self._matrix):
+                grow = len(self._matrix)
+                self._matrix = np.vstack([self._matrix, np.zeros((grow, dim), dtype=np.float32)])
+                self._live = np.concatenate([self._live, np.zeros(grow, dtype=bool)])
+                self._contexts = np.concatenate([self._contexts, np.zeros(grow, dtype=np.int64)])
+        return slot
+
+    def add(self, vector, query, answer, now, context=None):
+        slot = self._slot(len(vector))
+        known = self._context_ids.get(context)
+        if known is None:
+            known = self._context_ids[context] = [next(self._ids), 0]
+        known[1] += 1
+        if np is not None:
+            self._matrix[slot] = vector
+            self._live[slot] = True
+            self._contexts[slot] = known[0]
+        self.entries[slot] = [query, answer, now, vector, context]
+        return slot
+
+    def remove(self, slot):
+        context = self.entries.pop(slot)[4]
+        known = self._context_ids[context]
+        known[1] -= 1
+        if not known[1]:
+            del self._context_ids[context]
+        if np is not None:
+            self._live[slot] = False
+        self._free.append(slot)
+
+    def nearest(self, vector, context=None):
+        """Return (slot, similarity) of the closest live entry in context, or (None, None)."""
+        known = self._context_ids.get(context)
+        if known is None:
+            return None, None
+        if np is not None:
+            scores = self._matrix[:self._next] @ np.asarray(vector, dtype=np.float32)
+            matching = self._live[:self._next] & (self._contexts[:self._next] == known[0])
+            scores[~matching] = -np.inf
+            slot = int(np.argmax(scores))
+            return slot, float(scores[slot])
+        best, best_score = None, None
+        for slot, entry in self.entries.items():
+            if entry[4] != context:
+                continue
+            score = sum(a * b for a, b in zip(entry[3], vector))
+            if best_score is None or score > best_score:
+                best, best_score = slot, score
+        return best, best_score
+
+
+class SemanticCache:
+    """
+    Response cache that matches new queries to similar past ones by embedding.
+
+    Each query is embedded with embed_model and compared (cosine similarity)
+    against past queries in the same namespace (by default the chat model
+    name) and context. chat() uses the model, the earlier messages and the
+    request options as the context, so a follow-up question is only answered
+    from a conversation that led up to it the same way. The closest match at
+    or above threshold is returned instead of calling the model.
+
+    Entries expire after ttl seconds and the least recently used entries are
+    evicted beyond max_entries per namespace, counting every context in it
+    together. numpy is used for the index when
+    installed (pip install ollama-utils[semantic]).
+
+    Args:
+        embed_model: Embedding model used for queries (e.g. "nomic-embed-text")
+        threshold: Minimum cosine similarity for a hit
+        max_entries: Entries kept per namespace
+        ttl: Seconds an entry stays valid (None keeps entries until evicted)
+        host: Ollama server URL for embedding requests
+    """
+
+    def __init__(self, embed_model, threshold=0.92, max_entries=10000, ttl=None, host=None):
+        self.embed_model = embed_model
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.host = host
+        self._indexes = {}
+        self._lock = threading.Lock()
+        self._histogram = [0] * HISTOGRAM_BUCKETS
+        self.stats = {"lookups": 0, "hits": 0, "misses": 0, "stores": 0,
+                      "evictions": 0, "expired": 0, "embed_errors": 0}
+
+    def embed(self, text):
+        """Return the normalized embedding of text, or None if embedding failed."""
+        from .chat import embed_with_model
+
+        vectors = embed_with_model(self.embed_model, text, host=self.host)
+        if isinstance(vectors, str) or not vectors:
+            with self._lock:
+                self.stats["embed_errors"] += 1
+            return None
+        return _normalize(vectors[0])
+
+    def _expired(self, entry, now):
+        return self.ttl is not None and now - entry[2] > self.ttl
+
+    def lookup(self, query, namespace, vector=None, context=None):
+        """
+        Find a cached answer for a query.
+
+        Args:
+            query: Query text (embedded unless vector is given)
+            namespace: Cache namespace, usually the chat model name
+            vector: Precomputed normalized embedding
+            context: Key of what else shapes the answer; only entries stored
+                     with the same context match
+
+        Returns:
+            (answer, similarity); answer is None on a miss and similarity is
+            the best score found (None if the namespace is empty)
+        """
+        if vector is None:
+            vector = self.embed(query)
+            if vector is None:
+                return None, None
+        now = time.time()
+        with self._lock:
+            index = self._indexes.get(namespace)
+            slot, score = index.nearest(vector, context) if index else (None, None)
+            while slot is not None and self._expired(index.entries[slot], now):
+                index.remove(slot)
+                self.stats["expired"] += 1
+                slot, score = index.nearest(vector, context)
+            self.stats["lookups"] += 1
+            if score is not None:
+                bucket = min(max(int(score * HISTOGRAM_BUCKETS), 0), HISTOGRAM_BUCKETS - 1)
+                self._histogram[bucket] += 1
+            hit = score is not None and score >= self.threshold
+            answer = None
+            if hit:
+                self.stats["hits"] += 1
+                index.entries.move_to_end(slot)
+                answer = index.entries[slot][1]
+            else:
+                self.stats["misses"] += 1
+        hooks.event("cache", "semantic_cache", f"semantic-cache://{namespace}", namespace,
+                    hit=hit, similarity=score)
+        return answer, score
+
+    def store(self, query, answer, namespace, vector=None, context=None):
+        """Add a query and its answer to the cache."""
+        if vector is None:
+            vector = self.embed(query)
+            if vector is None:
+                return
+        with self._lock:
+            index = self._indexes.get(namespace)
+            if index is None:
+                index = self._indexes[namespace] = _Index()
+            now = time.time()
+            # Expired entries go first, so a TTL also bounds contexts never looked up again
+            while index.entries and self._expired(next(iter(index.entries.values())), now):
+                index.remove(next(iter(index.entries)))
+                self.stats["expired"] += 1
+            index.add(vector, query, answer, now, context)
+            self.stats["stores"] += 1
+            while len(index) > self.max_entries:
+                index.remove(next(iter(index.entries)))
+                self.stats["evictions"] += 1
+
+    def chat(self, model_name, messages, namespace=None, stream=False, **kwargs):
+        """
+        Answer from the cache when the last user message is similar enough to
+        a past one asked after the same earlier messages with the same model
+        and options, otherwise call chat_with_model and cache its answer.
+
+        Args:
+            model_name: Name of the model to use
+            messages: List of chat messages; the last one is the query
+            namespace: Cache namespace (defaults to model_name)
+            stream: Return an iterator of text pieces; a hit yields the whole
+                    answer at once, and a miss is cached once fully streamed
+            **kwargs: Passed through to chat_with_model on a miss
+
+        Returns:
+            Response content as string, or an iterator when streaming
+            (error strings are never cached)
+        """
+        from .chat import chat_with_model
+
+        namespace = namespace or model_name
+        query = messages[-1].get("content", "") if messages else ""
+        on_done = kwargs.pop("on_done", None)
+        options = {k: v for k, v in kwargs.items() if k != "host"}
+        context = _context_key(model_name, messages[:-1], options)
+        vector = self.embed(query)
+        if vector is not None:
+            answer, _ = self.lookup(query, namespace, vector=vector, context=context)
+            if answer is not None:
+                return _replay(answer) if stream else answer
+        final = []
+
+        def done(data):
+            final.append(data)
+            if on_done:
+                on_done(data)
+        content = chat_with_model(model_name, messages, stream=stream, on_done=done, **kwargs)
+        if stream and not isinstance(content, str):
+            return self._stream(content, final, query, namespace, vector, context)
+        if final and vector is not None:
+            self.store(query, content, namespace, vector=vector, context=context)
+        return content
+
+    def _stream(self, pieces, final, query, namespace, vector, context):
+        received = []
+        try:
+            for piece in pieces:
+                received.append(piece)
+                yield piece
+        finally:
+            pieces.close()
+        if final and vector is not None:
+            self.store(query, "".join(received), namespace, vector=vector, context=context)
+
+    @property
+    def hit_rate(self):
+        lookups = self.stats["lookups"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def similarity_histogram(self):
+        """Best-match similarity of every lookup, as [(bucket_start, count), ...]."""
+        with self._lock:
+            counts = list(self._histogram)
+        return [(i / HISTOGRAM_BUCKETS, c) for i, c in enumerate(counts)]
+
+    def clear(self, namespace=None):
+        """Drop one namespace, or everything."""
+        with self._lock:
+            if namespace is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(namespace, None)
@@ -0,0 +1,133 @@
+# stopping.py
+import json
+import re
+import threading
+
+# Weight of the newest response in each model's average output length
+_ALPHA = 0.2
+
+_lock = threading.Lock()
+_expected = {}
+stats = {"stopped": 0, "tokens_received": 0, "tokens_saved": 0, "unknown_savings": 0}
+
+
+def stop_at(pattern, include=True):
+    """
+    Stop when a regex matches the text generated so far.
+
+    Args:
+        pattern: Regex string or compiled pattern
+        include: Keep the matched text (False cuts just before it)
+    """
+    regex = re.compile(pattern) if isinstance(pattern, str) else pattern
+
+    def predicate(text):
+        match = regex.search(text)
+        if match is None:
+            return None
+        return match.end() if include else match.start()
+    return predicate
+
+
+def max_chars(limit):
+    """Stop once limit characters have been generated."""
+    def predicate(text):
+        return limit if len(text) >= limit else None
+    return predicate
+
+
+def first_line():
+    """Stop at the end of the first non-empty line (the newline is dropped)."""
+    def predicate(text):
+        start = len(text) - len(text.lstrip("\n"))
+        end = text.find("\n", start)
+        return None if end < 0 else end
+    return predicate
+
+
+def first_json():
+    """Stop as soon as the first complete JSON object or array has been generated."""
+    decoder = json.JSONDecoder()
+
+    def predicate(text):
+        starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+        if not starts or not text.rstrip().endswith(("}", "]")):
+            return None
+        try:
+            _, end = decoder.raw_decode(text, min(starts))
+        except ValueError:
+            return None
+        return end
+    return predicate
+
+
+def compile_stop(stop_when):
+    """
+    Turn a stop_when argument into a list of predicates.
+
+    Accepts an int (max chars), a regex (compiled, or a string), a callable
+    taking the text so far and returning True/False or a cut position, or a
+    list of these (the first to fire wins).
+    """
+    if stop_when is None:
+        return []
+    if isinstance(stop_when, (list, tuple)):
+        return [p for item in stop_when for p in compile_stop(item)]
+    if isinstance(stop_when, bool):
+        raise TypeError("stop_when must be an int, regex, callable or list of these")
+    if isinstance(stop_when, int):
+        return [max_chars(stop_when)]
+    if isinstance(stop_when, (str, re.Pattern)):
+        return [stop_at(stop_when)]
+    if callable(stop_when):
+        return [stop_when]
+    raise TypeError("stop_when must be an int, regex, callable or list of these")
+
+
+def check(predicates, text):
+    """Return the position to cut text at if any predicate fires, else None."""
+    for predicate in predicates:
+        result = predicate(text)
+        if result is True:
+            return len(text)
+        if result is not None and result is not False:
+            return min(max(int(result), 0), len(text))
+    return None
+
+
+def record_completion(model_name, eval_count):
+    """Fold a naturally finished response's length into the model's average."""
+    if not eval_count:
+        return
+    with _lock:
+        previous = _expected.get(model_name)
+        _expected[model_name] = (eval_count if previous is None
+                                 else (1 - _ALPHA) * previous + _ALPHA * eval_count)
+
+
+def record_stop(model_name, received, num_predict=None):
+    """
+    Account for a stream ended early by a stop predicate.
+
+    The tokens saved are the ones the server would still have generated:
+    num_predict when it is set, otherwise the model's average response
+    length. Returns None if neither is known.
+    """
+    with _lock:
+        expected = num_predict if num_predict and num_predict > 0 else _expected.get(model_name)
+        stats["stopped"] += 1
+        stats["tokens_received"] += received
+        if expected is None:
+            stats["unknown_savings"] += 1
+            return None
+        saved = max(int(expected) - received, 0)
+        stats["tokens_saved"] += saved
+        return saved
+
+
+def reset_stats():
+    """Zero the stop counters and forget every model's average response length."""
+    with _lock:
+        _expected.clear()
+        for key in stats:
+            stats[key] = 0
@@ -1,10 +1,25 @@
 # streamlit_helpers.py
+import uuid
+
 import streamlit as st
+from .background import BackgroundStream
+from .encoding import EncodedMessages
+from .health import get_probe
 from .models import list_models
 
+STREAM_STATE_KEY = "_ollama_stream"
+
 def model_selector(label="Select a local model", sidebar=True):
-    """Dropdown selector for available local Ollama models."""
-    models = list_models()
+    """
+    Dropdown selector for available local Ollama models.
+
+    Uses the model list cached by a running HealthProbe when there is one,
+    so reruns do not block on /api/tags.
+    """
+    probe = get_probe()
+    models = probe.models() if probe is not None else None
+    if models is None:
+        models = list_models()
     if isinstance(models, list) and len(models) > 0:
         model_names = [m['name'] for m in models]
         if sidebar:
@@ -19,21 +34,84 @@ def model_selector(label="Select a local model", sidebar=True):
             st.error(error_msg)
         return None
 
-def chat_ui(model_name=None, streaming=True):
+def session_stream(source, key=STREAM_STATE_KEY, maxsize=256):
+    """
+    Start a BackgroundStream owned by the current Streamlit session.
+
+    The stream is stored in st.session_state under key, so reruns find the
+    generation in progress instead of sending the request again.
+
+    Args:
+        source: Zero-argument callable returning the chunk iterable
+        key: Session state key (one stream per key)
+        maxsize: See BackgroundStream
+    """
+    stream = BackgroundStream(source, maxsize=maxsize).start()
+    st.session_state[key] = stream
+    return stream
+
+def render_stream(stream):
+    """Draw a BackgroundStream with st.write_stream and return the full text."""
+    if hasattr(st, "write_stream"):
+        return st.write_stream(stream.drain())
+    # Streamlit < 1.31 has no write_stream
+    placeholder = st.empty()
+    text = ""
+    for piece in stream.drain():
+        text += piece
+        placeholder.markdown(text + "▌")
+    placeholder.markdown(text)
+    return text
+
+def chat_ui(model_name=None, streaming=True, context_budget=None, store=None,
+            conversation_id=None, compactor=None):
     """
     Complete chat UI with message history and streaming support.
     
     Args:
         model_name: Model to use (if None, uses model_selector)
-        streaming: Enable streaming responses for better UX
+        streaming: Enable streaming responses for better UX; tokens are read on a
+                   background thread and a reply in progress survives reruns
+        context_budget: ContextBudget used to trim history before sending
+                        (defaults to ContextBudget(); pass False to send everything)
+        store: ConversationStore for persistent history (default: session state only)
+        conversation_id: Conversation to resume from the store
+                         (defaults to a new id per Streamlit session)
+        compactor: HistoryCompactor that replaces older turns with a rolling
+                   summary before the history is sent; it may be shared across
+                   sessions (e.g. with st.cache_resource), as each session
+                   compacts under its own conversation id
     """
     from .chat import chat_with_model
+    from .context import ContextBudget
+    
+    if context_budget is None:
+        context_budget = ContextBudget()
     
     st.title("🧠 Local LLM Chat")
     
-    # Initialize session state
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
+    # Each session gets its own id, which also keeps a shared compactor's summaries apart
+    if conversation_id is None:
+        if "conversation_id" not in st.session_state:
+            st.session_state.conversation_id = uuid.uuid4().hex
+        conversation_id = st.session_state.conversation_id
+    
+    # Initialize chat history: a persistent store if given, otherwise session state
+    if store is not None:
+        conversation = store.conversation(conversation_id)
+    else:
+        conversation = None
+        if "messages" not in st.session_state:
+            st.session_state.messages = EncodedMessages()
+    
+    def history():
+        return conversation.recent() if conversation is not None else st.session_state.messages
+    
+    def add_message(role, content):
+        if conversation is not None:
+            conversation.append(role, content)
+        else:
+            st.session_state.messages.append({"role": role, "content": content})
     
     # Model selection
     if model_name is None:
@@ -42,48 +120,77 @@ def chat_ui(model_name=None, streaming=True):
             return  # No models available
     
     # Display chat history
-    for message in st.session_state.messages:
+    for message in history():
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
     
+    def finish_stream(stream):
+        # Render a background reply (new or left running by a rerun) and save it
+        with st.chat_message("assistant"):
+            try:
+                full_response = render_stream(stream)
+            except Exception as e:
+                full_response = f"Error: {str(e)}"
+                st.error(full_response)
+        del st.session_state[STREAM_STATE_KEY]
+        add_message("assistant", full_response)
+    
+    # Resume a reply still generating from before the rerun
+    pending = st.session_state.get(STREAM_STATE_KEY)
+    if pending is not None:
+        finish_stream(pending)
+    
     # Chat input
     if prompt := st.chat_input("Type your message here..."):
         # Add user message to history
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        add_message("user", prompt)
+        
+        # Summarize older turns, then trim to the model's context window
+        full_history = history()
+        to_send = full_history
+        if compactor is not None:
+            to_send = compactor.compact(model_name, to_send, conversation_id)
+        on_done = None
+        if context_budget:
+            to_send = context_budget.fit(model_name, to_send)
+            on_done = context_budget.observer(model_name, to_send)
+        if isinstance(full_history, EncodedMessages):
+            # Reuse the cached JSON of every message already sent
+            to_send = full_history.share(to_send)
         
         # Display user message
         with st.chat_message("user"):
             st.markdown(prompt)
         
         # Display assistant response
-        with st.chat_message("assistant"):
-            if streaming:
-                # Streaming response
-                response_placeholder = st.empty()
-                full_response = ""
-                
-                try:
-                    for chunk in chat_with_model(model_name, st.session_state.messages, stream=True):
-                        full_response += chunk
-                        response_placeholder.markdown(full_response + "▌")
-                    response_placeholder.markdown(full_response)
-                except Exception as e:
-                    full_response = f"Error: {str(e)}"
-                    response_placeholder.error(full_response)
-            else:
+        if streaming:
+            # Read the stream on a background thread, owned by the session
+            finish_stream(session_stream(
+                lambda: chat_with_model(model_name, to_send, stream=True, on_done=on_done)))
+        else:
+            with st.chat_message("assistant"):
                 # Non-streaming response
                 with st.spinner("Thinking..."):
-                    full_response = chat_with_model(model_name, st.session_state.messages, stream=False)
+                    full_response = chat_with_model(model_name, to_send, stream=False, on_done=on_done)
                 st.markdown(full_response)
-        
-        # Add assistant response to history
-        st.session_state.messages.append({"role": "assistant", "content": full_response})
+            
+            # Add assistant response to history
+            add_message("assistant", full_response)
     
     # Sidebar controls
     with st.sidebar:
         st.markdown("### Chat Controls")
+        if compactor is not None and compactor.stats["turns"]:
+            report = compactor.report()
+            st.caption(f"Prompt tokens saved: {report['last_tokens_saved']} last turn, "
+                       f"{report['mean_tokens_saved']:.0f} per turn on average")
         if st.button("Clear Chat History"):
-            st.session_state.messages = []
+            if STREAM_STATE_KEY in st.session_state:
+                st.session_state.pop(STREAM_STATE_KEY).cancel()
+            if conversation is not None:
+                conversation.clear()
+            else:
+                st.session_state.messages = EncodedMessages()
             st.rerun()
         
         # Advanced settings
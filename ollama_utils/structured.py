@@ -0,0 +1,292 @@
+# structured.py
+import json
+
+from .schema import validate
+
+_WHITESPACE = " \t\r\n"
+
+
+class StructuredOutputError(Exception):
+    """The streamed output is not valid JSON, or the request itself failed."""
+
+
+class SchemaViolation(StructuredOutputError):
+    """The streamed output broke the requested JSON Schema."""
+
+
+def _path_str(path):
+    text = "$"
+    for part in path:
+        text += f"[{part}]" if isinstance(part, int) else f".{part}"
+    return text
+
+
+class _Frame:
+    __slots__ = ("container", "state", "key", "path", "schema")
+
+    def __init__(self, container, state, path, schema):
+        self.container = container
+        self.state = state
+        self.key = None
+        self.path = path
+        self.schema = schema
+
+
+class JSONStreamParser:
+    """
+    Incremental JSON parser for model output streamed in arbitrary pieces.
+
+    feed() returns (path, value) events for every value that has closed, from
+    the innermost out: each scalar as soon as its token ends, each array element
+    and object field when complete, and finally the root with path (). Paths
+    are tuples of object keys and array indices.
+
+    When a schema is given, every completed value is checked against the
+    matching sub-schema, containers are type-checked as soon as they open and
+    disallowed object keys are rejected as soon as the key is read, raising
+    SchemaViolation at the earliest point the output is known to be invalid.
+    """
+
+    def __init__(self, schema=None):
+        self.schema = schema
+        self.root = None
+        self.done = False
+        self._stack = []
+        self._buf = []
+        self._in_string = False
+        self._escape = False
+        self._string_is_key = False
+        self._literal = False
+        self._events = []
+
+    def feed(self, text):
+        """Consume a piece of output and return the events it completed."""
+        for ch in text:
+            self._char(ch)
+        events, self._events = self._events, []
+        return events
+
+    def close(self):
+        """Signal end of input; returns remaining events or raises if incomplete."""
+        if self._literal:
+            self._finish_literal()
+        if not self.done or self._stack or self._in_string:
+            raise StructuredOutputError("Incomplete JSON in model output")
+        events, self._events = self._events, []
+        return events
+
+    # Character dispatch
+
+    def _char(self, ch):
+        if self._in_string:
+            self._buf.append(ch)
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                self._finish_string()
+            return
+        if self._literal:
+            if ch in _WHITESPACE or ch in ",]}":
+                self._finish_literal()
+            else:
+                self._buf.append(ch)
+                return
+        if ch in _WHITESPACE:
+            return
+        if ch == '"':
+            frame = self._stack[-1] if self._stack else None
+            self._string_is_key = frame is not None and frame.state == "key"
+            if not self._string_is_key:
+                self._expect_value()
+            self._in_string = True
+            self._buf = [ch]
+        elif ch == "{" or ch == "[":
+            self._open(ch)
+        elif ch == "}" or ch == "]":
+            self._close(ch)
+        elif ch == ",":
+            frame = self._top(",")
+            if frame.state != "comma":
+                self._syntax(",")
+            frame.state = "key" if isinstance(frame.container, dict) else "value"
+        elif ch == ":":
+            frame = self._top(":")
+            if frame.state != "colon":
+                self._syntax(":")
+            frame.state = "value"
+        else:
+            self._expect_value()
+            self._literal = True
+            self._buf = [ch]
+
+    def _syntax(self, ch):
+        raise StructuredOutputError(f"Unexpected {ch!r} in model output JSON")
+
+    def _top(self, ch):
+        if not self._stack:
+            self._syntax(ch)
+        return self._stack[-1]
+
+    # Structure
+
+    def _expect_value(self):
+        if not self._stack:
+            if self.done:
+                raise StructuredOutputError("Unexpected data after JSON value")
+            return
+        if self._stack[-1].state != "value":
+            raise StructuredOutputError("Unexpected value in model output JSON")
+
+    def _child(self):
+        """Path and sub-schema of the value about to be read."""
+        if not self._stack:
+            return (), self.schema
+        frame = self._stack[-1]
+        schema = frame.schema or {}
+        if isinstance(frame.container, dict):
+            sub = schema.get("properties", {}).get(frame.key)
+            if sub is None and isinstance(schema.get("additionalProperties"), dict):
+                sub = schema["additionalProperties"]
+            return frame.path + (frame.key,), sub
+        return frame.path + (len(frame.container),), schema.get("items")
+
+    def _open(self, ch):
+        self._expect_value()
+        path, schema = self._child()
+        container = {} if ch == "{" else []
+        if schema and "type" in schema:
+            expected = schema["type"]
+            names = expected if isinstance(expected, list) else [expected]
+            if ("object" if ch == "{" else "array") not in names:
+                raise SchemaViolation(
+                    f"{_path_str(path)}: expected {expected}, got {type(container).__name__}")
+        self._stack.append(_Frame(container, "key" if ch == "{" else "value", path, schema))
+
+    def _close(self, ch):
+        frame = self._top(ch)
+        is_object = isinstance(frame.container, dict)
+        if is_object != (ch == "}"):
+            self._syntax(ch)
+        if frame.state != "comma" and (frame.container or frame.state not in ("key", "value")
+                                       or (is_object and frame.state == "value")):
+            self._syntax(ch)
+        self._stack.pop()
+        self._complete(frame.container, frame.path, frame.schema)
+
+    def _finish_string(self):
+        raw = "".join(self._buf)
+        self._buf = []
+        try:
+            value = json.loads(raw)
+        except ValueError as e:
+            raise StructuredOutputError(f"Invalid string in model output JSON: {e}")
+        if self._string_is_key:
+            frame = self._stack[-1]
+            schema = frame.schema or {}
+            if (schema.get("additionalProperties") is False
+                    and value not in schema.get("properties", {})):
+                raise SchemaViolation(f"{_path_str(frame.path)}: unexpected property '{value}'")
+            frame.key = value
+            frame.state = "colon"
+            return
+        path, schema = self._child()
+        self._complete(value, path, schema)
+
+    def _finish_literal(self):
+        raw = "".join(self._buf)
+        self._buf = []
+        self._literal = False
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            raise StructuredOutputError(f"Invalid literal {raw!r} in model output JSON")
+        path, schema = self._child()
+        self._complete(value, path, schema)
+
+    def _complete(self, value, path, schema):
+        if schema:
+            error = validate(value, schema, _path_str(path))
+            if error:
+                raise SchemaViolation(error)
+        if not self._stack:
+            self.root = value
+            self.done = True
+        else:
+            frame = self._stack[-1]
+            if isinstance(frame.container, dict):
+                frame.container[frame.key] = value
+                frame.key = None
+            else:
+                frame.container.append(value)
+            frame.state = "comma"
+        self._events.append((path, value))
+
+
+def stream_json(chunks, schema=None):
+    """
+    Parse a stream of text chunks as JSON, yielding (path, value) events.
+
+    On a schema violation or malformed JSON the source is closed (which drops
+    the HTTP connection of a chat/generate stream, so the server stops
+    generating) and the error is raised.
+    """
+    parser = JSONStreamParser(schema)
+    try:
+        for chunk in chunks:
+            yield from parser.feed(chunk)
+        yield from parser.close()
+    except StructuredOutputError:
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
+        raise
+
+
+def chat_json(model_name, messages, schema=None, **kwargs):
+    """
+    Stream a structured-output chat response as incremental JSON events.
+
+    Args:
+        model_name: Name of the model to use
+        messages: List of chat messages
+        schema: JSON Schema sent as the request format and enforced client-side;
+                if None, plain JSON mode is requested
+        **kwargs: Passed through to chat_with_model
+
+    Yields:
+        (path, value) for each completed value; path () is the whole document
+
+    Raises:
+        SchemaViolation: As soon as the output breaks the schema
+        StructuredOutputError: If the request fails or the output is not JSON
+    """
+    from .chat import chat_with_model
+
+    chunks = chat_with_model(model_name, messages, stream=True,
+                             format=schema or "json", **kwargs)
+    if isinstance(chunks, str):
+        raise StructuredOutputError(chunks)
+    return stream_json(chunks, schema)
+
+
+def generate_json(model_name, prompt, schema=None, **kwargs):
+    """Like chat_json, for generate_with_model."""
+    from .chat import generate_with_model
+
+    chunks = generate_with_model(model_name, prompt, stream=True,
+                                 format=schema or "json", **kwargs)
+    if isinstance(chunks, str):
+        raise StructuredOutputError(chunks)
+    return stream_json(chunks, schema)
+
+
+def items(events, path=()):
+    """Filter events down to the elements of the array at path, as they complete."""
+    depth = len(path) + 1
+    for event_path, value in events:
+        if len(event_path) == depth and event_path[:-1] == tuple(path) \
+                and isinstance(event_path[-1], int):
+            yield value
@@ -0,0 +1,326 @@
+# tools.py
+import asyncio
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+_JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean",
+               list: "array", dict: "object"}
+
+
+def _parameters_from_signature(func):
+    """Build a JSON Schema for func's keyword parameters from its annotations."""
+    properties = {}
+    required = []
+    for name, param in inspect.signature(func).parameters.items():
+        if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            continue
+        prop = {}
+        if param.annotation in _JSON_TYPES:
+            prop["type"] = _JSON_TYPES[param.annotation]
+        properties[name] = prop
+        if param.default is param.empty:
+            required.append(name)
+    return {"type": "object", "properties": properties, "required": required}
+
+
+class Tool:
+    """
+    A Python callable the model may call.
+
+    Args:
+        func: Function (or coroutine function) called with the model's arguments
+        name: Tool name shown to the model (default: func.__name__)
+        description: Tool description (default: first line of func's docstring)
+        parameters: JSON Schema of the arguments (default: built from the signature)
+        timeout: Seconds before the call is abandoned (default: the executor's)
+        idempotent: Cache results per argument set and reuse them
+    """
+
+    def __init__(self, func, name=None, description=None, parameters=None,
+                 timeout=None, idempotent=False):
+        self.func = func
+        self.name = name or func.__name__
+        doc = (func.__doc__ or "").strip()
+        self.description = description or (doc.splitlines()[0] if doc else "")
+        self.parameters = parameters or _parameters_from_signature(func)
+        self.timeout = timeout
+        self.idempotent = idempotent
+        self.is_async = inspect.iscoroutinefunction(func)
+        try:
+            self._signature = inspect.signature(func)
+        except (TypeError, ValueError):
+            # Some builtins have no introspectable signature; their calls are checked on run
+            self._signature = None
+
+    def check_arguments(self, arguments):
+        """Raise TypeError if func cannot be called with these keyword arguments."""
+        if self._signature is not None:
+            self._signature.bind(**arguments)
+
+    def spec(self):
+        """The tool definition sent in the request's "tools" field."""
+        return {"type": "function", "function": {
+            "name": self.name, "description": self.description, "parameters": self.parameters}}
+
+
+def tool(func=None, **kwargs):
+    """Decorator turning a function into a Tool: @tool or @tool(timeout=5, idempotent=True)."""
+    if func is None:
+        return lambda f: Tool(f, **kwargs)
+    return Tool(func, **kwargs)
+
+
+def _call_arguments(call):
+    function = call.get("function", {})
+    arguments = function.get("arguments") or {}
+    if isinstance(arguments, str):
+        try:
+            arguments = json.loads(arguments)
+        except ValueError:
+            arguments = {}
+    return function.get("name"), arguments
+
+
+def _tool_message(name, result):
+    content = result if isinstance(result, str) else json.dumps(result, default=str)
+    return {"role": "tool", "tool_name": name, "content": content}
+
+
+class ToolResult:
+    """Final answer of a tool-calling conversation and the turns that produced it."""
+
+    def __init__(self, content, messages, rounds, data):
+        self.content = content
+        self.messages = messages
+        self.rounds = rounds
+        self.data = data
+
+    def __repr__(self):
+        return f"<ToolResult {self.rounds} rounds>"
+
+
+class ToolExecutor:
+    """
+    Run a chat with function calling until the model stops requesting tools.
+
+    Every tool call the model requests in one turn runs concurrently, each
+    bounded by its timeout, and all results go back in the next request, so a
+    turn with N tool calls costs one round trip instead of N. Results of
+    idempotent tools are cached (LRU) by name and arguments. Tool errors and
+    timeouts are reported to the model as the tool's output rather than raised.
+
+    A timed-out synchronous tool cannot be interrupted; its worker thread
+    finishes in the background and its result is discarded.
+
+    Args:
+        tools: Tools or plain functions (wrapped with default settings)
+        timeout: Default per-tool timeout in seconds
+        max_workers: Thread pool size for synchronous tools
+        max_rounds: Model turns allowed before giving up
+        cache_size: Idempotent results kept
+    """
+
+    def __init__(self, tools, timeout=30.0, max_workers=8, max_rounds=8, cache_size=256):
+        self.tools = {}
+        for t in tools:
+            t = t if isinstance(t, Tool) else Tool(t)
+            self.tools[t.name] = t
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.max_rounds = max_rounds
+        self.cache_size = cache_size
+        self._pool = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"rounds": 0, "tool_calls": 0, "cache_hits": 0, "timeouts": 0,
+                      "errors": 0}
+
+    def specs(self):
+        """Tool definitions for the request's "tools" field."""
+        return [t.spec() for t in self.tools.values()]
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix="ollama-tool")
+            return self._pool
+
+    def _cache_key(self, name, arguments):
+        return name + json.dumps(arguments, sort_keys=True, default=str)
+
+    def _cached(self, tool_, arguments):
+        if not tool_.idempotent:
+            return False, None
+        key = self._cache_key(tool_.name, arguments)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                return True, self._cache[key]
+        return False, None
+
+    def _store(self, tool_, arguments, result):
+        if not tool_.idempotent:
+            return
+        with self._lock:
+            self._cache[self._cache_key(tool_.name, arguments)] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _resolve(self, call):
+        """Return (tool, arguments, immediate_result); result is None if the tool must run."""
+        name, arguments = _call_arguments(call)
+        tool_ = self.tools.get(name)
+        if tool_ is None:
+            self._count("errors")
+            return None, arguments, _tool_message(name, f"Tool error: unknown tool '{name}'")
+        hit, value = self._cached(tool_, arguments)
+        if hit:
+            return tool_, arguments, _tool_message(name, value)
+        return tool_, arguments, None
+
+    def _failure(self, tool_, error, timeout):
+        if timeout:
+            self._count("timeouts")
+            return _tool_message(tool_.name, f"Tool error: timed out after {timeout}s")
+        self._count("errors")
+        return _tool_message(tool_.name, f"Tool error: {error}")
+
+    def run_calls(self, tool_calls):
+        """Execute tool calls concurrently; return tool messages in call order."""
+        self._count("tool_calls", len(tool_calls))
+        results = [None] * len(tool_calls)
+        pending = []
+        pool = None
+        for i, call in enumerate(tool_calls):
+            tool_, arguments, ready = self._resolve(call)
+            if ready is not None:
+                results[i] = ready
+                continue
+            timeout = tool_.timeout if tool_.timeout is not None else self.timeout
+            deadline = time.monotonic() + timeout
+            try:
+                # Binding first makes bad arguments from the model fail here,
+                # before anything is submitted, for sync and async tools alike
+                tool_.check_arguments(arguments)
+                pool = pool or self._get_pool()
+                if tool_.is_async:
+                    future = pool.submit(asyncio.run, tool_.func(**arguments))
+                else:
+                    future = pool.submit(tool_.func, **arguments)
+            except Exception as e:
+                results[i] = self._failure(tool_, e, None)
+                continue
+            pending.append((i, tool_, arguments, future, timeout, deadline))
+        for i, tool_, arguments, future, timeout, deadline in pending:
+            try:
+                value = future.result(timeout=max(deadline - time.monotonic(), 0))
+            except FutureTimeout:
+                future.cancel()
+                results[i] = self._failure(tool_, None, timeout)
+                continue
+            except Exception as e:
+                results[i] = self._failure(tool_, e, None)
+                continue
+            self._store(tool_, arguments, value)
+            results[i] = _tool_message(tool_.name, value)
+        return results
+
+    async def arun_calls(self, tool_calls):
+        """Async run_calls: coroutine tools run on the event loop, others on the pool."""
+        self._count("tool_calls", len(tool_calls))
+        loop = asyncio.get_running_loop()
+
+        async def run(call):
+            tool_, arguments, ready = self._resolve(call)
+            if ready is not None:
+                return ready
+            timeout = tool_.timeout if tool_.timeout is not None else self.timeout
+            try:
+                tool_.check_arguments(arguments)
+                if tool_.is_async:
+                    job = tool_.func(**arguments)
+                else:
+                    job = loop.run_in_executor(self._get_pool(), lambda: tool_.func(**arguments))
+                value = await asyncio.wait_for(job, timeout)
+            except asyncio.TimeoutError:
+                return self._failure(tool_, None, timeout)
+            except Exception as e:
+                return self._failure(tool_, e, None)
+            self._store(tool_, arguments, value)
+            return _tool_message(tool_.name, value)
+
+        return list(await asyncio.gather(*(run(c) for c in tool_calls)))
+
+    def _turn(self, model_name, messages, kwargs):
+        from .chat import chat_with_model
+
+        final = []
+        content = chat_with_model(model_name, messages, tools=self.specs(),
+                                  on_done=final.append, **kwargs)
+        self._count("rounds")
+        if not final:
+            # No final response dict means content is the error string
+            return content, None
+        return content, final[0]
+
+    def chat(self, model_name, messages, **kwargs):
+        """
+        Chat with tools until the model answers without calling one.
+
+        Args:
+            model_name: Name of the model to use (must support tools)
+            messages: List of chat messages (not modified)
+            **kwargs: Passed through to chat_with_model on every round
+
+        Returns:
+            ToolResult with content, the full message list, rounds and the
+            final response dict (None if a request failed; content is then
+            the error string)
+        """
+        history = list(messages)
+        for rounds in range(1, self.max_rounds + 1):
+            content, data = self._turn(model_name, history, kwargs)
+            if data is None:
+                return ToolResult(content, history, rounds, None)
+            message = data.get("message", {"role": "assistant", "content": content})
+            history.append(message)
+            tool_calls = message.get("tool_calls")
+            if not tool_calls:
+                return ToolResult(content, history, rounds, data)
+            history.extend(self.run_calls(tool_calls))
+        return ToolResult(content, history, self.max_rounds, data)
+
+    async def achat(self, model_name, messages, **kwargs):
+        """Async chat: requests run in a worker thread, tools via arun_calls."""
+        loop = asyncio.get_running_loop()
+        history = list(messages)
+        for rounds in range(1, self.max_rounds + 1):
+            content, data = await loop.run_in_executor(
+                None, self._turn, model_name, history, kwargs)
+            if data is None:
+                return ToolResult(content, history, rounds, None)
+            message = data.get("message", {"role": "assistant", "content": content})
+            history.append(message)
+            tool_calls = message.get("tool_calls")
+            if not tool_calls:
+                return ToolResult(content, history, rounds, data)
+            history.extend(await self.arun_calls(tool_calls))
+        return ToolResult(content, history, self.max_rounds, data)
+
+    def close(self):
+        """Shut down the tool thread pool without waiting for stragglers."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
@@ -0,0 +1,378 @@
+# transport.py
+import contextlib
+import os
+import socket
+import threading
+from urllib.parse import unquote, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+DEFAULT_HOST = "http://localhost:11434"
+DEFAULT_PORT = 11434
+# Keep-alive connections per host; concurrent requests beyond this open extra ones
+POOL_MAXSIZE = 16
+# Give each TCP host a pooled session (False sends requests through the
+# module-level requests functions, one connection each)
+POOL_CONNECTIONS = True
+
+
+def resolve_host(host=None):
+    """
+    Normalize an Ollama host the way the Ollama CLI does.
+
+    Falls back to the OLLAMA_HOST environment variable, then to
+    http://localhost:11434. Accepts "host", "host:port", full URLs and
+    "unix:///path/to/socket" for a Unix domain socket.
+    """
+    host = (host or os.environ.get("OLLAMA_HOST") or DEFAULT_HOST).strip().rstrip("/")
+    if host.startswith("unix://"):
+        return host
+    if "://" not in host:
+        host = "http://" + host
+    parts = urlsplit(host)
+    if parts.port is None:
+        port = 443 if parts.scheme == "https" else DEFAULT_PORT
+        hostname = parts.hostname or "localhost"
+        if ":" in hostname:
+            hostname = f"[{hostname}]"
+        host = f"{parts.scheme}://{hostname}:{port}{parts.path}"
+    return host
+
+
+class Transport:
+    """
+    How requests reach an Ollama server.
+
+    Subclasses implement request(); get/post/delete mirror the requests API
+    so call sites read the same whichever transport is in use.
+    """
+
+    base_url = DEFAULT_HOST
+
+    def url(self, path):
+        """Absolute URL for an API path such as "/api/chat"."""
+        return self.base_url + path
+
+    def request(self, method, url, **kwargs):
+        raise NotImplementedError
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self):
+        """Release pooled connections."""
+
+
+_local = threading.local()
+
+
+def _shutdown(conn):
+    sock = getattr(conn, "sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class AbortHandle:
+    """
+    Lets another thread cut off the requests one thread is making.
+
+    Requests sent inside abortable(handle) through a pooled transport
+    register their connection; abort() shuts those sockets down, so a call
+    blocked waiting for response headers (e.g. during a long prefill) or for
+    the next chunk fails at once, and the server sees the client go away.
+    Other transports ignore the handle.
+    """
+
+    def __init__(self):
+        self.aborted = False
+        self._connections = []
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _add(self, conn):
+        with self._lock:
+            if not self._closed:
+                self._connections.append(conn)
+            aborted = self.aborted
+        if aborted:
+            _shutdown(conn)
+
+    def abort(self):
+        """Shut down every connection the handle's requests are using."""
+        with self._lock:
+            self.aborted = True
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            _shutdown(conn)
+
+    def _close(self):
+        # The requests are over; their connections may now serve someone else
+        with self._lock:
+            self._closed = True
+            self._connections = []
+
+
+@contextlib.contextmanager
+def abortable(handle):
+    """Register the requests this thread makes inside the block with handle."""
+    previous = getattr(_local, "abort", None)
+    _local.abort = handle
+    try:
+        yield handle
+    finally:
+        _local.abort = previous
+        handle._close()
+
+
+class _AbortableConnection:
+    """Connection mixin that registers with the current thread's AbortHandle."""
+
+    def connect(self):
+        super().connect()
+        handle = getattr(_local, "abort", None)
+        if handle is not None and handle.aborted:
+            _shutdown(self)
+
+    def putrequest(self, *args, **kwargs):
+        handle = getattr(_local, "abort", None)
+        if handle is not None:
+            handle._add(self)
+        return super().putrequest(*args, **kwargs)
+
+
+class _PooledHTTPConnection(_AbortableConnection, HTTPConnection):
+    pass
+
+
+class _PooledHTTPSConnection(_AbortableConnection, HTTPSConnection):
+    pass
+
+
+class _PooledHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _PooledHTTPConnection
+
+
+class _PooledHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _PooledHTTPSConnection
+
+
+class _PooledAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _PooledHTTPConnectionPool, "https": _PooledHTTPSConnectionPool}
+
+
+class HTTPTransport(Transport):
+    """
+    Plain HTTP over TCP.
+
+    make_transport() gives each host a requests.Session, so keep-alive
+    connections are reused; without a session each call goes through the
+    module-level requests functions and opens a new connection.
+    """
+
+    def __init__(self, base_url=DEFAULT_HOST, session=None):
+        self.base_url = base_url
+        self.session = session
+
+    def request(self, method, url, **kwargs):
+        if self.session is not None:
+            return self.session.request(method, url, **kwargs)
+        return requests.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        if self.session is not None:
+            return self.session.get(url, **kwargs)
+        return requests.get(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        if self.session is not None:
+            return self.session.post(url, **kwargs)
+        return requests.post(url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        if self.session is not None:
+            return self.session.delete(url, **kwargs)
+        return requests.delete(url, **kwargs)
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+
+
+def make_session(pool_maxsize=POOL_MAXSIZE):
+    """requests.Session keeping up to pool_maxsize connections per host alive."""
+    session = requests.Session()
+    adapter = _PooledAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class _UnixHTTPConnection(_AbortableConnection, HTTPConnection):
+    def __init__(self, *args, socket_path=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.socket_path = socket_path
+
+    def _new_conn(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if isinstance(self.timeout, (int, float)):
+            sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock
+
+
+class _UnixHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _UnixHTTPConnection
+
+
+class _UnixSocketAdapter(HTTPAdapter):
+    """requests adapter that sends every request to one Unix domain socket."""
+
+    def __init__(self, socket_path, pool_maxsize=10):
+        super().__init__()
+        self.socket_path = socket_path
+        self._pool = _UnixHTTPConnectionPool("localhost", maxsize=pool_maxsize,
+                                             socket_path=socket_path)
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        return self._pool
+
+    def get_connection(self, url, proxies=None):
+        return self._pool
+
+    def request_url(self, request, proxies):
+        return request.path_url
+
+    def close(self):
+        self._pool.close()
+
+
+class UnixSocketTransport(Transport):
+    """
+    HTTP over a Unix domain socket, e.g. a local Ollama socket proxy.
+
+    Connections are pooled and kept alive in a requests.Session.
+    """
+
+    base_url = "http+unix://ollama"
+
+    def __init__(self, socket_path, pool_maxsize=10):
+        self.socket_path = socket_path
+        self.session = requests.Session()
+        self.session.mount("http+unix://", _UnixSocketAdapter(socket_path, pool_maxsize))
+
+    def request(self, method, url, **kwargs):
+        return self.session.request(method, url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class _HostView(Transport):
+    """An override transport seen from one host: URLs keep that host's base."""
+
+    def __init__(self, transport, base_url):
+        self.transport = transport
+        self.base_url = base_url
+
+    def request(self, method, url, **kwargs):
+        return self.transport.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.transport.get(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.transport.post(url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.transport.delete(url, **kwargs)
+
+
+_transports = {}
+# Resolved host (None for every host) -> transport installed with set_transport
+_overrides = {}
+_lock = threading.Lock()
+
+
+def make_transport(host=None):
+    """Create a new transport for a host (see resolve_host for accepted forms)."""
+    base = resolve_host(host)
+    if base.startswith("unix://"):
+        return UnixSocketTransport(unquote(base[len("unix://"):]))
+    return HTTPTransport(base, session=make_session() if POOL_CONNECTIONS else None)
+
+
+def _host_transport(base):
+    transport = _transports.get(base)
+    if transport is None:
+        with _lock:
+            transport = _transports.get(base)
+            if transport is None:
+                transport = make_transport(base)
+                _transports[base] = transport
+    return transport
+
+
+def get_transport(host=None):
+    """
+    Return the transport for a host, creating and caching it on first use.
+
+    A transport installed for this host with set_transport() takes
+    precedence; one installed for every host receives the request with the
+    host's own URL, so multi-host code still reaches distinct hosts.
+    """
+    base = resolve_host(host)
+    overrides = _overrides
+    if overrides:
+        override = overrides.get(base)
+        if override is not None:
+            return override
+        override = overrides.get(None)
+        if override is not None:
+            return _HostView(override, _host_transport(base).base_url)
+    return _host_transport(base)
+
+
+def set_transport(transport, host=None):
+    """
+    Route requests through transport (None restores the per-host transport).
+
+    Args:
+        transport: Transport to use
+        host: Only route this host's requests (default: every host)
+    """
+    key = None if host is None else resolve_host(host)
+    global _overrides
+    with _lock:
+        overrides = dict(_overrides)
+        if transport is None:
+            overrides.pop(key, None)
+        else:
+            overrides[key] = transport
+        _overrides = overrides
+
+
+@contextlib.contextmanager
+def use_transport(transport, host=None):
+    """Temporarily route requests (for one host, or every host) through transport."""
+    key = None if host is None else resolve_host(host)
+    previous = _overrides.get(key)
+    set_transport(transport, host)
+    try:
+        yield transport
+    finally:
+        set_transport(previous, host)
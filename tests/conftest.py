@@ -0,0 +1,104 @@
+"""
+Shared fixtures and helpers for the test suite.
+"""
+
+import importlib
+import json
+import time
+
+import pytest
+from unittest.mock import Mock
+
+from ollama_utils import transport
+
+# The package re-exports the autotune() function under the module's name
+autotune = importlib.import_module("ollama_utils.autotune")
+
+
+@pytest.fixture(autouse=True)
+def unpooled_transports(monkeypatch):
+    """Send requests through the module-level requests functions, which tests patch."""
+    monkeypatch.setattr(transport, "POOL_CONNECTIONS", False)
+    monkeypatch.setattr(transport, "_transports", {})
+
+
+@pytest.fixture(autouse=True)
+def no_profiles(monkeypatch):
+    """Keep autotune profiles in the home directory out of request payloads."""
+    monkeypatch.setattr(autotune, "_store", None)
+    monkeypatch.setattr(autotune, "_disabled", True)
+
+
+def streaming_response(chunks, key="message", eval_count=None, gap=0.0):
+    """
+    Mock response that streams NDJSON lines through iter_lines().
+
+    Args:
+        chunks: Text pieces, sent as chat ("message") or generate ("response")
+                chunks and followed by a final done chunk; or dicts and bytes,
+                sent as given with no final chunk added
+        key: "message" for /api/chat chunks, "response" for /api/generate
+        eval_count: eval_count of the final chunk (default: number of pieces)
+        gap: Seconds to wait before each line
+
+    Lines are appended to response.read as they are consumed.
+    """
+    if all(isinstance(c, str) for c in chunks):
+        def wrap(text):
+            if key == "message":
+                return {"message": {"role": "assistant", "content": text}}
+            return {"response": text}
+        lines = [wrap(t) for t in chunks]
+        lines.append(dict(wrap(""), done=True,
+                          eval_count=len(chunks) if eval_count is None else eval_count))
+    else:
+        lines = list(chunks)
+    response = Mock()
+    response.status_code = 200
+    response.read = []
+
+    def iter_lines():
+        for line in lines:
+            time.sleep(gap)
+            response.read.append(line)
+            yield line if isinstance(line, bytes) else json.dumps(line).encode()
+    response.iter_lines.side_effect = iter_lines
+    return response
+
+
+def fake_ollama(decode_tps, running, fail=None):
+    """
+    Fake generate_with_model and list_running_models for benchmark-style tests.
+
+    Empty prompts load the model (2 s load_duration); other prompts report
+    one prompt token per 4 characters in 0.5 s and num_predict tokens at
+    decode_tps.
+
+    Args:
+        decode_tps: Callable (model_name, options) -> decode tokens per second
+        running: Entries list_running_models returns
+        fail: Optional callable (model_name, options) -> error string, or None
+
+    Returns:
+        (generate, list_running) to use as side effects
+    """
+    def generate(model_name, prompt, on_done=None, host=None, **kwargs):
+        error = fail(model_name, kwargs) if fail else None
+        if error:
+            return error
+        if kwargs.get("keep_alive") == 0:
+            data = {"done": True}
+        elif not prompt:
+            data = {"done": True, "load_duration": 2_000_000_000}
+        else:
+            tokens = kwargs.get("num_predict") or 100
+            data = {"done": True, "prompt_eval_count": len(prompt) // 4,
+                    "prompt_eval_duration": 500_000_000, "eval_count": tokens,
+                    "eval_duration": int(tokens / decode_tps(model_name, kwargs) * 1e9),
+                    "total_duration": 1_000_000_000}
+        on_done(data)
+        return "ok"
+
+    def list_running(host=None):
+        return running
+    return generate, list_running
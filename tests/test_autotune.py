@@ -0,0 +1,147 @@
+"""
+Unit tests for ollama_utils.autotune module.
+"""
+
+import importlib
+import json
+
+import pytest
+from unittest.mock import Mock, patch
+
+from ollama_utils.autotune import (
+    PROFILE_ENV, Autotuner, ProfileStore, apply_profile, main, set_profile_store
+)
+from ollama_utils.chat import chat_with_model
+
+from .conftest import fake_ollama
+
+# The package re-exports the autotune() function under the module's name
+autotune = importlib.import_module("ollama_utils.autotune")
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ProfileStore(str(tmp_path / "profiles.json"), check_interval=0)
+    set_profile_store(store)
+    return store
+
+
+def decode_tps(model_name, options):
+    # Decode speed peaks at num_batch=256 and grows with threads
+    return 20 + options["num_thread"] - abs(options["num_batch"] - 256) / 32
+
+
+def fail(model_name, options):
+    if options.get("num_batch") == 999:
+        return "Generation error: out of memory"
+
+
+fake_generate, fake_running = fake_ollama(decode_tps, [{"name": "m", "size": 4_000_000_000}], fail)
+
+
+@pytest.fixture
+def server():
+    with patch('ollama_utils.chat.generate_with_model', side_effect=fake_generate) as gen, \
+            patch('ollama_utils.models.list_running_models', side_effect=fake_running):
+        yield gen
+
+
+class TestProfileStore:
+    """Test the ProfileStore class."""
+
+    def test_round_trip_per_host(self, store):
+        store.set("m", {"options": {"num_ctx": 4096, "num_batch": 256}}, host="gpu-a")
+        assert store.options("m", "http://gpu-a:11434") == {"num_ctx": 4096, "num_batch": 256}
+        assert store.options("m") == {}
+        assert ProfileStore(store.path).get("m", "gpu-a")["options"]["num_ctx"] == 4096
+
+    def test_only_tuned_options_applied(self, store):
+        store.set("m", {"options": {"num_ctx": 4096, "temperature": 2}})
+        assert store.options("m") == {"num_ctx": 4096}
+
+    def test_picks_up_external_changes_and_bad_files(self, store):
+        with open(store.path, "w") as f:
+            json.dump({"http://localhost:11434": {"m": {"options": {"num_thread": 8}}}}, f)
+        assert store.options("m", "localhost") == {"num_thread": 8}
+        with open(store.path, "w") as f:
+            f.write("not json")
+        store._mtime = None
+        assert store.options("m", "localhost") == {}
+
+    def test_remove(self, store):
+        store.set("m", {"options": {"num_ctx": 2048}})
+        store.remove("m")
+        assert store.get("m") is None
+
+    def test_path_from_environment(self, tmp_path, monkeypatch):
+        monkeypatch.setenv(PROFILE_ENV, str(tmp_path / "p.json"))
+        assert ProfileStore().path == str(tmp_path / "p.json")
+
+
+class TestApplyProfile:
+    """Test that chat calls pick up tuned options."""
+
+    @patch('ollama_utils.autotune.get_context_length', return_value=2048)
+    @patch('ollama_utils.chat.requests.post')
+    def test_chat_uses_profile_but_explicit_options_win(self, mock_post, mock_length, store):
+        store.set("m", {"options": {"num_ctx": 8192, "num_batch": 512}})
+        response = Mock()
+        response.json.return_value = {"message": {"content": "hi"}, "done": True}
+        mock_post.return_value = response
+
+        chat_with_model("m", [])
+        assert mock_post.call_args.kwargs["json"]["options"] == {"num_ctx": 8192, "num_batch": 512}
+
+        chat_with_model("m", [], num_ctx=2048)
+        assert mock_post.call_args.kwargs["json"]["options"] == {"num_ctx": 2048, "num_batch": 512}
+
+        chat_with_model("other", [])
+        assert "options" not in mock_post.call_args.kwargs["json"]
+
+    @patch('ollama_utils.autotune.get_context_length', return_value=4096)
+    def test_num_ctx_below_model_default_not_applied(self, mock_length, store):
+        store.set("m", {"options": {"num_ctx": 2048, "num_batch": 512}})
+        assert apply_profile("m", None, {}) == {"num_batch": 512}
+        store.set("m", {"options": {"num_ctx": 8192}})
+        assert apply_profile("m", None, {}) == {"num_ctx": 8192}
+
+    def test_disabled_store(self):
+        set_profile_store(None)
+        assert apply_profile("m", None, {}) == {}
+
+    def test_profiles_disabled_in_tests(self):
+        assert autotune.get_profile_store() is None
+
+
+class TestAutotuner:
+    """Test the Autotuner sweep."""
+
+    def test_picks_best_and_saves(self, server, store):
+        tuner = Autotuner("m", num_ctx=(1024, 4096), num_batch=(128, 256, 999),
+                          num_thread=(4, 8), context_tokens=1000, num_predict=64)
+        profile = tuner.run()
+        assert len(profile["trials"]) == 12
+        # num_ctx=1024 cannot hold the workload, num_batch=999 fails
+        assert profile["options"] == {"num_ctx": 4096, "num_batch": 256, "num_thread": 8}
+        assert profile["memory_bytes"] == 4_000_000_000
+        assert store.options("m") == profile["options"]
+
+    def test_memory_limit_and_no_eligible(self, server, store):
+        tuner = Autotuner("m", num_ctx=(4096,), num_batch=(256,), num_thread=(4,),
+                          memory_limit=1_000_000_000)
+        assert tuner.run() is None
+        assert store.get("m") is None
+
+    def test_objective_validated(self):
+        with pytest.raises(ValueError):
+            Autotuner("m", objective="speed")
+
+    def test_main(self, server, store, capsys):
+        assert main(["m", "--num-ctx", "4096", "--num-batch", "128,256", "--num-thread", "2",
+                     "--profiles", store.path]) == 0
+        assert json.loads(capsys.readouterr().out)["options"]["num_batch"] == 256
+        assert ProfileStore(store.path).options("m")["num_thread"] == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
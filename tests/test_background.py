@@ -0,0 +1,101 @@
+"""
+Unit tests for ollama_utils.background module.
+"""
+
+import threading
+
+import pytest
+
+from ollama_utils.background import BackgroundStream
+
+
+def gated(chunks, gate):
+    """Yield chunks, pausing before each one until gate is set."""
+    for chunk in chunks:
+        gate.wait(2)
+        yield chunk
+
+
+class TestBackgroundStream:
+    """Test the BackgroundStream class."""
+
+    def test_drain_yields_everything(self):
+        stream = BackgroundStream(iter(["a", "b", "c"])).start()
+        assert "".join(stream.drain()) == "abc"
+        assert stream.done
+
+    def test_reads_ahead_of_slow_consumer(self):
+        produced = threading.Event()
+
+        def source():
+            yield from ["a", "b", "c"]
+            produced.set()
+
+        stream = BackgroundStream(source).start()
+        assert produced.wait(2)
+        stream.join(2)
+        # Nothing was consumed yet: everything arrives as one piece
+        assert list(stream.drain()) == ["abc"]
+        assert list(stream.drain(replay=False)) == []
+
+    def test_pending_buffer_is_bounded(self):
+        stream = BackgroundStream(iter("abcdef"), maxsize=2).start()
+        stream.join(2)
+        assert len(stream._pending) == 2
+        assert stream._pending[-1] == "bcdef"
+
+    def test_redrain_replays_text(self):
+        gate = threading.Event()
+        gate.set()
+        stream = BackgroundStream(gated(["a", "b", "c"], gate)).start()
+        first = stream.drain()
+        assert next(first).startswith("a")
+        first.close()  # consumer goes away, as on a Streamlit rerun
+        stream.join(2)
+        assert "".join(stream.drain()) == "abc"
+
+    def test_callable_source_and_error_string(self):
+        stream = BackgroundStream(lambda: "Chat error: down").start()
+        assert list(stream.drain()) == ["Chat error: down"]
+
+    def test_error_reraised_after_text(self):
+        def source():
+            yield "partial"
+            raise ValueError("broken stream")
+
+        stream = BackgroundStream(source).start()
+        received = []
+        with pytest.raises(ValueError):
+            for piece in stream.drain():
+                received.append(piece)
+        assert "".join(received) == "partial"
+
+    def test_cancel_closes_source(self):
+        gate = threading.Event()
+        closed = threading.Event()
+
+        def source():
+            try:
+                while True:
+                    gate.wait(2)
+                    yield "x"
+            finally:
+                closed.set()
+
+        stream = BackgroundStream(source).start()
+        stream.cancel()
+        gate.set()
+        assert closed.wait(2)
+        stream.join(2)
+        assert stream.done
+
+    def test_timeout(self):
+        gate = threading.Event()
+        stream = BackgroundStream(gated(["a"], gate)).start()
+        with pytest.raises(TimeoutError):
+            list(stream.drain(timeout=0.05))
+        gate.set()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,237 @@
+"""
+Unit tests for ollama_utils.batch module.
+"""
+
+import json
+
+import pytest
+from unittest.mock import patch
+
+from ollama_utils.batch import BatchRunner, _ModelGrouper, format_progress, main, run_batch
+
+
+def fake_generate(model_name, prompt, on_done=None, host=None, **kwargs):
+    if prompt == "fail":
+        return "Generation error: boom"
+    if on_done:
+        on_done({"eval_count": len(prompt)})
+    return prompt.upper()
+
+
+def write_input(path, prompts):
+    with open(path, "w") as f:
+        for i, prompt in enumerate(prompts):
+            f.write(json.dumps({"id": f"r{i}", "prompt": prompt}) + "\n")
+
+
+def read_output(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl")
+
+
+class TestBatchRunner:
+    """Test the BatchRunner class."""
+
+    @patch('ollama_utils.chat.generate_with_model', side_effect=fake_generate)
+    def test_runs_all_records(self, mock_generate, paths):
+        """Test that every record produces one output line."""
+        src, dst = paths
+        write_input(src, ["a", "bb", "fail", "ccc"])
+
+        stats = run_batch(src, dst, model="llama3.2:latest", concurrency=2, retry_backoff=0)
+
+        results = sorted(read_output(dst), key=lambda r: r["index"])
+        assert [r.get("response") for r in results] == ["A", "BB", None, "CCC"]
+        assert results[2]["error"] == "Generation error: boom"
+        assert results[2]["attempts"] == 4
+        assert results[0]["id"] == "r0" and results[0]["eval_count"] == 1
+        assert stats["completed"] == 4 and stats["errors"] == 1
+
+    @patch('ollama_utils.chat.chat_with_model')
+    def test_chat_records(self, mock_chat, paths):
+        """Test that records with messages go to chat_with_model."""
+        src, dst = paths
+        with open(src, "w") as f:
+            f.write(json.dumps({"model": "m", "messages": [{"role": "user", "content": "hi"}]}) + "\n")
+        mock_chat.side_effect = lambda model, messages, on_done=None, **kw: on_done({}) or "hello"
+
+        run_batch(src, dst)
+
+        assert read_output(dst)[0]["response"] == "hello"
+
+    @patch('ollama_utils.chat.generate_with_model', side_effect=fake_generate)
+    def test_resume_skips_completed(self, mock_generate, paths):
+        """Test that a rerun only processes records without results."""
+        src, dst = paths
+        write_input(src, ["a", "b", "c", "d", "e"])
+        # Simulate a crash: two results written, no checkpoint, half a line at the end
+        with open(dst, "w") as f:
+            f.write(json.dumps({"index": 0, "response": "A"}) + "\n")
+            f.write(json.dumps({"index": 3, "response": "D"}) + "\n")
+            f.write('{"index": 4, "resp')
+
+        stats = BatchRunner(model="m", concurrency=1).run(src, dst)
+
+        processed = sorted(call.args[1] for call in mock_generate.call_args_list)
+        assert processed == ["b", "c", "e"]
+        assert sorted(r["index"] for r in read_output(dst)) == [0, 1, 2, 3, 4]
+        assert stats["completed"] == 5
+
+        mock_generate.reset_mock()
+        BatchRunner(model="m").run(src, dst)
+        mock_generate.assert_not_called()
+
+    @patch('ollama_utils.chat.generate_with_model')
+    def test_connection_errors_retried(self, mock_generate, paths):
+        """Test that connection errors are retried and HTTP client errors are not."""
+        src, dst = paths
+        write_input(src, ["a", "b"])
+        outcomes = {"a": ["Generation error: Connection refused", "ok"],
+                    "b": ["Generation error (404): model not found"]}
+
+        def generate(model_name, prompt, on_done=None, **kwargs):
+            content = outcomes[prompt].pop(0)
+            if not content.startswith("Generation error"):
+                on_done({})
+            return content
+        mock_generate.side_effect = generate
+
+        run_batch(src, dst, model="m", concurrency=1, retry_backoff=0)
+
+        results = sorted(read_output(dst), key=lambda r: r["index"])
+        assert results[0]["response"] == "ok" and results[0]["attempts"] == 2
+        assert results[1]["error"].endswith("model not found") and "attempts" not in results[1]
+
+    @patch('ollama_utils.chat.generate_with_model', side_effect=fake_generate)
+    def test_resume_retry_errors(self, mock_generate, paths):
+        """Test that retry_errors reruns records whose last result failed."""
+        src, dst = paths
+        write_input(src, ["a", "b", "c"])
+        with open(dst, "w") as f:
+            f.write(json.dumps({"index": 0, "response": "A"}) + "\n")
+            f.write(json.dumps({"index": 1, "error": "Generation error: refused"}) + "\n")
+            f.write(json.dumps({"index": 2, "error": "Generation error: refused"}) + "\n")
+            f.write(json.dumps({"index": 2, "response": "C"}) + "\n")
+
+        stats = run_batch(src, dst, model="m")
+        mock_generate.assert_not_called()
+        assert stats["completed"] == 3
+
+        stats = run_batch(src, dst, model="m", retry_errors=True)
+
+        assert [call.args[1] for call in mock_generate.call_args_list] == ["b"]
+        assert read_output(dst)[-1] == {**read_output(dst)[-1], "index": 1, "response": "B"}
+        assert stats["completed"] == 3 and stats["errors"] == 0
+
+        mock_generate.reset_mock()
+        run_batch(src, dst, model="m", retry_errors=True)
+        mock_generate.assert_not_called()
+
+    @patch('ollama_utils.chat.generate_with_model', side_effect=fake_generate)
+    def test_bad_record_written_as_error(self, mock_generate, paths):
+        """Test that a record that raises is written as an error instead of ending the run."""
+        src, dst = paths
+        with open(src, "w") as f:
+            f.write(json.dumps({"prompt": "a"}) + "\n")
+            f.write(json.dumps({"messages": "oops"}) + "\n")
+            f.write(json.dumps({"prompt": "c"}) + "\n")
+
+        stats = run_batch(src, dst, model="m")
+
+        results = sorted(read_output(dst), key=lambda r: r["index"])
+        assert [r.get("response") for r in results] == ["A", None, "C"]
+        assert results[1]["error"].startswith("Record error: AttributeError")
+        assert stats["completed"] == 3 and stats["errors"] == 1
+
+        mock_generate.reset_mock()
+        stats = run_batch(src, dst, model="m")
+        mock_generate.assert_not_called()
+        assert stats["completed"] == 3
+
+        stats = run_batch(src, dst, model="m", retry_errors=True)
+        assert len(read_output(dst)) == 4 and "error" in read_output(dst)[-1]
+        assert stats["completed"] == 3 and stats["errors"] == 1
+
+    @patch('ollama_utils.chat.generate_with_model', side_effect=fake_generate)
+    def test_restart_discards_progress(self, mock_generate, paths):
+        """Test that resume=False starts the job over."""
+        src, dst = paths
+        write_input(src, ["a", "b"])
+        run_batch(src, dst, model="m")
+
+        run_batch(src, dst, model="m", resume=False)
+
+        assert len(read_output(dst)) == 2
+        assert mock_generate.call_count == 4
+
+    @patch('ollama_utils.chat.generate_with_model', side_effect=fake_generate)
+    def test_progress_reporting(self, mock_generate, paths):
+        """Test that the final progress report is delivered."""
+        src, dst = paths
+        write_input(src, ["a"])
+        reports = []
+
+        BatchRunner(model="m", progress=reports.append).run(src, dst)
+
+        assert reports[-1]["completed"] == 1
+        assert "1/1 done" in format_progress(reports[-1])
+
+
+class TestModelGrouping:
+    """Test swap-aware reordering."""
+
+    def _grouped(self, models, **kwargs):
+        records = iter([(i, {"model": m}) for i, m in enumerate(models)])
+        grouper = _ModelGrouper(records, lambda r: r["model"], **kwargs)
+        return [r["model"] for _, r in grouper], grouper
+
+    def test_groups_within_window(self):
+        order, grouper = self._grouped(["a", "b", "a", "b", "a", "b"], window=10)
+        assert order == ["a", "a", "a", "b", "b", "b"]
+        assert grouper.baseline_loads == 6 and grouper.loads == 2
+
+    def test_max_defer_bounds_reordering(self):
+        order, _ = self._grouped(["a", "b", "a", "a", "a", "a"], window=10, max_defer=2)
+        assert order.index("b") <= 1 + 2
+
+    def test_zero_defer_keeps_input_order(self):
+        models = ["a", "b", "a", "c", "b"]
+        order, grouper = self._grouped(models, window=10, max_defer=0)
+        assert order == models
+        assert grouper.loads == grouper.baseline_loads
+
+    @patch('ollama_utils.chat.generate_with_model', side_effect=fake_generate)
+    def test_runner_reports_loads_avoided(self, mock_generate, paths):
+        src, dst = paths
+        with open(src, "w") as f:
+            for i in range(6):
+                f.write(json.dumps({"model": "ab"[i % 2], "prompt": str(i)}) + "\n")
+
+        stats = run_batch(src, dst, concurrency=1, group_by_model=True)
+
+        assert [c.args[0] for c in mock_generate.call_args_list] == ["a"] * 3 + ["b"] * 3
+        assert stats["model_loads"] == 2 and stats["loads_avoided"] == 4
+        assert sorted(r["index"] for r in read_output(dst)) == list(range(6))
+        assert "4 model loads avoided" in format_progress(stats)
+
+
+class TestMain:
+    """Test the command-line entry point."""
+
+    @patch('ollama_utils.chat.generate_with_model', side_effect=fake_generate)
+    def test_cli(self, mock_generate, paths):
+        """Test options parsing and exit status."""
+        src, dst = paths
+        write_input(src, ["a"])
+
+        assert main([src, dst, "--model", "m", "--option", "temperature=0"]) == 0
+        assert mock_generate.call_args.kwargs["temperature"] == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
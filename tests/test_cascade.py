@@ -0,0 +1,120 @@
+"""
+Unit tests for ollama_utils.cascade module.
+"""
+
+import pytest
+from unittest.mock import patch
+
+from ollama_utils.cascade import (
+    Cascade,
+    all_checks,
+    json_check,
+    logprob_check,
+    schema_check,
+    validator_check,
+)
+
+MESSAGES = [{"role": "user", "content": "Give me JSON"}]
+
+
+def fake_chat(answers):
+    """Return a chat_with_model stand-in answering per model."""
+    def chat(model_name, messages, on_done=None, **kwargs):
+        content, data = answers[model_name]
+        if data is not None and on_done:
+            on_done(data)
+        return content
+    return chat
+
+
+class TestChecks:
+    """Test the acceptance checks."""
+
+    def test_json_check(self):
+        assert json_check()('{"a": 1}', {}) is True
+        assert json_check()("not json", {}).startswith("invalid JSON")
+
+    def test_schema_check(self):
+        check = schema_check({"type": "object", "required": ["a"]})
+        assert check('{"a": 1}', {}) is True
+        assert "missing required property" in check('{"b": 1}', {})
+
+    def test_logprob_check(self):
+        check = logprob_check(-1.0)
+        assert check("x", {"logprobs": [{"logprob": -0.1}, {"logprob": -0.5}]}) is True
+        assert "below" in check("x", {"logprobs": [{"logprob": -3.0}]})
+        assert check("x", {}) == "no logprobs in response"
+
+    def test_all_checks_reports_first_rejection(self):
+        check = all_checks(json_check(), validator_check(lambda s: len(s) < 5))
+        assert check("[1]", {}) is True
+        assert check("[1, 2, 3]", {}) == "rejected by validator"
+
+
+class TestCascade:
+    """Test the Cascade class."""
+
+    @patch('ollama_utils.chat.chat_with_model')
+    def test_small_model_accepted(self, mock_chat):
+        """Test that an accepted cheap answer stops the cascade."""
+        mock_chat.side_effect = fake_chat({
+            "small": ('{"ok": true}', {"eval_count": 5, "total_duration": 2e8}),
+            "large": ('{"ok": true}', {"eval_count": 5, "total_duration": 9e9}),
+        })
+        cascade = Cascade(["small", "large"], accept=json_check())
+
+        result = cascade.chat(MESSAGES)
+
+        assert result.model == "small"
+        assert result.accepted
+        assert len(result.tiers) == 1
+        assert result.server_seconds == pytest.approx(0.2)
+        assert cascade.stats["large"]["calls"] == 0
+
+    @patch('ollama_utils.chat.chat_with_model')
+    def test_escalates_on_rejection(self, mock_chat):
+        """Test escalation to the next tier when the check rejects."""
+        mock_chat.side_effect = fake_chat({
+            "small": ("Sure! Here is JSON", {"total_duration": 1e8}),
+            "large": ('{"ok": true}', {"total_duration": 3e9}),
+        })
+        cascade = Cascade(["small", "large"], accept=json_check())
+
+        result = cascade.chat(MESSAGES)
+
+        assert result.model == "large"
+        assert result.content == '{"ok": true}'
+        assert [t.accepted for t in result.tiers] == [False, True]
+        assert result.tiers[0].reason.startswith("invalid JSON")
+        report = {row["model"]: row for row in cascade.report()}
+        assert report["small"]["acceptance_rate"] == 0
+        assert report["large"]["mean_server_seconds"] == pytest.approx(3.0)
+
+    @patch('ollama_utils.chat.chat_with_model')
+    def test_errors_escalate(self, mock_chat):
+        """Test that a failed tier counts as an error and escalates."""
+        mock_chat.side_effect = fake_chat({
+            "small": ("Chat error: model not found", None),
+            "large": ("answer", {}),
+        })
+        cascade = Cascade(["small", "large"])
+
+        result = cascade.chat(MESSAGES)
+
+        assert result.content == "answer"
+        assert result.accepted
+        assert cascade.stats["small"]["errors"] == 1
+        assert cascade.stats["large"]["errors"] == 0
+
+    @patch('ollama_utils.chat.chat_with_model')
+    def test_last_tier_returned_when_all_reject(self, mock_chat):
+        """Test that the last tier's answer is returned even when rejected."""
+        mock_chat.side_effect = fake_chat({"a": ("x", {}), "b": ("y", {})})
+        result = Cascade(["a", "b"], accept=json_check()).chat(MESSAGES)
+
+        assert result.content == "y"
+        assert not result.accepted
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
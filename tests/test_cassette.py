@@ -0,0 +1,96 @@
+"""
+Unit tests for ollama_utils.cassette module.
+"""
+
+import json
+import time
+
+import pytest
+from unittest.mock import Mock, patch
+
+from ollama_utils.cassette import ReplayTransport, record, replay
+from ollama_utils.chat import chat_with_model, generate_with_model
+from ollama_utils.models import list_models
+
+from .conftest import streaming_response
+
+MESSAGES = [{"role": "user", "content": "Hello"}]
+
+
+@pytest.fixture
+def cassette(tmp_path):
+    """Record one streaming chat and one model listing."""
+    path = str(tmp_path / "session.jsonl.gz")
+    with patch('ollama_utils.transport.requests.post') as mock_post, \
+            patch('ollama_utils.transport.requests.get') as mock_get:
+        mock_post.side_effect = [
+            streaming_response([
+                b'{"message": {"content": "Hi"}}',
+                b'{"message": {"content": " there"}}',
+                b'{"message": {"content": ""}, "done": true, "eval_count": 2}',
+            ], gap=0.02),
+        ]
+        mock_get.return_value = Mock(status_code=200, text='{"models": [{"name": "m"}]}')
+        mock_get.return_value.json.return_value = {"models": [{"name": "m"}]}
+        with record(path):
+            assert "".join(chat_with_model("m", MESSAGES, stream=True)) == "Hi there"
+            assert list_models() == [{"name": "m"}]
+    return path
+
+
+class TestCassette:
+    """Test recording and replaying sessions."""
+
+    def test_replay_instant(self, cassette):
+        """Test that a recorded stream replays with no server."""
+        with replay(cassette, speed=0):
+            start = time.perf_counter()
+            assert list(chat_with_model("m", MESSAGES, stream=True)) == ["Hi", " there"]
+            assert time.perf_counter() - start < 0.03
+            assert list_models() == [{"name": "m"}]
+
+    def test_replay_recorded_speed(self, cassette):
+        """Test that inter-chunk timing is reproduced."""
+        with replay(cassette, speed=1.0):
+            start = time.perf_counter()
+            list(chat_with_model("m", MESSAGES, stream=True))
+            assert time.perf_counter() - start >= 0.05
+
+    def test_on_done_sees_recorded_stats(self, cassette):
+        """Test that final response data is replayed too."""
+        final = []
+        with replay(cassette, speed=0):
+            list(chat_with_model("m", MESSAGES, stream=True, on_done=final.append))
+        assert final[0]["eval_count"] == 2
+
+    def test_fallback_and_strict(self, cassette):
+        """Test matching by path for unseen bodies, and strict mode."""
+        other = [{"role": "user", "content": "Something else"}]
+        with replay(cassette, speed=0):
+            assert "".join(chat_with_model("m", other, stream=True)) == "Hi there"
+        with replay(cassette, speed=0, strict=True):
+            assert chat_with_model("m", other).startswith("Chat error")
+
+    def test_loop(self, cassette):
+        """Test that recordings are reused for load tests unless loop is off."""
+        transport = ReplayTransport(cassette, speed=0, loop=False)
+        url = transport.url("/api/tags")
+        transport.get(url)
+        with pytest.raises(Exception):
+            transport.get(url)
+
+    def test_http_error_replayed(self, tmp_path):
+        """Test that a recorded error status raises like a live one."""
+        path = tmp_path / "errors.jsonl"
+        key = json.dumps(["POST", "/api/generate", {"model": "x", "prompt": "p", "stream": False}],
+                         sort_keys=True)
+        path.write_text(json.dumps({"key": key, "status": 404,
+                                    "body": '{"error": "model not found"}'}) + "\n")
+
+        with replay(str(path), speed=0):
+            result = generate_with_model("x", "p")
+        assert result.startswith("Generation error (404)")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
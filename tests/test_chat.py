@@ -95,6 +95,41 @@ class TestChatWithModel:
             stream=True
         )
     
+    @patch('ollama_utils.chat.requests.post')
+    def test_chat_with_model_top_level_fields(self, mock_post):
+        """Test that request-level fields are not nested under options."""
+        mock_response = Mock()
+        mock_response.json.return_value = {"message": {"content": "{}"}}
+        mock_response.raise_for_status.return_value = None
+        mock_post.return_value = mock_response
+        
+        messages = [{"role": "user", "content": "Hello"}]
+        chat_with_model("llama3.2:latest", messages, format="json", keep_alive="5m", temperature=0)
+        
+        payload = mock_post.call_args[1]["json"]
+        assert payload["format"] == "json"
+        assert payload["keep_alive"] == "5m"
+        assert payload["options"] == {"temperature": 0}
+    
+    @patch('ollama_utils.chat.requests.post')
+    def test_chat_with_model_on_done(self, mock_post):
+        """Test that on_done receives the final response with token counts."""
+        mock_response = Mock()
+        mock_response.iter_lines.return_value = [
+            b'{"message": {"content": "Hi"}, "done": false}',
+            b'{"message": {"content": ""}, "done": true, "prompt_eval_count": 12}'
+        ]
+        mock_response.raise_for_status.return_value = None
+        mock_post.return_value = mock_response
+        on_done = Mock()
+        
+        messages = [{"role": "user", "content": "Hello"}]
+        chunks = list(chat_with_model("llama3.2:latest", messages, stream=True, on_done=on_done))
+        
+        assert chunks == ["Hi"]
+        on_done.assert_called_once()
+        assert on_done.call_args[0][0]["prompt_eval_count"] == 12
+    
     @patch('ollama_utils.chat.requests.post')
     def test_chat_with_model_error(self, mock_post):
         """Test chat with error."""
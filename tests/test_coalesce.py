@@ -0,0 +1,115 @@
+"""
+Unit tests for ollama_utils.coalesce module.
+"""
+
+import json
+
+import pytest
+from unittest.mock import Mock, patch
+
+from ollama_utils.chat import chat_with_model, generate_with_model
+from ollama_utils.coalesce import Coalescer, coalesce, make_coalescer
+from ollama_utils.hooks import SpanRecorder
+
+from .conftest import streaming_response
+
+TOKENS = ["Hello", ",", " wor", "ld", "!", " How", " are", "\n", "you", " to", "day", "?"]
+
+
+class TestCoalescer:
+    """Test the Coalescer batching rules."""
+
+    def test_first_chunk_passes_through(self):
+        for spec in (100, 10.0, "word", "line"):
+            pieces = list(coalesce(TOKENS, spec))
+            assert pieces[0] == "Hello"
+            assert "".join(pieces) == "".join(TOKENS)
+
+    def test_min_chars(self):
+        pieces = list(coalesce(TOKENS, 6))
+        assert all(len(p) >= 6 for p in pieces[1:-1])
+        assert len(pieces) < len(TOKENS)
+
+    def test_word_boundary(self):
+        pieces = list(coalesce(TOKENS, "word"))
+        assert pieces == ["Hello", ",", " world!", " How", " are", "\nyou", " today?"]
+
+    def test_line_boundary(self):
+        assert list(coalesce(TOKENS, "line")) == ["Hello", ", world! How are\n", "you today?"]
+
+    def test_interval(self):
+        clock = iter([0.0, 0.01, 0.02, 0.2, 0.21])
+        with patch('ollama_utils.coalesce.time.monotonic', side_effect=lambda: next(clock)):
+            pieces = list(Coalescer(interval=0.1).wrap(["a", "b", "c", "d", "e"]))
+        assert pieces == ["a", "bcd", "e"]
+
+    def test_interval_with_min_chars(self):
+        pieces = list(Coalescer(min_chars=3, interval=60).wrap("abcdefgh"))
+        assert pieces == ["a", "bcd", "efg", "h"]
+
+    def test_make_coalescer(self):
+        assert make_coalescer(None) is None
+        assert make_coalescer(32).min_chars == 32
+        assert make_coalescer(0.05).interval == 0.05
+        assert make_coalescer({"boundary": "word", "min_chars": 64}).boundary == "word"
+        with pytest.raises(ValueError):
+            make_coalescer("sentence")
+        with pytest.raises(ValueError):
+            Coalescer()
+        with pytest.raises(TypeError):
+            make_coalescer(True)
+
+
+class TestCoalescedStreams:
+    """Test coalesce= in chat_with_model and generate_with_model."""
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_chat_stream_coalesced(self, mock_post):
+        mock_post.return_value = streaming_response(TOKENS)
+        final = []
+        pieces = list(chat_with_model("m", [], stream=True, coalesce="word",
+                                      on_done=final.append))
+        assert pieces[0] == "Hello"
+        assert "".join(pieces) == "".join(TOKENS)
+        assert len(pieces) == 7
+        assert final[0]["eval_count"] == len(TOKENS)
+        assert "coalesce" not in mock_post.call_args.kwargs["json"].get("options", {})
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_hooks_see_every_chunk(self, mock_post):
+        mock_post.return_value = streaming_response(TOKENS)
+        recorder = SpanRecorder().start()
+        try:
+            pieces = list(chat_with_model("m", [], stream=True, coalesce=1000))
+        finally:
+            recorder.stop()
+        assert len(pieces) == 2
+        assert recorder.summary()[0]["chunks"] == len(TOKENS)
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_rest_flushed_before_on_done(self, mock_post):
+        mock_post.return_value = streaming_response(TOKENS, key="response")
+        seen = []
+        stream = generate_with_model("m", "p", stream=True, coalesce=1000,
+                                     on_done=lambda data: seen.append("done"))
+        for piece in stream:
+            seen.append(piece)
+        assert seen == ["Hello", "".join(TOKENS[1:]), "done"]
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_stream_without_done_is_flushed(self, mock_post):
+        response = Mock()
+        response.iter_lines.return_value = [json.dumps({"response": t}).encode()
+                                            for t in ["a", "b", "c"]]
+        mock_post.return_value = response
+        assert list(generate_with_model("m", "p", stream=True, coalesce=100)) == ["a", "bc"]
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_with_stop_predicate(self, mock_post):
+        mock_post.return_value = streaming_response(TOKENS)
+        pieces = list(chat_with_model("m", [], stream=True, coalesce=100, stop_when="!"))
+        assert pieces == ["Hello", ", world!"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,144 @@
+"""
+Unit tests for ollama_utils.compaction module.
+"""
+
+import threading
+
+import pytest
+from unittest.mock import patch
+
+from ollama_utils.compaction import SUMMARY_PREFIX, HistoryCompactor
+from ollama_utils.context import TokenEstimator
+
+
+def make_history(turns, size=400):
+    messages = [{"role": "system", "content": "Be helpful."}]
+    for i in range(turns):
+        role = "user" if i % 2 == 0 else "assistant"
+        messages.append({"role": role, "content": f"turn {i} " + "x" * size})
+    return messages
+
+
+def fake_summary(model_name, messages, on_done=None, **kwargs):
+    on_done({"done": True})
+    return f"summary of {messages[1]['content'].count('turn ')} turns"
+
+
+def compactor(**kwargs):
+    kwargs.setdefault("threshold", 500)
+    kwargs.setdefault("keep_recent", 2)
+    return HistoryCompactor("tiny", estimator=TokenEstimator(), **kwargs)
+
+
+class TestHistoryCompactor:
+    """Test rolling summarization."""
+
+    def test_short_history_unchanged(self):
+        c = compactor()
+        messages = make_history(3, size=10)
+        with patch('ollama_utils.chat.chat_with_model') as mock_chat:
+            assert c.compact("m", messages) == messages
+        mock_chat.assert_not_called()
+
+    @patch('ollama_utils.chat.chat_with_model', side_effect=fake_summary)
+    def test_inline_summary_replaces_old_turns(self, mock_chat):
+        c = compactor(background=False)
+        messages = make_history(10)
+
+        result = c.compact("m", messages)
+
+        assert result[0] == messages[0]
+        assert result[1]["content"] == SUMMARY_PREFIX + "summary of 8 turns"
+        assert result[2:] == messages[-2:]
+        assert mock_chat.call_args.args[0] == "tiny"
+        assert c.stats["last_tokens_saved"] > 0
+
+    @patch('ollama_utils.chat.chat_with_model', side_effect=fake_summary)
+    def test_summary_cached_and_rolled_forward(self, mock_chat):
+        c = compactor(background=False)
+        messages = make_history(10)
+        c.compact("m", messages)
+        c.compact("m", messages)
+        assert mock_chat.call_count == 1
+
+        # Growing the history past the threshold again folds the old summary in
+        longer = make_history(16)
+        result = c.compact("m", longer)
+        assert mock_chat.call_count == 2
+        prompt = mock_chat.call_args.args[1][1]["content"]
+        assert "Earlier summary:\nsummary of 8 turns" in prompt
+        assert "turn 7 " not in prompt and "turn 8 " in prompt
+        assert result[2:] == longer[-2:]
+
+    def test_background_does_not_block(self):
+        release = threading.Event()
+
+        def slow_summary(model_name, messages, on_done=None, **kwargs):
+            release.wait(2)
+            return fake_summary(model_name, messages, on_done)
+
+        c = compactor()
+        messages = make_history(10)
+        with patch('ollama_utils.chat.chat_with_model', side_effect=slow_summary) as mock_chat:
+            assert c.compact("m", messages) == messages
+            assert c.compact("m", messages) == messages
+            release.set()
+            c.wait()
+            result = c.compact("m", messages)
+        assert mock_chat.call_count == 1
+        assert result[1]["content"].startswith(SUMMARY_PREFIX)
+
+    def test_one_summary_in_flight_as_history_grows(self):
+        release = threading.Event()
+
+        def slow_summary(model_name, messages, on_done=None, **kwargs):
+            release.wait(2)
+            return fake_summary(model_name, messages, on_done)
+
+        c = compactor()
+        with patch('ollama_utils.chat.chat_with_model', side_effect=slow_summary) as mock_chat:
+            for turns in range(10, 16):
+                c.compact("m", make_history(turns))
+            release.set()
+            c.wait()
+        assert mock_chat.call_count == 1
+
+    @patch('ollama_utils.chat.chat_with_model', side_effect=fake_summary)
+    def test_summary_reused_with_sliding_window(self, mock_chat):
+        c = compactor(background=False)
+        messages = make_history(10)
+        c.compact("m", messages)
+
+        window = messages[:1] + messages[4:] + [{"role": "user", "content": "more"}]
+        result = c.compact("m", window)
+
+        assert mock_chat.call_count == 1
+        assert result[1]["content"] == SUMMARY_PREFIX + "summary of 8 turns"
+        assert result[2:] == window[-3:]
+
+    @patch('ollama_utils.chat.chat_with_model', side_effect=fake_summary)
+    def test_conversations_kept_apart(self, mock_chat):
+        c = compactor(background=False)
+        c.compact("m", make_history(10), conversation_id="a")
+        other = make_history(2, size=10)
+        assert c.compact("m", other, conversation_id="b") == other
+
+    @patch('ollama_utils.chat.chat_with_model', return_value="Chat error: down")
+    def test_failed_summary_sends_full_history(self, mock_chat):
+        c = compactor(background=False)
+        messages = make_history(10)
+        assert c.compact("m", messages) == messages
+        assert c.stats["summary_errors"] == 1
+
+    @patch('ollama_utils.chat.chat_with_model', side_effect=fake_summary)
+    def test_report(self, mock_chat):
+        c = compactor(background=False)
+        c.compact("m", make_history(10))
+        c.compact("m", make_history(2, size=10))
+        report = c.report()
+        assert report["turns"] == 2
+        assert report["mean_tokens_saved"] == report["tokens_saved"] / 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,151 @@
+"""
+Unit tests for ollama_utils.context module.
+"""
+
+import pytest
+from unittest.mock import Mock, patch
+
+from ollama_utils import context
+from ollama_utils.context import (
+    ContextBudget,
+    TokenEstimator,
+    get_context_length,
+    trim_messages,
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_context_cache():
+    context._context_lengths.clear()
+    yield
+    context._context_lengths.clear()
+
+
+class TestGetContextLength:
+    """Test the get_context_length function."""
+
+    @patch('ollama_utils.context.requests.post')
+    def test_num_ctx_parameter_capped_by_model(self, mock_post):
+        """Test num_ctx from the Modelfile, capped by the trained length, cached."""
+        mock_response = Mock()
+        mock_response.json.return_value = {
+            "parameters": "stop \"<|eot_id|>\"\nnum_ctx 8192",
+            "model_info": {"llama.context_length": 4096}
+        }
+        mock_response.raise_for_status.return_value = None
+        mock_post.return_value = mock_response
+
+        assert get_context_length("llama3.2:latest") == 4096
+        assert get_context_length("llama3.2:latest") == 4096
+        mock_post.assert_called_once_with(
+            "http://localhost:11434/api/show",
+            json={"model": "llama3.2:latest"}
+        )
+
+    @patch('ollama_utils.context.requests.post')
+    def test_error_returns_default_uncached(self, mock_post):
+        """Test that lookup failures fall back to the default and retry later."""
+        import requests
+        mock_post.side_effect = requests.exceptions.RequestException("Connection failed")
+
+        assert get_context_length("llama3.2:latest") == context.DEFAULT_NUM_CTX
+        assert "llama3.2:latest" not in context._context_lengths
+
+
+class TestTokenEstimator:
+    """Test the TokenEstimator class."""
+
+    def test_calibration_moves_ratio(self):
+        """Test that server counts pull the ratio towards the observed value."""
+        est = TokenEstimator(alpha=1.0)
+        messages = [{"role": "user", "content": "x" * 300}]
+        est.observe("m", messages, 100 + context.MESSAGE_OVERHEAD_TOKENS)
+
+        assert est.ratio("m") == pytest.approx(3.0)
+        assert est.ratio("other") == context.DEFAULT_CHARS_PER_TOKEN
+
+    def test_implausible_observation_ignored(self):
+        """Test that cache-shortened prompt counts are ignored."""
+        est = TokenEstimator(alpha=1.0)
+        messages = [{"role": "user", "content": "x" * 3000}]
+        est.observe("m", messages, 10)
+
+        assert est.ratio("m") == context.DEFAULT_CHARS_PER_TOKEN
+
+    def test_cached_prefix_counts_ignored(self):
+        """Test that later turns counting only the uncached suffix do not drift the ratio."""
+        est = TokenEstimator(alpha=1.0)
+        history = [{"role": "user", "content": "x" * 400}]
+        est.observe("m", history, 100 + context.MESSAGE_OVERHEAD_TOKENS)
+        assert est.ratio("m") == pytest.approx(4.0)
+
+        # The next turn reuses the cached first message; only the new ones are counted
+        history = history + [{"role": "assistant", "content": "y" * 200},
+                             {"role": "user", "content": "z" * 200}]
+        est.observe("m", history, 90 + 3 * context.MESSAGE_OVERHEAD_TOKENS)
+
+        assert est.ratio("m") == pytest.approx(4.0)
+
+        # A fully evaluated longer prompt still calibrates
+        est.observe("m", history, 160 + 3 * context.MESSAGE_OVERHEAD_TOKENS)
+        assert est.ratio("m") == pytest.approx(5.0)
+
+
+class TestTrimMessages:
+    """Test the trim_messages function."""
+
+    def make_history(self):
+        return [
+            {"role": "system", "content": "s" * 40},
+            {"role": "user", "content": "a" * 400},
+            {"role": "assistant", "content": "b" * 400, "pinned": True},
+            {"role": "user", "content": "c" * 400},
+            {"role": "assistant", "content": "d" * 400},
+            {"role": "user", "content": "e" * 40},
+        ]
+
+    def test_fits_unchanged(self):
+        """Test that a history within budget is returned as is."""
+        history = self.make_history()
+        assert trim_messages(history, 10000) == history
+
+    def test_drops_oldest_keeps_system_and_pinned(self):
+        """Test dropping oldest turns while keeping system and pinned messages."""
+        history = self.make_history()
+        result = trim_messages(history, 250, pinned=lambda m: m.get("pinned"))
+
+        roles = [m["content"][0] for m in result]
+        assert roles == ["s", "b", "d", "e"]
+
+    def test_last_message_always_kept(self):
+        """Test that the newest message survives even a tiny budget."""
+        history = self.make_history()
+        result = trim_messages(history, 1, keep_system=False)
+
+        assert result == [history[-1]]
+
+
+class TestContextBudget:
+    """Test the ContextBudget class."""
+
+    def test_fit_with_reserve(self):
+        """Test that the reply reserve is subtracted from the window."""
+        budget = ContextBudget(reserve=100, context_length=300)
+        history = [{"role": "user", "content": "x" * 1000}, {"role": "user", "content": "y"}]
+
+        assert budget.budget("m") == 200
+        assert budget.fit("m", history) == [history[1]]
+
+    def test_observer_calibrates(self):
+        """Test that the on_done observer feeds prompt_eval_count to the estimator."""
+        est = TokenEstimator(alpha=1.0)
+        budget = ContextBudget(estimator=est)
+        messages = [{"role": "user", "content": "x" * 200}]
+
+        budget.observer("m", messages)({"prompt_eval_count": 54})
+
+        assert est.ratio("m") == pytest.approx(4.0)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
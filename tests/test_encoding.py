@@ -0,0 +1,99 @@
+"""
+Unit tests for ollama_utils.encoding module.
+"""
+
+import json
+
+import pytest
+from unittest.mock import Mock, patch
+
+from ollama_utils.chat import chat_with_model
+from ollama_utils.encoding import EncodedMessages
+from ollama_utils.history import ConversationStore
+
+
+def history(n, size=10):
+    return EncodedMessages({"role": "user" if i % 2 == 0 else "assistant",
+                            "content": f"{i} é " + "x" * size} for i in range(n))
+
+
+class TestEncodedMessages:
+    """Test the EncodedMessages class."""
+
+    def test_body_is_valid_json(self):
+        messages = history(5)
+        payload = {"model": "m", "stream": False, "options": {"temperature": 0}}
+        body = b"".join(messages.body(payload))
+        assert json.loads(body) == dict(payload, messages=list(messages))
+
+    def test_empty_history_and_small_chunks(self):
+        assert json.loads(b"".join(EncodedMessages().body({"model": "m"}))) == \
+            {"model": "m", "messages": []}
+        pieces = list(history(20, size=100).body({"model": "m"}, chunk_size=256))
+        assert len(pieces) > 5
+        assert len(json.loads(b"".join(pieces))["messages"]) == 20
+
+    def test_each_message_encoded_once(self):
+        messages = history(3)
+        with patch('ollama_utils.encoding._encode',
+                   side_effect=lambda v: json.dumps(v).encode()) as mock_encode:
+            b"".join(messages.body({"model": "m"}))
+            messages.append({"role": "user", "content": "new"})
+            b"".join(messages.body({"model": "m"}))
+        # Two payload heads plus one encoding per message
+        assert mock_encode.call_count == 2 + 4
+
+    def test_slices_share_cache(self):
+        messages = history(4)
+        b"".join(messages.body({"model": "m"}))
+        tail = messages[2:]
+        assert isinstance(tail, EncodedMessages)
+        assert tail.cache is messages.cache
+        assert isinstance(messages + [{"role": "user", "content": "x"}], EncodedMessages)
+
+    def test_replaced_message_reencoded(self):
+        messages = history(2)
+        b"".join(messages.body({"model": "m"}))
+        messages[0] = {"role": "user", "content": "changed"}
+        body = json.loads(b"".join(messages.body({"model": "m"})))
+        assert body["messages"][0]["content"] == "changed"
+
+
+class TestChatWithEncodedMessages:
+    """Test that chat_with_model streams the cached encoding."""
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_streams_body(self, mock_post):
+        mock_response = Mock()
+        mock_response.json.return_value = {"message": {"content": "hi"}, "done": True}
+        mock_post.return_value = mock_response
+        messages = history(3)
+
+        assert chat_with_model("m", messages, temperature=0.5) == "hi"
+
+        kwargs = mock_post.call_args.kwargs
+        assert "json" not in kwargs
+        assert kwargs["headers"]["Content-Type"] == "application/json"
+        body = json.loads(b"".join(kwargs["data"]))
+        assert body == {"model": "m", "stream": False, "options": {"temperature": 0.5},
+                        "messages": list(messages)}
+
+
+class TestConversationEncoding:
+    """Test that stored conversations reuse encodings across turns."""
+
+    def test_recent_returns_encoded_messages(self):
+        store = ConversationStore(":memory:")
+        conv = store.conversation("c")
+        conv.append("user", "hello")
+        first = conv.recent()
+        b"".join(first.body({"model": "m"}))
+        conv.append("assistant", "hi")
+        second = conv.recent()
+        assert isinstance(second, EncodedMessages)
+        assert id(second[0]) in second.cache
+        store.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,115 @@
+"""
+Unit tests for ollama_utils.fanout module.
+"""
+
+import asyncio
+import threading
+
+import pytest
+from unittest.mock import patch
+
+from ollama_utils.fanout import Broadcast, broadcast_chat
+
+
+def gated_source(chunks, gate):
+    """Yield chunks only after the gate is opened."""
+    gate.wait()
+    for chunk in chunks:
+        yield chunk
+
+
+class TestBroadcast:
+    """Test the Broadcast class."""
+
+    def test_all_subscribers_receive_every_chunk(self):
+        """Test that each subscriber sees the full stream."""
+        gate = threading.Event()
+        b = Broadcast(gated_source(["a", "b", "c"], gate)).start()
+        subs = [b.subscribe() for _ in range(3)]
+        gate.set()
+
+        for sub in subs:
+            assert list(sub) == ["a", "b", "c"]
+        assert b.text == "abc"
+
+    def test_late_joiner_replays_from_start(self):
+        """Test that a subscriber joining after completion gets the whole stream."""
+        b = Broadcast(iter(["x", "y"])).start()
+        b.join(1)
+
+        assert list(b.subscribe()) == ["x", "y"]
+
+    def test_live_subscriber_skips_history(self):
+        """Test subscribing without replay starts at the live position."""
+        b = Broadcast(iter(["x", "y"])).start()
+        b.join(1)
+
+        assert list(b.subscribe(replay=False)) == []
+
+    def test_slow_subscriber_catches_up(self):
+        """Test that a lagging subscriber is skipped ahead, not blocking the producer."""
+        gate = threading.Event()
+        b = Broadcast(gated_source([str(i) for i in range(10)], gate), maxsize=3).start()
+        sub = b.subscribe(replay=False)
+        gate.set()
+        b.join(1)
+
+        assert b.done
+        assert list(sub) == ["7", "8", "9"]
+        assert sub.skipped == 7
+
+    def test_slow_subscriber_dropped(self):
+        """Test the drop policy disconnects a lagging subscriber."""
+        gate = threading.Event()
+        b = Broadcast(gated_source(list("abcdef"), gate), maxsize=2, policy="drop").start()
+        sub = b.subscribe(replay=False)
+        gate.set()
+        b.join(1)
+
+        assert sub.dropped
+        assert list(sub) == []
+
+    def test_no_replay_trims_buffer(self):
+        """Test that consumed chunks are released when replay is disabled."""
+        gate = threading.Event()
+        b = Broadcast(gated_source(list("abcd"), gate), replay=False).start()
+        sub = b.subscribe()
+        gate.set()
+
+        assert list(sub) == list("abcd")
+        assert len(b._chunks) == 0
+
+    def test_async_subscriber(self):
+        """Test iterating a subscription from an asyncio task."""
+        gate = threading.Event()
+        b = Broadcast(gated_source(["1", "2", "3"], gate)).start()
+
+        async def consume():
+            sub = b.subscribe()
+            gate.set()
+            return [chunk async for chunk in sub]
+
+        assert asyncio.run(consume()) == ["1", "2", "3"]
+
+    def test_invalid_policy(self):
+        """Test that an unknown policy is rejected."""
+        with pytest.raises(ValueError):
+            Broadcast([], policy="block")
+
+
+class TestBroadcastChat:
+    """Test the broadcast_chat helper."""
+
+    @patch('ollama_utils.chat.chat_with_model')
+    def test_broadcast_chat_error_string(self, mock_chat):
+        """Test that an error string is delivered as a single chunk."""
+        mock_chat.return_value = "Chat error: Connection failed"
+
+        b = broadcast_chat("llama3.2:latest", [{"role": "user", "content": "Hi"}])
+        b.join(1)
+
+        assert list(b.subscribe()) == ["Chat error: Connection failed"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,118 @@
+"""
+Unit tests for ollama_utils.health module.
+"""
+
+import time
+
+import pytest
+import requests
+from unittest.mock import Mock, patch
+
+from ollama_utils.health import HealthProbe, get_probe, order_by_health, set_probe
+from ollama_utils.models import get_version
+from ollama_utils.residency import ResidencyPlanner
+
+HOST_A = "http://a:11434"
+HOST_B = "http://b:11434"
+
+
+def fake_server(down=(), version="0.6.0", running=None, installed=None):
+    """Fake requests.get serving /api/version, /api/ps and /api/tags per host."""
+    running = running or {}
+    installed = installed or {}
+
+    def get(url, **kwargs):
+        host, path = url.rsplit("/api/", 1)
+        if host in down:
+            raise requests.exceptions.ConnectionError(f"{host} refused")
+        body = {"version": {"version": version},
+                "ps": {"models": running.get(host, [])},
+                "tags": {"models": installed.get(host, [])}}[path]
+        response = Mock()
+        response.json.return_value = body
+        response.raise_for_status.return_value = None
+        return response
+    return get
+
+
+@pytest.fixture(autouse=True)
+def no_default_probe():
+    yield
+    set_probe(None)
+
+
+class TestGetVersion:
+    """Test the get_version function."""
+
+    @patch('ollama_utils.models.requests.get')
+    def test_success(self, mock_get):
+        mock_get.side_effect = fake_server()
+        assert get_version() == "0.6.0"
+
+    @patch('ollama_utils.models.requests.get')
+    def test_error(self, mock_get):
+        mock_get.side_effect = requests.exceptions.ConnectionError("refused")
+        assert "error" in get_version()
+
+
+class TestHealthProbe:
+    """Test the HealthProbe class."""
+
+    @patch('ollama_utils.transport.requests.get')
+    def test_poll_caches_state(self, mock_get):
+        mock_get.side_effect = fake_server(
+            down=(HOST_B,),
+            running={HOST_A: [{"name": "m1", "size": 1}]},
+            installed={HOST_A: [{"name": "m1"}, {"name": "m2"}]})
+        probe = HealthProbe([HOST_A, HOST_B])
+        assert probe.state(HOST_A) is None
+
+        probe.poll()
+
+        a, b = probe.state(HOST_A), probe.state(HOST_B)
+        assert a.alive and a.version == "0.6.0" and a.latency is not None
+        assert a.loaded == ["m1"] and a.models == ["m1", "m2"]
+        assert not b.alive and "refused" in b.error and b.failures == 1
+        assert mock_get.call_args.kwargs["timeout"] == 2.0
+
+    @patch('ollama_utils.transport.requests.get')
+    def test_pick_host_prefers_loaded_model(self, mock_get):
+        mock_get.side_effect = fake_server(
+            running={HOST_B: [{"name": "m"}]},
+            installed={HOST_A: [{"name": "m"}], HOST_B: [{"name": "m"}]})
+        probe = HealthProbe([HOST_A, HOST_B])
+        probe.poll()
+        assert probe.pick_host("m") == HOST_B
+        assert probe.pick_host("missing") is None
+
+    @patch('ollama_utils.transport.requests.get')
+    def test_feeds_residency_planner(self, mock_get):
+        mock_get.side_effect = fake_server(
+            running={HOST_A: [{"name": "m", "size": 5}]},
+            installed={HOST_A: [{"name": "m", "size": 4}]})
+        planner = ResidencyPlanner(HOST_A, memory_limit=100, refresh_interval=3600)
+        probe = HealthProbe([HOST_A], planners={HOST_A: planner})
+        probe.poll()
+        with patch('ollama_utils.models.list_running_models') as mock_ps:
+            assert planner.is_resident("m")
+        mock_ps.assert_not_called()
+
+    @patch('ollama_utils.transport.requests.get')
+    def test_background_polling_and_default_probe(self, mock_get):
+        mock_get.side_effect = fake_server(down=(HOST_A,))
+        probe = HealthProbe([HOST_A, HOST_B], interval=60).start()
+        try:
+            assert get_probe() is probe
+            for _ in range(100):
+                if probe.state(HOST_B) is not None:
+                    break
+                time.sleep(0.01)
+            assert order_by_health([HOST_A, HOST_B]) == [HOST_B, HOST_A]
+        finally:
+            probe.stop()
+        assert get_probe() is None
+        assert order_by_health([HOST_A, HOST_B]) == [HOST_A, HOST_B]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,162 @@
+"""
+Unit tests for ollama_utils.hedging module.
+"""
+
+import json
+import select
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from unittest.mock import patch
+
+from ollama_utils import transport
+from ollama_utils.hedging import HedgedChat
+
+HOSTS = ["http://a:11434", "http://b:11434"]
+MESSAGES = [{"role": "user", "content": "Hello"}]
+
+
+class FakeStream:
+    """Stand-in for a chat stream that waits before its first chunk."""
+
+    def __init__(self, chunks, delay=0.0):
+        self.chunks = chunks
+        self.delay = delay
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        time.sleep(self.delay)
+        for chunk in self.chunks:
+            yield chunk
+
+    def close(self):
+        self.closed.set()
+
+
+def fake_chat(streams):
+    def chat(model_name, messages, stream=False, host=None, **kwargs):
+        return streams[host]
+    return chat
+
+
+class TestHedgedChat:
+    """Test the HedgedChat class."""
+
+    def test_fast_primary_no_hedge(self):
+        """Test that a fast primary answers without firing a hedge."""
+        streams = {HOSTS[0]: FakeStream(["a", "b"]), HOSTS[1]: FakeStream(["x"])}
+        hedged = HedgedChat(HOSTS, initial_delay=1.0)
+
+        with patch('ollama_utils.chat.chat_with_model', side_effect=fake_chat(streams)):
+            assert hedged.chat("llama3.2:latest", MESSAGES) == "ab"
+
+        assert hedged.stats["hedges_fired"] == 0
+        assert hedged.stats["requests"] == 1
+
+    def test_slow_primary_hedge_wins(self):
+        """Test that a hedge to the second host wins and the primary is closed."""
+        slow = FakeStream(["slow"], delay=0.5)
+        fast = FakeStream(["fast"])
+        hedged = HedgedChat(HOSTS, initial_delay=0.05)
+
+        with patch('ollama_utils.chat.chat_with_model',
+                   side_effect=fake_chat({HOSTS[0]: slow, HOSTS[1]: fast})):
+            assert hedged.chat("llama3.2:latest", MESSAGES) == "fast"
+
+        assert hedged.stats["hedges_fired"] == 1
+        assert hedged.stats["hedge_wins"] == 1
+        assert slow.closed.wait(2)
+
+    def test_loser_aborted_during_prefill(self, monkeypatch):
+        """Test that a losing attempt still waiting for headers is disconnected at once."""
+        monkeypatch.setattr(transport, "POOL_CONNECTIONS", True)
+        disconnected = threading.Event()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                if self.server.slow:
+                    # A long prefill: no headers until the client goes away
+                    readable, _, _ = select.select([self.connection], [], [], 5)
+                    if readable and not self.connection.recv(1):
+                        disconnected.set()
+                    self.close_connection = True
+                    return
+                body = json.dumps({"message": {"content": "fast"}, "done": True}).encode()
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        servers = []
+        for slow in (True, False):
+            server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+            server.daemon_threads = True
+            server.slow = slow
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            servers.append(server)
+        try:
+            hosts = [f"http://127.0.0.1:{s.server_address[1]}" for s in servers]
+            hedged = HedgedChat(hosts, initial_delay=0.05)
+
+            started = time.monotonic()
+            assert hedged.chat("llama3.2:latest", MESSAGES) == "fast"
+            assert disconnected.wait(2)
+            assert time.monotonic() - started < 2
+            assert hedged.stats["hedge_wins"] == 1
+        finally:
+            for server in servers:
+                server.shutdown()
+                server.server_close()
+
+    def test_error_fails_over(self):
+        """Test that an error string from one host retries on the next."""
+        streams = {HOSTS[0]: "Chat error: Connection refused", HOSTS[1]: FakeStream(["ok"])}
+        hedged = HedgedChat(HOSTS, initial_delay=5.0)
+
+        with patch('ollama_utils.chat.chat_with_model', side_effect=fake_chat(streams)):
+            assert hedged.chat("llama3.2:latest", MESSAGES) == "ok"
+
+        assert hedged.stats["failovers"] == 1
+
+    def test_all_hosts_fail(self):
+        """Test that the last error is returned when every host fails."""
+        streams = {HOSTS[0]: "Chat error: a", HOSTS[1]: "Chat error: b"}
+        hedged = HedgedChat(HOSTS)
+
+        with patch('ollama_utils.chat.chat_with_model', side_effect=fake_chat(streams)):
+            result = hedged.chat("llama3.2:latest", MESSAGES)
+
+        assert result.startswith("Chat error")
+        assert hedged.stats["failures"] == 1
+
+    def test_percentile_delay(self):
+        """Test the percentile-based delay and its bounds."""
+        hedged = HedgedChat(HOSTS, percentile=90, min_samples=10, min_delay=0.0, max_delay=0.5)
+        assert hedged.hedge_delay() == hedged.initial_delay
+
+        hedged._ttft.extend([i / 100 for i in range(1, 11)])
+        assert hedged.hedge_delay() == pytest.approx(0.09)
+
+        hedged.percentile = 100
+        assert hedged.hedge_delay() == pytest.approx(0.10)
+        hedged.percentile = 90
+
+        hedged._ttft.extend([5.0] * 10)
+        assert hedged.hedge_delay() == 0.5
+
+    def test_requires_hosts(self):
+        """Test that an empty host list is rejected."""
+        with pytest.raises(ValueError):
+            HedgedChat([])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
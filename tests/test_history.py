@@ -0,0 +1,93 @@
+"""
+Unit tests for ollama_utils.history module.
+"""
+
+import pytest
+
+from ollama_utils.history import ConversationStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = ConversationStore(str(tmp_path / "history.db"), tail_size=3, max_open=2)
+    yield s
+    s.close()
+
+
+class TestConversation:
+    """Test the Conversation class."""
+
+    def test_append_and_recent(self, store):
+        """Test that only the tail is kept in memory but all turns persist."""
+        conv = store.conversation("c1")
+        for i in range(5):
+            conv.append("user", f"m{i}")
+
+        assert len(conv) == 5
+        assert [m["content"] for m in conv.recent()] == ["m2", "m3", "m4"]
+        assert len(conv._tail) == 3
+        assert [m["content"] for m in conv.messages()] == [f"m{i}" for i in range(5)]
+
+    def test_recent_beyond_tail_reads_disk(self, store):
+        """Test asking for more than the tail loads older turns lazily."""
+        conv = store.conversation("c1")
+        for i in range(5):
+            conv.append("user", f"m{i}")
+
+        assert [m["content"] for m in conv.recent(4)] == ["m1", "m2", "m3", "m4"]
+        assert [m["content"] for m in conv.recent(2)] == ["m3", "m4"]
+
+    def test_extra_fields_round_trip(self, store):
+        """Test that extra message fields are preserved."""
+        store.append("c1", "assistant", "hi", pinned=True)
+
+        assert store.load("c1") == [{"role": "assistant", "content": "hi", "pinned": True}]
+
+    def test_iteration_is_batched(self, store):
+        """Test lazy iteration across batch boundaries."""
+        conv = store.conversation("c1")
+        for i in range(7):
+            conv.append("user", str(i))
+
+        assert [m["content"] for m in store.iter_messages("c1", batch_size=3)] == list("0123456")
+
+    def test_clear(self, store):
+        """Test clearing a conversation."""
+        conv = store.conversation("c1")
+        conv.append("user", "hello")
+        conv.clear()
+
+        assert len(conv) == 0
+        assert store.load("c1") == []
+
+
+class TestConversationStore:
+    """Test the ConversationStore class."""
+
+    def test_history_survives_restart(self, tmp_path):
+        """Test that a reopened store resumes conversations from disk."""
+        path = str(tmp_path / "history.db")
+        first = ConversationStore(path)
+        first.append("c1", "user", "hello")
+        first.append("c1", "assistant", "hi")
+        first.close()
+
+        second = ConversationStore(path)
+        conv = second.conversation("c1")
+        conv.append("user", "again")
+
+        assert [m["content"] for m in conv.recent()] == ["hello", "hi", "again"]
+        assert second.conversations() == ["c1"]
+        second.close()
+
+    def test_open_conversations_bounded(self, store):
+        """Test that cached Conversation objects are evicted least recently used."""
+        for cid in ("a", "b", "c"):
+            store.append(cid, "user", cid)
+
+        assert list(store._open) == ["b", "c"]
+        assert store.load("a") == [{"role": "user", "content": "a"}]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
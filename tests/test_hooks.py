@@ -0,0 +1,150 @@
+"""
+Unit tests for ollama_utils.hooks module.
+"""
+
+import json
+
+import pytest
+from unittest.mock import Mock, patch
+
+from ollama_utils import hooks
+from ollama_utils.chat import chat_with_model, generate_with_model
+from ollama_utils.models import list_models
+
+
+@pytest.fixture
+def events():
+    """Record (event, operation) pairs while the test runs."""
+    seen = []
+
+    def listener(event, call, info):
+        seen.append((event, call.operation))
+
+    hooks.add_listener(listener)
+    yield seen
+    hooks.remove_listener(listener)
+
+
+class TestHooks:
+    """Test event delivery from the HTTP call sites."""
+
+    def test_no_listeners_no_call(self):
+        """Test that tracking is skipped entirely without listeners."""
+        assert hooks.start("chat", "http://localhost:11434/api/chat") is None
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_streaming_chat_events(self, mock_post, events):
+        """Test the full event sequence of a streaming chat call."""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.iter_lines.return_value = [
+            b'{"message": {"content": "Hel"}}',
+            b'{"message": {"content": "lo"}}',
+            b'{"message": {"content": ""}, "done": true, "eval_count": 2}'
+        ]
+        mock_post.return_value = mock_response
+
+        chunks = list(chat_with_model("llama3.2:latest", [{"role": "user", "content": "Hi"}], stream=True))
+
+        assert chunks == ["Hel", "lo"]
+        assert [e for e, _ in events] == [
+            "request_start", "connection", "first_byte", "chunk", "chunk", "done"
+        ]
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_error_event(self, mock_post, events):
+        """Test that a failed call fires an error event."""
+        import requests
+        mock_post.side_effect = requests.exceptions.RequestException("Connection failed")
+
+        generate_with_model("llama3.2:latest", "Hello")
+
+        assert events == [("request_start", "generate"), ("error", "generate")]
+
+    @patch('ollama_utils.models.requests.get')
+    def test_models_events(self, mock_get, events):
+        """Test that model management calls are instrumented too."""
+        mock_response = Mock()
+        mock_response.json.return_value = {"models": []}
+        mock_get.return_value = mock_response
+
+        list_models()
+
+        assert [e for e, _ in events] == ["request_start", "connection", "done"]
+
+    def test_listener_errors_are_swallowed(self):
+        """Test that a failing listener does not break the call."""
+        def broken(event, call, info):
+            raise RuntimeError("boom")
+
+        hooks.add_listener(broken)
+        try:
+            call = hooks.start("chat", "url")
+            hooks.emit("done", call)
+        finally:
+            hooks.remove_listener(broken)
+
+
+class TestSpanRecorder:
+    """Test the SpanRecorder listener."""
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_records_and_exports(self, mock_post, tmp_path):
+        """Test span timings and Chrome trace export."""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.iter_lines.return_value = [
+            b'{"response": "a"}',
+            b'{"response": "b", "done": true}'
+        ]
+        mock_post.return_value = mock_response
+
+        recorder = hooks.SpanRecorder().start()
+        try:
+            list(generate_with_model("llama3.2:latest", "Hello", stream=True))
+        finally:
+            recorder.stop()
+
+        [row] = recorder.summary()
+        assert row["operation"] == "generate"
+        assert row["model"] == "llama3.2:latest"
+        assert row["chunks"] == 2
+        assert row["status"] == 200
+        assert row["ttfb_ms"] is not None and row["total_ms"] >= row["ttfb_ms"]
+
+        path = tmp_path / "trace.json"
+        recorder.export_chrome_trace(str(path))
+        trace = json.loads(path.read_text())
+        names = [e["name"] for e in trace["traceEvents"]]
+        assert names[0] == "generate llama3.2:latest"
+        assert "stream" in names
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_closed_stream_finishes_span(self, mock_post):
+        """Test that a stream closed by the consumer still ends its span, marked cancelled."""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.iter_lines.return_value = [
+            b'{"response": "a"}',
+            b'{"response": "b"}',
+            b'{"response": "", "done": true}'
+        ]
+        mock_post.return_value = mock_response
+
+        recorder = hooks.SpanRecorder().start()
+        try:
+            stream = generate_with_model("llama3.2:latest", "Hello", stream=True)
+            assert next(stream) == "a"
+            stream.close()
+        finally:
+            recorder.stop()
+
+        assert recorder._open == {}
+        [row] = recorder.summary()
+        assert row["cancelled"] is True
+        assert row["chunks"] == 1
+        mock_response.close.assert_called_once()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
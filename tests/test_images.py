@@ -0,0 +1,179 @@
+"""
+Unit tests for ollama_utils.images module.
+"""
+
+import base64
+import io
+import json
+
+import pytest
+from unittest.mock import Mock, patch
+
+from ollama_utils.chat import chat_with_model, generate_with_model
+from ollama_utils.encoding import EncodedMessages
+from ollama_utils.images import ImageCache, encode_image, resolve_images
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 40
+
+
+def b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def chat_response():
+    response = Mock()
+    response.json.return_value = {"message": {"content": "a cat"}, "done": True}
+    return response
+
+
+class TestEncodeImage:
+    """Test encode_image with each supported input."""
+
+    def test_bytes_and_buffers(self):
+        cache = ImageCache()
+        assert encode_image(PNG, cache) == b64(PNG)
+        assert encode_image(bytearray(PNG), cache) == b64(PNG)
+        assert encode_image(memoryview(PNG), cache) == b64(PNG)
+        assert encode_image(io.BytesIO(PNG), cache) == b64(PNG)
+
+    def test_path_is_memory_mapped(self, tmp_path):
+        path = tmp_path / "cat.png"
+        path.write_bytes(PNG)
+        cache = ImageCache()
+        assert encode_image(path, cache) == b64(PNG)
+        assert encode_image(str(path), cache) == b64(PNG)
+        with open(path, "rb") as f:
+            assert encode_image(f, cache) == b64(PNG)
+
+    def test_empty_file(self, tmp_path):
+        path = tmp_path / "empty.png"
+        path.write_bytes(b"")
+        assert encode_image(path, ImageCache()) == ""
+
+    def test_base64_string_passed_through(self):
+        assert encode_image(b64(PNG), ImageCache()) == b64(PNG)
+
+    def test_unsupported_type(self):
+        with pytest.raises(TypeError):
+            encode_image(42, ImageCache())
+
+    def test_chunked_encoding_matches(self):
+        data = bytes(range(256)) * 20000
+        with patch('ollama_utils.images.ENCODE_CHUNK_SIZE', 3 * 1000):
+            assert encode_image(data, ImageCache()) == b64(data)
+
+
+class TestImageCache:
+    """Test the content-hash cache."""
+
+    def test_same_content_encoded_once(self, tmp_path):
+        path = tmp_path / "cat.png"
+        path.write_bytes(PNG)
+        cache = ImageCache()
+        encode_image(PNG, cache)
+        encode_image(path, cache)
+        encode_image(io.BytesIO(PNG), cache)
+        assert cache.stats["misses"] == 1
+        assert cache.stats["hits"] == 2
+
+    def test_unchanged_path_is_not_rehashed(self, tmp_path):
+        path = tmp_path / "cat.png"
+        path.write_bytes(PNG)
+        cache = ImageCache()
+        encode_image(path, cache)
+        with patch('ollama_utils.images.hashlib.sha256') as mock_sha:
+            assert encode_image(path, cache) == b64(PNG)
+        mock_sha.assert_not_called()
+
+    def test_modified_file_is_reencoded(self, tmp_path):
+        path = tmp_path / "cat.png"
+        path.write_bytes(PNG)
+        cache = ImageCache()
+        encode_image(path, cache)
+        path.write_bytes(b"different content")
+        assert encode_image(path, cache) == b64(b"different content")
+
+    def test_evicts_beyond_max_bytes(self):
+        cache = ImageCache(max_bytes=len(b64(PNG)) + 10)
+        encode_image(PNG, cache)
+        encode_image(PNG[::-1], cache)
+        encode_image(PNG, cache)
+        assert cache.stats["misses"] == 3
+
+
+class TestResolveImages:
+    """Test message conversion."""
+
+    def test_copies_only_messages_with_images(self):
+        plain = {"role": "system", "content": "be brief"}
+        with_image = {"role": "user", "content": "what is this?", "images": [PNG]}
+        messages = [plain, with_image]
+        resolved = resolve_images(messages, ImageCache())
+        assert resolved[0] is plain
+        assert resolved[1]["images"] == [b64(PNG)]
+        assert with_image["images"] == [PNG]
+
+    def test_no_images_returns_same_list(self):
+        messages = [{"role": "user", "content": "hi"}]
+        assert resolve_images(messages) is messages
+
+
+class TestChatImages:
+    """Test that chat and generate requests carry encoded images."""
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_chat_encodes_images(self, mock_post, tmp_path):
+        path = tmp_path / "cat.png"
+        path.write_bytes(PNG)
+        mock_post.return_value = chat_response()
+        messages = [{"role": "user", "content": "what is this?", "images": [path]}]
+
+        assert chat_with_model("llava", messages) == "a cat"
+
+        sent = mock_post.call_args.kwargs["json"]["messages"]
+        assert sent[0]["images"] == [b64(PNG)]
+        assert messages[0]["images"] == [path]
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_encoded_history_encodes_image_once(self, mock_post):
+        bodies = []
+
+        def post(url, data=None, **kwargs):
+            bodies.append(b"".join(data))
+            return chat_response()
+        mock_post.side_effect = post
+        messages = EncodedMessages([{"role": "user", "content": "what?", "images": [PNG]}])
+
+        with patch('ollama_utils.images.encode_image', return_value=b64(PNG)) as mock_encode:
+            chat_with_model("llava", messages)
+            chat_with_model("llava", messages)
+        assert mock_encode.call_count == 1
+        assert json.loads(bodies[1])["messages"][0]["images"] == [b64(PNG)]
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_generate_encodes_images(self, mock_post):
+        response = Mock()
+        response.json.return_value = {"response": "a cat", "done": True}
+        mock_post.return_value = response
+
+        assert generate_with_model("llava", "describe", images=[io.BytesIO(PNG)]) == "a cat"
+
+        payload = mock_post.call_args.kwargs["json"]
+        assert payload["images"] == [b64(PNG)]
+        assert "images" not in payload.get("options", {})
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_generate_empty_images_dropped(self, mock_post):
+        response = Mock()
+        response.json.return_value = {"response": "ok", "done": True}
+        mock_post.return_value = response
+
+        generate_with_model("llava", "describe", images=[])
+
+        payload = mock_post.call_args.kwargs["json"]
+        assert "images" not in payload
+        assert "images" not in payload.get("options", {})
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,123 @@
+"""
+Unit tests for ollama_utils.leaderboard module.
+"""
+
+import json
+
+import pytest
+from unittest.mock import patch
+
+from ollama_utils.leaderboard import (
+    ModelBenchmark, _pad_prompt, leaderboard, load_leaderboard, main, write_leaderboard
+)
+
+from .conftest import fake_ollama
+
+INSTALLED = [
+    {"name": "small:1b", "details": {"family": "llama", "parameter_size": "1B",
+                                     "quantization_level": "Q4_K_M"}},
+    {"name": "big:8b", "details": {"family": "llama", "parameter_size": "8B",
+                                   "quantization_level": "Q4_0"}},
+    {"name": "broken:1b", "details": {}},
+]
+
+# Decode speed in tokens/s per model
+SPEED = {"small:1b": 100.0, "big:8b": 25.0}
+
+fake_generate, fake_running = fake_ollama(
+    lambda model_name, options: SPEED[model_name],
+    [{"name": "small:1b", "size": 2_000_000_000, "size_vram": 2_000_000_000},
+     {"name": "big:8b", "size": 8_000_000_000, "size_vram": 6_000_000_000}],
+    lambda model_name, options: ("Generation error: model failed to load"
+                                 if model_name == "broken:1b" else None))
+
+
+@pytest.fixture
+def server():
+    with patch('ollama_utils.chat.generate_with_model', side_effect=fake_generate) as gen, \
+            patch('ollama_utils.models.list_models', return_value=INSTALLED), \
+            patch('ollama_utils.models.list_running_models', side_effect=fake_running):
+        yield gen
+
+
+class TestModelBenchmark:
+    """Test the ModelBenchmark class."""
+
+    def test_rows_per_model_context_and_concurrency(self, server):
+        bench = ModelBenchmark(models=["small:1b", "big:8b"], context_lengths=(256, 1024),
+                               concurrency=(1, 2), num_predict=50)
+        rows = bench.run()
+        assert len(rows) == 8
+        row = rows[0]
+        assert row["model"] == "small:1b"
+        assert row["quantization"] == "Q4_K_M"
+        assert row["decode_tps"] == 100.0
+        assert row["load_s"] == 2.0
+        assert row["memory_bytes"] == 2_000_000_000
+        assert row["throughput_per_gb"] == pytest.approx(row["throughput_tps"] / 2, rel=0.01)
+        assert row["errors"] == 0
+
+    def test_prompts_padded_to_context_with_num_ctx(self, server):
+        ModelBenchmark(models=["small:1b"], context_lengths=(1000,), concurrency=(1,),
+                       num_predict=10).run()
+        calls = [c for c in server.call_args_list if c.args[1]]
+        prompts = [c.args[1] for c in calls]
+        assert all(3800 < len(p) < 4300 for p in prompts)
+        assert len(set(p[:40] for p in prompts)) == len(prompts)
+        assert all(c.kwargs["num_ctx"] >= 1010 for c in calls)
+
+    def test_defaults_to_installed_models_and_records_failures(self, server):
+        rows = ModelBenchmark(context_lengths=(128,), concurrency=(1,), num_predict=5).run()
+        assert [r["model"] for r in rows] == ["big:8b", "broken:1b", "small:1b"]
+        broken = rows[1]
+        assert broken["errors"] == 1 and broken["decode_tps"] is None
+
+    def test_list_error_raises(self):
+        with patch('ollama_utils.models.list_models', return_value={"error": "down"}):
+            with pytest.raises(RuntimeError):
+                ModelBenchmark().run()
+
+    def test_pad_prompt_keeps_question(self):
+        prompt = _pad_prompt("What now?", 100, 0)
+        assert prompt.endswith("What now?")
+
+
+class TestLeaderboard:
+    """Test ranking and output formats."""
+
+    def test_ranks_best_first_with_missing_last(self):
+        rows = [{"model": "a", "throughput_tps": 10}, {"model": "b", "throughput_tps": None},
+                {"model": "c", "throughput_tps": 30}]
+        ranked = leaderboard(rows)
+        assert [(r["rank"], r["model"]) for r in ranked] == [(1, "c"), (2, "a"), (3, "b")]
+
+    def test_lower_is_better_columns_rank_ascending(self):
+        rows = [{"model": "slow", "latency_s": 3.0}, {"model": "none", "latency_s": None},
+                {"model": "fast", "latency_s": 0.5}]
+        ranked = leaderboard(rows, "latency_s")
+        assert [r["model"] for r in ranked] == ["fast", "slow", "none"]
+
+    def test_json_and_csv_round_trip(self, server, tmp_path):
+        rows = leaderboard(ModelBenchmark(models=["small:1b"], context_lengths=(128,),
+                                          concurrency=(1,), num_predict=5).run())
+        for name in ("board.json", "board.csv"):
+            path = str(tmp_path / name)
+            write_leaderboard(rows, path)
+            loaded = load_leaderboard(path)
+            assert loaded[0]["model"] == "small:1b"
+            assert loaded[0]["decode_tps"] == rows[0]["decode_tps"]
+            assert loaded[0]["rank"] == 1
+
+    def test_main_writes_output(self, server, tmp_path, capsys):
+        path = str(tmp_path / "board.json")
+        assert main(["--models", "small:1b", "big:8b", "--contexts", "128",
+                     "--concurrency", "1", "--num-predict", "5", "--sort-by", "decode_tps",
+                     "-o", path]) == 0
+        with open(path) as f:
+            board = json.load(f)
+        assert [r["model"] for r in board] == ["small:1b", "big:8b"]
+        assert "decode 100.0 tok/s" in capsys.readouterr().err
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,155 @@
+"""
+Unit tests for ollama_utils.metrics module.
+"""
+
+import gc
+import threading
+import urllib.request
+
+import pytest
+import requests
+from unittest.mock import patch
+
+from ollama_utils import hooks
+from ollama_utils.chat import chat_with_model
+from ollama_utils.metrics import Metrics
+
+from .conftest import streaming_response
+
+
+@pytest.fixture
+def metrics():
+    m = Metrics(buckets=(0.1, 1.0)).start()
+    yield m
+    m.stop()
+
+
+def value(text, line_prefix):
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+class TestMetrics:
+    """Test the Metrics listener."""
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_streaming_chat(self, mock_post, metrics):
+        mock_post.return_value = streaming_response([
+            {"message": {"content": "héllo"}, "done": False},
+            {"message": {"content": ""}, "done": True, "eval_count": 7, "prompt_eval_count": 3},
+        ])
+        list(chat_with_model("m", [], stream=True))
+
+        text = metrics.render()
+        labels = 'operation="chat",model="m",host="localhost:11434"'
+        assert value(text, f'ollama_client_requests_total{{{labels},status="200"}}') == 1
+        assert value(text, 'ollama_client_generated_tokens_total{model="m"}') == 7
+        assert value(text, 'ollama_client_prompt_tokens_total{model="m"}') == 3
+        assert value(text, 'ollama_client_streamed_bytes_total{model="m"}') == 6
+        assert value(text, 'ollama_client_time_to_first_token_seconds_count{model="m"}') == 1
+        assert value(text, f'ollama_client_request_duration_seconds_bucket{{{labels},le="+Inf"}}') == 1
+        assert value(text, "ollama_client_requests_in_flight") == 0
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_error_status(self, mock_post, metrics):
+        mock_post.side_effect = requests.exceptions.ConnectionError("refused")
+        chat_with_model("m", [])
+        text = metrics.render()
+        assert 'status="error"' in text
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_closed_stream_leaves_nothing_in_flight(self, mock_post, metrics):
+        mock_post.return_value = streaming_response([
+            {"message": {"content": "a"}, "done": False},
+            {"message": {"content": "b"}, "done": False},
+            {"message": {"content": ""}, "done": True},
+        ])
+        stream = chat_with_model("m", [], stream=True)
+        next(stream)
+        stream.close()
+
+        text = metrics.render()
+        labels = 'operation="chat",model="m",host="localhost:11434"'
+        assert value(text, "ollama_client_requests_in_flight") == 0
+        assert value(text, f'ollama_client_requests_total{{{labels},status="cancelled"}}') == 1
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_unread_stream_finished_when_dropped(self, mock_post, metrics):
+        response = streaming_response([{"message": {"content": "a"}, "done": True}])
+        mock_post.return_value = response
+        events = []
+        listener = lambda event, call, info: events.append((event, info.get("cancelled")))
+        hooks.add_listener(listener)
+        try:
+            stream = chat_with_model("m", [], stream=True)
+            del stream
+            gc.collect()
+        finally:
+            hooks.remove_listener(listener)
+
+        assert events[-1] == ("done", True)
+        response.close.assert_called_once()
+        text = metrics.render()
+        assert value(text, "ollama_client_requests_in_flight") == 0
+
+        stream = chat_with_model("m", [], stream=True)
+        stream.close()
+        assert response.close.call_count == 2
+        assert list(stream) == []
+
+    def test_cache_events(self, metrics):
+        hooks.event("cache", "semantic_cache", "semantic-cache://m", "m", hit=True, similarity=0.97)
+        text = metrics.render()
+        assert value(text, 'ollama_client_cache_lookups_total{namespace="m",result="hit"}') == 1
+        assert value(text, "ollama_client_requests_in_flight") == 0
+
+    def test_threads_use_separate_shards(self, metrics):
+        def work():
+            for _ in range(100):
+                metrics._inc("ollama_client_streamed_bytes_total", (("model", "m"),))
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        counters, _ = metrics.collect()
+        assert counters[("ollama_client_streamed_bytes_total", (("model", "m"),))] == 400
+
+    def test_exited_thread_shards_folded(self, metrics):
+        def work():
+            metrics._inc("ollama_client_streamed_bytes_total", (("model", "m"),))
+            metrics._observe("ollama_client_time_to_first_token_seconds", (("model", "m"),), 0.5)
+        for _ in range(100):
+            t = threading.Thread(target=work)
+            t.start()
+            t.join()
+        assert len(metrics._shards) <= 1
+        counters, histograms = metrics.collect()
+        assert counters[("ollama_client_streamed_bytes_total", (("model", "m"),))] == 100
+        assert histograms[("ollama_client_time_to_first_token_seconds", (("model", "m"),))][-1] == 100
+
+    def test_histogram_buckets_are_cumulative(self, metrics):
+        for v in (0.05, 0.5, 5.0):
+            metrics._observe("ollama_client_time_to_first_token_seconds", (("model", "m"),), v)
+        text = metrics.render()
+        name = "ollama_client_time_to_first_token_seconds_bucket"
+        assert value(text, f'{name}{{model="m",le="0.1"}}') == 1
+        assert value(text, f'{name}{{model="m",le="1.0"}}') == 2
+        assert value(text, f'{name}{{model="m",le="+Inf"}}') == 3
+
+    def test_http_endpoint(self, metrics):
+        server = metrics.serve(port=0)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urllib.request.urlopen(url, timeout=5) as response:
+                body = response.read().decode()
+                assert response.headers["Content-Type"].startswith("text/plain")
+            assert "# TYPE ollama_client_requests_total counter" in body
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
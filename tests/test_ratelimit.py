@@ -0,0 +1,211 @@
+"""
+Unit tests for ollama_utils.ratelimit module.
+"""
+
+import gc
+import threading
+import time
+
+import pytest
+from unittest.mock import Mock, patch
+
+from ollama_utils.metrics import Metrics
+from ollama_utils.ratelimit import RateLimiter, TokenBucket
+
+from .conftest import streaming_response
+
+
+def chat_response(content="hi", eval_count=10):
+    response = Mock()
+    response.json.return_value = {"message": {"content": content}, "done": True,
+                                  "eval_count": eval_count}
+    return response
+
+
+class TestTokenBucket:
+    """Test the TokenBucket class."""
+
+    def test_refills_over_time(self):
+        bucket = TokenBucket(rate=10, burst=10)
+        bucket.debit(10, now=bucket.updated)
+        assert bucket.wait_time(5, now=bucket.updated) == pytest.approx(0.5)
+        assert bucket.wait_time(5, now=bucket.updated + 0.5) == 0.0
+
+    def test_debt_delays_and_refund_caps_at_burst(self):
+        bucket = TokenBucket(rate=10, burst=10)
+        now = bucket.updated
+        bucket.debit(30, now)
+        assert bucket.wait_time(1, now) == pytest.approx(2.1)
+        bucket.debit(-100, now)
+        assert bucket.level == 10
+
+    def test_request_larger_than_burst_waits_for_full_bucket(self):
+        bucket = TokenBucket(rate=10, burst=10)
+        assert bucket.wait_time(500, now=bucket.updated) == 0.0
+
+
+class TestRateLimiter:
+    """Test admission, rejection and reconciliation."""
+
+    def test_request_rate_delays(self):
+        limiter = RateLimiter({"a": {"requests_per_second": 20, "burst": 1}})
+        started = time.monotonic()
+        for _ in range(3):
+            limiter.acquire("a").release()
+        assert time.monotonic() - started >= 0.09
+        stats = limiter.report()["a"]
+        assert stats["admitted"] == 3
+        assert stats["delayed"] == 2
+
+    def test_rejects_when_wait_exceeds_max_wait(self):
+        limiter = RateLimiter({"a": {"requests_per_second": 0.1, "burst": 1}}, max_wait=1.0)
+        assert limiter.acquire("a") is not None
+        started = time.monotonic()
+        assert limiter.acquire("a") is None
+        assert time.monotonic() - started < 0.5
+        assert limiter.report()["a"]["rejected"] == 1
+
+    def test_max_queue(self):
+        limiter = RateLimiter({"a": {"max_queue": 0}})
+        assert limiter.acquire("a") is None
+
+    def test_unknown_tenants_use_default(self):
+        limiter = RateLimiter(default={"requests_per_second": 0.1, "burst": 1}, max_wait=0)
+        assert limiter.acquire("x") is not None
+        assert limiter.acquire("x") is None
+        assert limiter.acquire("y") is not None
+
+    def test_tokens_reconciled_with_eval_count(self):
+        limiter = RateLimiter({"a": {"tokens_per_second": 100, "token_burst": 100}}, max_wait=0)
+        permit = limiter.acquire("a", tokens=10)
+        permit.release(150)
+        stats = limiter.report()["a"]
+        assert stats["tokens_reserved"] == 10
+        assert stats["tokens_used"] == 150
+        # The overshoot was charged, so the bucket cannot cover another 10
+        assert limiter.acquire("a", tokens=10) is None
+
+    def test_estimate_uses_num_predict_then_history(self):
+        limiter = RateLimiter(token_estimate=50)
+        assert limiter.estimate("a") == 50
+        assert limiter.estimate("a", {"num_predict": 8}) == 8
+        limiter.acquire("a").release(100)
+        assert limiter.estimate("a") == 100
+
+    def test_weighted_fair_queueing(self):
+        limiter = RateLimiter({"big": {"weight": 3}, "small": {"weight": 1}},
+                              max_concurrency=1)
+        holder = limiter.acquire("big", tokens=1)
+        order = []
+        lock = threading.Lock()
+
+        def worker(tenant):
+            permit = limiter.acquire(tenant, tokens=10)
+            with lock:
+                order.append(tenant)
+            permit.release(10)
+
+        threads = [threading.Thread(target=worker, args=(t,))
+                   for t in ["small"] * 4 + ["big"] * 4]
+        for t in threads:
+            t.start()
+        while sum(s["requests"] for s in limiter.report().values()) < 9:
+            time.sleep(0.01)
+        holder.release(1)
+        for t in threads:
+            t.join(5)
+        # Weight 3 gets about three slots for every one of weight 1
+        assert order[:4].count("big") == 3
+        assert sorted(order) == ["big"] * 4 + ["small"] * 4
+
+
+class TestRateLimitedCalls:
+    """Test the chat and generate wrappers."""
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_chat_settles_eval_count(self, mock_post):
+        mock_post.return_value = chat_response(eval_count=42)
+        limiter = RateLimiter()
+        seen = []
+        assert limiter.chat("a", "m", [{"role": "user", "content": "hi"}],
+                            on_done=seen.append) == "hi"
+        assert seen[0]["eval_count"] == 42
+        stats = limiter.report()["a"]
+        assert stats["tokens_used"] == 42
+        assert stats["in_flight"] == 0
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_rejected_call_returns_error_string(self, mock_post):
+        limiter = RateLimiter({"a": {"max_queue": 0}})
+        result = limiter.generate("a", "m", "hi")
+        assert result.startswith("Rate limit exceeded")
+        mock_post.assert_not_called()
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_stream_holds_slot_until_finished(self, mock_post):
+        mock_post.return_value = streaming_response(["a", "b"], eval_count=2)
+        limiter = RateLimiter(max_concurrency=1, max_wait=0)
+        stream = limiter.chat("a", "m", [], stream=True)
+        assert limiter.acquire("b") is None
+        assert "".join(stream) == "ab"
+        assert limiter.report()["a"]["tokens_used"] == 2
+        assert limiter.acquire("b") is not None
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_closed_stream_counts_chunks(self, mock_post):
+        mock_post.return_value = streaming_response(["a", "b", "c"], eval_count=3)
+        limiter = RateLimiter()
+        stream = limiter.chat("a", "m", [], stream=True)
+        next(stream)
+        stream.close()
+        assert limiter.report()["a"]["tokens_used"] == 1
+        assert limiter.report()["a"]["in_flight"] == 0
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_coalesced_stream_counts_received_chunks(self, mock_post):
+        mock_post.return_value = streaming_response(["a", "b", "c", "d", "e"], eval_count=5)
+        limiter = RateLimiter()
+        stream = limiter.chat("a", "m", [], stream=True, coalesce=3)
+        assert next(stream) == "a"
+        assert next(stream) == "bcd"
+        stream.close()
+        assert limiter.report()["a"]["tokens_used"] == 4
+
+        mock_post.return_value = streaming_response(["a", "b", "c", "d", "e"], eval_count=5)
+        assert list(limiter.chat("a", "m", [], stream=True, coalesce=3)) == ["a", "bcd", "e"]
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_unstarted_stream_releases_slot(self, mock_post):
+        mock_post.return_value = streaming_response(["a", "b"], eval_count=2)
+        limiter = RateLimiter(max_concurrency=1, max_wait=0)
+        limiter.chat("a", "m", [], stream=True).close()
+        assert limiter.report()["a"]["in_flight"] == 0
+
+        stream = limiter.chat("a", "m", [], stream=True)
+        del stream
+        gc.collect()
+        assert limiter.report()["a"]["in_flight"] == 0
+        assert limiter.acquire("b") is not None
+
+
+class TestRateLimitMetrics:
+    """Test that decisions reach the Metrics listener."""
+
+    def test_decisions_exported(self):
+        metrics = Metrics(buckets=(0.1, 1.0)).start()
+        try:
+            limiter = RateLimiter({"a": {"requests_per_second": 0.1, "burst": 1}}, max_wait=0)
+            limiter.acquire("a")
+            limiter.acquire("a")
+        finally:
+            metrics.stop()
+        text = metrics.render()
+        assert 'ollama_client_rate_limit_decisions_total{tenant="a",result="admitted"} 1' in text
+        assert 'ollama_client_rate_limit_decisions_total{tenant="a",result="rejected"} 1' in text
+        assert 'ollama_client_rate_limit_delay_seconds_count{tenant="a"} 2' in text
+        assert "ollama_client_requests_total{" not in text
+        assert "ollama_client_request_duration_seconds_count{" not in text
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
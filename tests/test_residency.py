@@ -0,0 +1,124 @@
+"""
+Unit tests for ollama_utils.residency module.
+"""
+
+import pytest
+from unittest.mock import Mock, patch
+
+from ollama_utils.models import list_running_models
+from ollama_utils.residency import ResidencyPlanner, pick_host
+
+GB = 1024 ** 3
+
+
+def _ps(name, size, expires_at):
+    return {"name": name, "size": size, "expires_at": expires_at}
+
+
+def _planner(running, installed=(), memory_limit=16 * GB, max_loaded=3):
+    planner = ResidencyPlanner(memory_limit=memory_limit, max_loaded=max_loaded,
+                               refresh_interval=3600)
+    planner.update(running, installed=list(installed))
+    return planner
+
+
+class TestListRunningModels:
+    """Test the list_running_models function."""
+
+    @patch('ollama_utils.models.requests.get')
+    def test_success(self, mock_get):
+        mock_response = Mock()
+        mock_response.json.return_value = {"models": [_ps("a:latest", GB, "2030-01-01")]}
+        mock_response.raise_for_status.return_value = None
+        mock_get.return_value = mock_response
+
+        result = list_running_models()
+
+        assert result[0]["name"] == "a:latest"
+        mock_get.assert_called_once_with("http://localhost:11434/api/ps")
+
+    @patch('ollama_utils.models.requests.get')
+    def test_connection_error(self, mock_get):
+        import requests
+        mock_get.side_effect = requests.exceptions.ConnectionError("refused")
+
+        result = list_running_models()
+
+        assert "error" in result
+        assert "refused" in result["error"]
+
+
+class TestPredict:
+    """Test eviction prediction."""
+
+    def test_resident_model(self):
+        planner = _planner([_ps("a", 4 * GB, "2030-01-01T00:00:00Z")])
+        prediction = planner.predict("a")
+        assert prediction.resident
+        assert not prediction.will_evict
+
+    def test_fits_without_eviction(self):
+        planner = _planner([_ps("a", 4 * GB, "2030-01-01T00:00:00Z")],
+                           installed=[{"name": "b", "size": 2 * GB}])
+        prediction = planner.predict("b")
+        assert prediction.will_load
+        assert prediction.evicts == []
+        assert prediction.required == int(2 * GB * 1.2)
+
+    def test_evicts_earliest_expiry_when_memory_short(self):
+        planner = _planner([_ps("old", 6 * GB, "2030-01-01T00:00:00Z"),
+                            _ps("new", 6 * GB, "2030-01-01T00:05:00Z")],
+                           installed=[{"name": "big", "size": 5 * GB}])
+        assert planner.predict("big").evicts == ["old"]
+        assert planner.will_evict("big")
+
+    def test_evicts_when_max_loaded_reached(self):
+        planner = _planner([_ps("a", GB, "2030-01-01T00:01:00Z"),
+                            _ps("b", GB, "2030-01-01T00:00:00Z")],
+                           installed=[{"name": "c", "size": GB}], max_loaded=2)
+        assert planner.predict("c").evicts == ["b"]
+
+    def test_uses_observed_size_once_seen(self):
+        planner = _planner([_ps("a", 3 * GB, "2030-01-01")],
+                           installed=[{"name": "a", "size": GB}])
+        planner.update([])
+        assert planner.model_size("a") == 3 * GB
+
+
+class TestRouting:
+    """Test choose, pick_host and warm_up."""
+
+    def test_choose_prefers_resident_then_non_evicting(self):
+        planner = _planner([_ps("small", 14 * GB, "2030-01-01")],
+                           installed=[{"name": "large", "size": 10 * GB},
+                                      {"name": "tiny", "size": GB}])
+        assert planner.choose(["large", "small"]) == "small"
+        assert planner.choose(["large", "tiny"]) == "tiny"
+
+    def test_pick_host(self):
+        busy = _planner([_ps("x", 15 * GB, "2030-01-01")], installed=[{"name": "m", "size": 4 * GB}])
+        idle = _planner([], installed=[{"name": "m", "size": 4 * GB}])
+        hot = _planner([_ps("m", 5 * GB, "2030-01-01")])
+        assert pick_host("m", {"busy": busy, "idle": idle}) == "idle"
+        assert pick_host("m", {"busy": busy, "idle": idle, "hot": hot}) == "hot"
+
+    @patch('ollama_utils.chat.generate_with_model')
+    def test_warm_up_skips_when_it_would_evict(self, mock_generate):
+        planner = _planner([_ps("x", 15 * GB, "2030-01-01")],
+                           installed=[{"name": "m", "size": 4 * GB}])
+        assert planner.warm_up("m") is False
+        mock_generate.assert_not_called()
+
+    @patch('ollama_utils.residency.ResidencyPlanner.refresh')
+    @patch('ollama_utils.chat.generate_with_model')
+    def test_warm_up_loads_model(self, mock_generate, mock_refresh):
+        planner = _planner([], installed=[{"name": "m", "size": 4 * GB}])
+        mock_generate.side_effect = lambda *a, on_done=None, **kw: on_done({"done": True}) or ""
+        assert planner.warm_up("m", keep_alive="30m") is True
+        args, kwargs = mock_generate.call_args
+        assert args == ("m", "")
+        assert kwargs["keep_alive"] == "30m"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,48 @@
+"""
+Unit tests for ollama_utils.schema module.
+"""
+
+import pytest
+
+from ollama_utils.schema import validate
+
+PERSON = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string", "minLength": 1},
+        "age": {"type": "integer", "minimum": 0},
+        "tags": {"type": "array", "items": {"type": "string"}, "maxItems": 2},
+    },
+    "required": ["name"],
+    "additionalProperties": False,
+}
+
+
+class TestValidate:
+    """Test the validate function."""
+
+    def test_valid(self):
+        """Test a conforming document."""
+        assert validate({"name": "Ada", "age": 36, "tags": ["math"]}, PERSON) is None
+
+    @pytest.mark.parametrize("value, fragment", [
+        ({"age": 3}, "missing required property 'name'"),
+        ({"name": "Ada", "age": 1.5}, "$.age: expected integer"),
+        ({"name": "Ada", "age": -1}, "below minimum"),
+        ({"name": "Ada", "tags": ["a", 1]}, "$.tags[1]: expected string"),
+        ({"name": "Ada", "tags": ["a", "b", "c"]}, "more than 2 items"),
+        ({"name": "Ada", "extra": True}, "unexpected property 'extra'"),
+        ([], "expected object"),
+    ])
+    def test_invalid(self, value, fragment):
+        """Test that violations name the failing path."""
+        assert fragment in validate(value, PERSON)
+
+    def test_bool_is_not_number(self):
+        """Test that booleans do not satisfy numeric types."""
+        assert validate(True, {"type": "number"}) is not None
+        assert validate(2, {"type": ["string", "number"]}) is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
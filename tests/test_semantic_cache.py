@@ -0,0 +1,253 @@
+"""
+Unit tests for ollama_utils.semantic_cache module.
+"""
+
+import pytest
+from unittest.mock import Mock, patch
+
+from ollama_utils import hooks, semantic_cache
+from ollama_utils.chat import embed_with_model
+from ollama_utils.metrics import Metrics
+from ollama_utils.semantic_cache import SemanticCache, _Index
+
+# Toy embeddings: near-duplicate questions point the same way
+VECTORS = {
+    "how do I reset my password?": [1.0, 0.0, 0.0],
+    "how can I reset my password": [0.98, 0.2, 0.0],
+    "what are your opening hours?": [0.0, 1.0, 0.0],
+}
+
+
+def fake_embed(model_name, input, host=None, **kwargs):
+    return [VECTORS[input]]
+
+
+def fake_chat(model_name, messages, on_done=None, stream=False, **kwargs):
+    answer = f"{model_name} answer to {messages[-1]['content']}"
+    if stream:
+        def pieces():
+            yield from answer.split(" ")[:1]
+            yield " " + answer.split(" ", 1)[1]
+            on_done({"done": True})
+        return pieces()
+    on_done({"done": True})
+    return answer
+
+
+def ask(text):
+    return [{"role": "user", "content": text}]
+
+
+class TestEmbedWithModel:
+    """Test the embed_with_model function."""
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_success(self, mock_post):
+        mock_response = Mock()
+        mock_response.json.return_value = {"embeddings": [[0.1, 0.2]]}
+        mock_post.return_value = mock_response
+
+        result = embed_with_model("nomic-embed-text", "hi", truncate=True, num_ctx=512)
+
+        assert result == [[0.1, 0.2]]
+        payload = mock_post.call_args.kwargs["json"]
+        assert mock_post.call_args.args[0] == "http://localhost:11434/api/embed"
+        assert payload["truncate"] is True
+        assert payload["options"] == {"num_ctx": 512}
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_error(self, mock_post):
+        import requests
+        mock_post.side_effect = requests.exceptions.ConnectionError("refused")
+        assert embed_with_model("m", "hi").startswith("Embedding error")
+
+
+@patch('ollama_utils.chat.chat_with_model', side_effect=fake_chat)
+@patch('ollama_utils.chat.embed_with_model', side_effect=fake_embed)
+class TestSemanticCache:
+    """Test the SemanticCache class."""
+
+    def test_near_duplicate_hits(self, mock_embed, mock_chat):
+        cache = SemanticCache("embed", threshold=0.9)
+        first = cache.chat("m", ask("how do I reset my password?"))
+        second = cache.chat("m", ask("how can I reset my password"))
+        assert second == first
+        assert mock_chat.call_count == 1
+        assert cache.stats["hits"] == 1 and cache.hit_rate == 0.5
+
+    def test_dissimilar_misses(self, mock_embed, mock_chat):
+        cache = SemanticCache("embed", threshold=0.9)
+        cache.chat("m", ask("how do I reset my password?"))
+        cache.chat("m", ask("what are your opening hours?"))
+        assert mock_chat.call_count == 2
+
+    def test_namespaces_are_separate(self, mock_embed, mock_chat):
+        cache = SemanticCache("embed")
+        cache.chat("a", ask("how do I reset my password?"))
+        assert cache.chat("b", ask("how do I reset my password?")).startswith("b answer")
+
+    def test_ttl_expiry(self, mock_embed, mock_chat):
+        cache = SemanticCache("embed", ttl=10)
+        with patch('ollama_utils.semantic_cache.time.time', return_value=1000):
+            cache.chat("m", ask("how do I reset my password?"))
+        with patch('ollama_utils.semantic_cache.time.time', return_value=1011):
+            cache.chat("m", ask("how do I reset my password?"))
+        assert mock_chat.call_count == 2
+        assert cache.stats["expired"] == 1
+
+    def test_lru_eviction(self, mock_embed, mock_chat):
+        cache = SemanticCache("embed", max_entries=1)
+        cache.chat("m", ask("how do I reset my password?"))
+        cache.chat("m", ask("what are your opening hours?"))
+        cache.chat("m", ask("how do I reset my password?"))
+        assert mock_chat.call_count == 3
+        assert cache.stats["evictions"] == 2
+
+    def test_errors_not_cached(self, mock_embed, mock_chat):
+        mock_chat.side_effect = lambda *a, **kw: "Chat error: down"
+        cache = SemanticCache("embed")
+        cache.chat("m", ask("how do I reset my password?"))
+        assert cache.stats["stores"] == 0
+
+    def test_embed_failure_bypasses_cache(self, mock_embed, mock_chat):
+        mock_embed.side_effect = lambda *a, **kw: "Embedding error: down"
+        cache = SemanticCache("embed")
+        assert cache.chat("m", ask("how do I reset my password?")).startswith("m answer")
+        assert cache.stats["embed_errors"] == 1 and cache.stats["lookups"] == 0
+
+    def test_similarity_histogram_and_hook(self, mock_embed, mock_chat):
+        events = []
+        listener = lambda event, call, info: events.append((event, info))
+        hooks.add_listener(listener)
+        try:
+            cache = SemanticCache("embed")
+            cache.chat("m", ask("how do I reset my password?"))
+            cache.chat("m", ask("how can I reset my password"))
+        finally:
+            hooks.remove_listener(listener)
+        histogram = dict(cache.similarity_histogram())
+        assert histogram[0.95] == 1
+        cache_events = [info for event, info in events if event == "cache"]
+        assert [e["hit"] for e in cache_events] == [False, True]
+
+    def test_earlier_context_in_key(self, mock_embed, mock_chat):
+        cache = SemanticCache("embed")
+        cache.chat("m", ask("how do I reset my password?"))
+        earlier = [{"role": "user", "content": "I use the mobile app"},
+                   {"role": "assistant", "content": "OK"}]
+        cache.chat("m", earlier + ask("how do I reset my password?"))
+        assert mock_chat.call_count == 2
+        cache.chat("m", earlier + ask("how do I reset my password?"))
+        assert mock_chat.call_count == 2
+
+    def test_options_in_key(self, mock_embed, mock_chat):
+        cache = SemanticCache("embed")
+        cache.chat("m", ask("how do I reset my password?"), temperature=0)
+        cache.chat("m", ask("how do I reset my password?"), temperature=1)
+        cache.chat("m", ask("how do I reset my password?"), temperature=0, host="http://b:11434")
+        assert mock_chat.call_count == 2
+
+    def test_model_in_key_with_shared_namespace(self, mock_embed, mock_chat):
+        cache = SemanticCache("embed")
+        cache.chat("a", ask("how do I reset my password?"), namespace="support")
+        assert cache.chat("b", ask("how do I reset my password?"),
+                          namespace="support").startswith("b answer")
+
+    def test_stream_cached_and_replayed(self, mock_embed, mock_chat):
+        cache = SemanticCache("embed")
+        first = cache.chat("m", ask("how do I reset my password?"), stream=True)
+        assert not isinstance(first, str)
+        assert "".join(first) == "m answer to how do I reset my password?"
+        assert cache.stats["stores"] == 1
+
+        second = cache.chat("m", ask("how do I reset my password?"), stream=True)
+        assert not isinstance(second, str)
+        assert list(second) == ["m answer to how do I reset my password?"]
+        assert mock_chat.call_count == 1
+
+    def test_abandoned_stream_not_cached(self, mock_embed, mock_chat):
+        cache = SemanticCache("embed")
+        stream = cache.chat("m", ask("how do I reset my password?"), stream=True)
+        next(stream)
+        stream.close()
+        assert cache.stats["stores"] == 0
+
+    def test_lookup_not_counted_as_request(self, mock_embed, mock_chat):
+        metrics = Metrics().start()
+        try:
+            cache = SemanticCache("embed")
+            cache.lookup("how do I reset my password?", "m")
+        finally:
+            metrics.stop()
+        text = metrics.render()
+        assert 'ollama_client_cache_lookups_total{namespace="m",result="miss"} 1' in text
+        assert "ollama_client_requests_total{" not in text
+        assert "ollama_client_requests_in_flight 0" in text
+
+    def test_many_contexts_share_namespace_limit(self, mock_embed, mock_chat):
+        cache = SemanticCache("embed", max_entries=10, ttl=60)
+        vector = [1.0, 0.0, 0.0]
+        for i in range(2000):
+            cache.store("q", f"a{i}", "m", vector=vector, context=f"c{i}")
+
+        assert list(cache._indexes) == ["m"]
+        index = cache._indexes["m"]
+        assert len(index) == 10 and len(index._context_ids) == 10
+        if index._matrix is not None:
+            assert len(index._matrix) == 64
+        assert cache.lookup("q", "m", vector=vector, context="c1999")[0] == "a1999"
+        assert cache.lookup("q", "m", vector=vector, context="c0")[0] is None
+
+    def test_expired_entries_dropped_on_store(self, mock_embed, mock_chat):
+        cache = SemanticCache("embed", ttl=10)
+        with patch('ollama_utils.semantic_cache.time.time', return_value=1000):
+            for i in range(5):
+                cache.store("q", "a", "m", vector=[1.0, 0.0, 0.0], context=f"c{i}")
+        with patch('ollama_utils.semantic_cache.time.time', return_value=1011):
+            cache.store("q", "a", "m", vector=[1.0, 0.0, 0.0], context="new")
+        assert len(cache._indexes["m"]) == 1
+        assert cache.stats["expired"] == 5
+
+
+@pytest.fixture
+def numpy_index():
+    np = pytest.importorskip("numpy")
+    assert semantic_cache.np is np
+    return _Index(capacity=2)
+
+
+class TestNumpyIndex:
+    """Test the numpy-backed _Index."""
+
+    def test_nearest(self, numpy_index):
+        numpy_index.add([1.0, 0.0], "a", "A", 0)
+        numpy_index.add([0.0, 1.0], "b", "B", 0)
+        slot, score = numpy_index.nearest([0.0, 1.0])
+        assert numpy_index.entries[slot][1] == "B"
+        assert score == pytest.approx(1.0)
+
+    def test_grows_past_capacity(self, numpy_index):
+        for i in range(5):
+            numpy_index.add([1.0, float(i)], str(i), i, 0)
+        assert len(numpy_index._matrix) >= 5
+        slot, _ = numpy_index.nearest([0.0, 1.0])
+        assert numpy_index.entries[slot][1] == 4
+
+    def test_removed_rows_ignored_and_reused(self, numpy_index):
+        first = numpy_index.add([1.0, 0.0], "a", "A", 0)
+        numpy_index.add([0.6, 0.8], "b", "B", 0)
+        numpy_index.remove(first)
+        slot, _ = numpy_index.nearest([1.0, 0.0])
+        assert numpy_index.entries[slot][1] == "B"
+        assert numpy_index.add([0.0, 1.0], "c", "C", 0) == first
+
+    def test_context_filter(self, numpy_index):
+        numpy_index.add([1.0, 0.0], "a", "A", 0, context="x")
+        numpy_index.add([0.6, 0.8], "b", "B", 0, context="y")
+        slot, _ = numpy_index.nearest([1.0, 0.0], context="y")
+        assert numpy_index.entries[slot][1] == "B"
+        assert numpy_index.nearest([1.0, 0.0], context="z") == (None, None)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,140 @@
+"""
+Unit tests for ollama_utils.stopping module.
+"""
+
+import json
+import re
+
+import pytest
+from unittest.mock import Mock, patch
+
+from ollama_utils import stopping
+from ollama_utils.chat import chat_with_model, generate_with_model
+from ollama_utils.stopping import (
+    check, compile_stop, first_json, first_line, max_chars, stop_at
+)
+
+from .conftest import streaming_response
+
+
+@pytest.fixture(autouse=True)
+def clean_stats():
+    stopping.reset_stats()
+    yield
+    stopping.reset_stats()
+
+
+class TestPredicates:
+    """Test the built-in stop predicates."""
+
+    def test_stop_at_regex(self):
+        assert check([stop_at(r"END")], "abc END more") == 7
+        assert check([stop_at(r"END", include=False)], "abc END more") == 4
+        assert check([stop_at(r"END")], "abc EN") is None
+
+    def test_max_chars(self):
+        assert check([max_chars(5)], "abc") is None
+        assert check([max_chars(5)], "abcdefg") == 5
+
+    def test_first_line_skips_leading_newlines(self):
+        assert check([first_line()], "\n\nhello") is None
+        assert check([first_line()], "\n\nhello\nworld") == 7
+
+    def test_first_json(self):
+        predicate = first_json()
+        assert check([predicate], 'Sure: {"a": [1, 2') is None
+        text = 'Sure: {"a": "}"} and more'
+        assert check([predicate], text[:16]) == 16
+
+    def test_callable_returning_bool_or_position(self):
+        assert check([lambda t: "!" in t], "hi!") == 3
+        assert check([lambda t: t.find("!") if "!" in t else None], "hi! there") == 2
+        assert check([lambda t: False], "hi") is None
+
+    def test_compile_stop_forms(self):
+        assert compile_stop(None) == []
+        assert len(compile_stop([10, r"x", re.compile("y"), first_line()])) == 4
+        with pytest.raises(TypeError):
+            compile_stop(1.5)
+        with pytest.raises(TypeError):
+            compile_stop(True)
+
+
+class TestStreamStopping:
+    """Test stop_when in chat_with_model and generate_with_model."""
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_stream_cut_and_connection_closed(self, mock_post):
+        response = streaming_response(["first ", "line\nsecond", " line", " more"])
+        mock_post.return_value = response
+        final = []
+
+        chunks = list(chat_with_model("m", [], stream=True, stop_when=first_line(),
+                                      on_done=final.append, num_predict=100))
+
+        assert "".join(chunks) == "first line"
+        response.close.assert_called_once()
+        # Nothing after the stopping chunk was read
+        assert len(response.read) == 2
+        assert final[0]["done_reason"] == "stop_predicate"
+        assert final[0]["eval_count"] == 2
+        assert final[0]["tokens_saved"] == 98
+        assert stopping.stats["tokens_saved"] == 98
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_non_stream_call_streams_internally(self, mock_post):
+        mock_post.return_value = streaming_response(["a", "b", "c", "d", "e"], key="response")
+
+        assert generate_with_model("m", "p", stop_when=3) == "abc"
+        assert mock_post.call_args.kwargs["json"]["stream"] is True
+        assert "stop_when" not in mock_post.call_args.kwargs["json"].get("options", {})
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_savings_from_average_length(self, mock_post):
+        mock_post.return_value = streaming_response(["x"] * 4, eval_count=40)
+        assert len(chat_with_model("m", [], stream=False, stop_when=100)) == 4
+        assert stopping.stats["stopped"] == 0
+
+        mock_post.return_value = streaming_response(["x"] * 4)
+        final = []
+        chat_with_model("m", [], stop_when=2, on_done=final.append)
+        assert final[0]["tokens_saved"] == 38
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_unknown_savings(self, mock_post):
+        mock_post.return_value = streaming_response(["x"] * 4)
+        final = []
+        chat_with_model("other", [], stop_when=1, on_done=final.append)
+        assert final[0]["tokens_saved"] is None
+        assert stopping.stats["unknown_savings"] == 1
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_predicate_on_final_chunk_is_natural_finish(self, mock_post):
+        response = Mock()
+        response.iter_lines.return_value = [
+            json.dumps({"message": {"content": "done "}}).encode(),
+            json.dumps({"message": {"content": "END"}, "done": True, "eval_count": 2}).encode(),
+        ]
+        mock_post.return_value = response
+        final = []
+        assert chat_with_model("m", [], stop_when=r"END", on_done=final.append) == "done END"
+        assert final[0]["eval_count"] == 2
+        assert "done_reason" not in final[0]
+        assert stopping.stats["stopped"] == 0
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_cut_inside_earlier_chunk(self, mock_post):
+        # Only fires once "answer:" is complete, then cuts before it
+        stop = stop_at(r"\s*answer:", include=False)
+
+        mock_post.return_value = streaming_response(["yes ", "answer", ":", " more"])
+        assert chat_with_model("m", [], stop_when=stop) == "yes"
+
+        mock_post.return_value = streaming_response(["yes ", "answer", ":", " more"])
+        chunks = list(chat_with_model("m", [], stream=True, stop_when=stop))
+        # Already streamed text cannot be taken back
+        assert "".join(chunks) == "yes answer"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
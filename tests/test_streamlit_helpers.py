@@ -0,0 +1,93 @@
+"""
+Unit tests for ollama_utils.streamlit_helpers module.
+"""
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+pytest.importorskip("streamlit")
+
+from ollama_utils import streamlit_helpers  # noqa: E402
+from ollama_utils.history import ConversationStore  # noqa: E402
+
+
+class SessionState(dict):
+    """Dict with attribute access, like st.session_state."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+@pytest.fixture
+def st():
+    fake = MagicMock()
+    fake.session_state = SessionState()
+    fake.chat_input.return_value = None
+    fake.button.return_value = False
+    with patch.object(streamlit_helpers, "st", fake):
+        yield fake
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = ConversationStore(str(tmp_path / "history.db"))
+    yield s
+    s.close()
+
+
+class TestChatUI:
+    """Test the chat_ui function."""
+
+    @patch('ollama_utils.chat.chat_with_model')
+    def test_first_turn_with_empty_store(self, mock_chat, st, store):
+        """Test that a new (empty, so falsy) stored conversation is used, not session state."""
+        st.chat_input.return_value = "Hello"
+        mock_chat.return_value = "Hi there"
+
+        streamlit_helpers.chat_ui("llama3.2", streaming=False, context_budget=False,
+                                  store=store, conversation_id="c1")
+
+        assert "messages" not in st.session_state
+        assert [m["content"] for m in store.conversation("c1").messages()] == ["Hello", "Hi there"]
+        sent = mock_chat.call_args[0][1]
+        assert [m["content"] for m in sent] == ["Hello"]
+
+    def test_clear_with_empty_store(self, st, store):
+        """Test that clearing an empty stored conversation does not touch session state."""
+        st.button.return_value = True
+
+        streamlit_helpers.chat_ui("llama3.2", store=store, conversation_id="c1")
+
+        assert "messages" not in st.session_state
+        assert len(store.conversation("c1")) == 0
+        st.rerun.assert_called_once()
+
+    @patch('ollama_utils.chat.chat_with_model', return_value="Hi there")
+    def test_compactor_gets_session_conversation_id(self, mock_chat, st):
+        """Test that session-state chats pass a per-session id to a shared compactor."""
+        compactor = MagicMock()
+        compactor.compact.side_effect = lambda model, messages, conversation_id: messages
+        compactor.stats = {"turns": 0}
+        st.chat_input.return_value = "Hello"
+
+        streamlit_helpers.chat_ui("llama3.2", streaming=False, context_budget=False,
+                                  compactor=compactor)
+        streamlit_helpers.chat_ui("llama3.2", streaming=False, context_budget=False,
+                                  compactor=compactor)
+        first, second = [c.args[2] for c in compactor.compact.call_args_list]
+        assert first is not None and first == second
+
+        st.session_state.clear()
+        streamlit_helpers.chat_ui("llama3.2", streaming=False, context_budget=False,
+                                  compactor=compactor)
+        assert compactor.compact.call_args.args[2] not in (None, first)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,134 @@
+"""
+Unit tests for ollama_utils.structured module.
+"""
+
+import json
+
+import pytest
+from unittest.mock import Mock, patch
+
+from ollama_utils.structured import (
+    JSONStreamParser,
+    SchemaViolation,
+    StructuredOutputError,
+    chat_json,
+    items,
+    stream_json,
+)
+
+DOC = '{"title": "Fruits", "items": [{"name": "apple", "n": 3}, {"name": "kiwi", "n": 10}], "ok": true}'
+
+
+def pieces(text, size=3):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class TestJSONStreamParser:
+    """Test the JSONStreamParser class."""
+
+    def test_root_matches_json_loads(self):
+        """Test that arbitrary chunking reconstructs the document."""
+        for size in (1, 2, 5, 100):
+            parser = JSONStreamParser()
+            for piece in pieces(DOC, size):
+                parser.feed(piece)
+            parser.close()
+            assert parser.root == json.loads(DOC)
+
+    def test_events_emitted_as_values_close(self):
+        """Test that array elements are available before the document ends."""
+        parser = JSONStreamParser()
+        events = parser.feed('{"items": [{"name": "apple"}, {"na')
+
+        assert ((), None) not in events
+        assert (("items", 0), {"name": "apple"}) in events
+        assert (("items", 0, "name"), "apple") in events
+
+    def test_number_completes_on_delimiter(self):
+        """Test that a number is only emitted once its token has ended."""
+        parser = JSONStreamParser()
+        assert parser.feed("[12") == []
+        assert parser.feed("3,") == [((0,), 123)]
+        assert parser.feed("4]")[-1] == ((), [123, 4])
+
+    def test_escapes_and_unicode(self):
+        """Test string escapes split across chunks."""
+        parser = JSONStreamParser()
+        parser.feed('["a\\')
+        parser.feed('"b\\u00e9"]')
+        assert parser.close() == []
+        assert parser.root == ['a"bé']
+
+    @pytest.mark.parametrize("text", ['{"a" 1}', '[1,]', '{"a": }', '[1] 2', '{"a": 1'])
+    def test_malformed(self, text):
+        """Test that malformed JSON raises StructuredOutputError."""
+        parser = JSONStreamParser()
+        with pytest.raises(StructuredOutputError):
+            parser.feed(text)
+            parser.close()
+
+    def test_schema_violation_on_open(self):
+        """Test that a wrong container type is rejected when it opens."""
+        parser = JSONStreamParser({"type": "object", "properties": {"items": {"type": "array"}}})
+        with pytest.raises(SchemaViolation, match=r"\$\.items"):
+            parser.feed('{"items": {')
+
+    def test_schema_violation_on_unknown_key(self):
+        """Test that a disallowed key is rejected as soon as it is read."""
+        parser = JSONStreamParser({"type": "object", "properties": {}, "additionalProperties": False})
+        with pytest.raises(SchemaViolation, match="unexpected property 'x'"):
+            parser.feed('{"x":')
+
+    def test_schema_violation_on_item(self):
+        """Test that a bad array element is rejected when it closes."""
+        schema = {"type": "array", "items": {"type": "integer"}}
+        parser = JSONStreamParser(schema)
+        parser.feed("[1, 2, ")
+        with pytest.raises(SchemaViolation, match=r"\$\[2\]"):
+            parser.feed('"three"')
+
+
+class TestStreamJson:
+    """Test stream_json and chat_json."""
+
+    def test_violation_closes_source(self):
+        """Test that the source stream is closed on early abort."""
+        source = Mock()
+        source.__iter__ = Mock(return_value=iter(['[1, "x"', ', 3]']))
+
+        with pytest.raises(SchemaViolation):
+            list(stream_json(source, {"type": "array", "items": {"type": "integer"}}))
+        source.close.assert_called_once()
+
+    def test_items_helper(self):
+        """Test filtering events to the elements of one array."""
+        events = stream_json(pieces(DOC))
+        assert [i["name"] for i in items(events, ("items",))] == ["apple", "kiwi"]
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_chat_json_sends_format(self, mock_post):
+        """Test that chat_json requests structured output and parses the stream."""
+        mock_response = Mock()
+        mock_response.iter_lines.return_value = [
+            json.dumps({"message": {"content": p}}).encode() for p in pieces('{"a": [1, 2]}')
+        ]
+        mock_post.return_value = mock_response
+        schema = {"type": "object"}
+
+        events = list(chat_json("llama3.2:latest", [{"role": "user", "content": "hi"}], schema))
+
+        assert events[-1] == ((), {"a": [1, 2]})
+        assert mock_post.call_args[1]["json"]["format"] == schema
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_chat_json_request_error(self, mock_post):
+        """Test that a failed request raises instead of parsing the error text."""
+        import requests
+        mock_post.side_effect = requests.exceptions.RequestException("Connection failed")
+
+        with pytest.raises(StructuredOutputError, match="Connection failed"):
+            chat_json("llama3.2:latest", [])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,212 @@
+"""
+Unit tests for ollama_utils.tools module.
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from unittest.mock import Mock, patch
+
+from ollama_utils.chat import chat_with_model
+from ollama_utils.tools import Tool, ToolExecutor, tool
+
+
+def _call(name, **arguments):
+    return {"function": {"name": name, "arguments": arguments}}
+
+
+def scripted_chat(*replies):
+    """Fake chat_with_model returning one assistant message per round."""
+    sent = []
+
+    def fake(model_name, messages, tools=None, on_done=None, **kwargs):
+        sent.append(list(messages))
+        message = replies[len(sent) - 1]
+        on_done({"done": True, "message": message})
+        return message.get("content", "")
+    return fake, sent
+
+
+class TestTool:
+    """Test tool definitions."""
+
+    def test_spec_from_signature(self):
+        @tool
+        def weather(city: str, days: int = 1):
+            """Get the weather forecast.
+
+            More detail."""
+        spec = weather.spec()["function"]
+        assert spec["name"] == "weather"
+        assert spec["description"] == "Get the weather forecast."
+        assert spec["parameters"]["properties"] == {"city": {"type": "string"},
+                                                    "days": {"type": "integer"}}
+        assert spec["parameters"]["required"] == ["city"]
+
+    def test_decorator_options(self):
+        @tool(timeout=2, idempotent=True, name="lookup")
+        def f(x):
+            return x
+        assert isinstance(f, Tool)
+        assert f.name == "lookup" and f.timeout == 2 and f.idempotent
+
+
+class TestRunCalls:
+    """Test concurrent tool execution."""
+
+    def test_calls_run_concurrently(self):
+        barrier = threading.Barrier(3, timeout=2)
+
+        def slow(n: int):
+            barrier.wait()
+            return n * 2
+
+        executor = ToolExecutor([slow])
+        started = time.perf_counter()
+        results = executor.run_calls([_call("slow", n=i) for i in range(3)])
+        assert time.perf_counter() - started < 2
+        assert [r["content"] for r in results] == ["0", "2", "4"]
+        assert results[0] == {"role": "tool", "tool_name": "slow", "content": "0"}
+
+    def test_timeout_reported_to_model(self):
+        def hang():
+            time.sleep(0.5)
+        executor = ToolExecutor([Tool(hang, timeout=0.05)])
+        [result] = executor.run_calls([_call("hang")])
+        assert "timed out" in result["content"]
+        assert executor.stats["timeouts"] == 1
+
+    def test_errors_and_unknown_tools(self):
+        def boom():
+            raise ValueError("bad input")
+        executor = ToolExecutor([boom])
+        results = executor.run_calls([_call("boom"), _call("missing")])
+        assert results[0]["content"] == "Tool error: bad input"
+        assert "unknown tool" in results[1]["content"]
+        assert executor.stats["errors"] == 2
+
+    def test_idempotent_results_cached(self):
+        calls = []
+
+        @tool(idempotent=True)
+        def lookup(key: str):
+            calls.append(key)
+            return {"value": key.upper()}
+
+        executor = ToolExecutor([lookup])
+        executor.run_calls([_call("lookup", key="a")])
+        [result] = executor.run_calls([_call("lookup", key="a")])
+        assert calls == ["a"]
+        assert json.loads(result["content"]) == {"value": "A"}
+        assert executor.stats["cache_hits"] == 1
+
+    def test_string_arguments(self):
+        def echo(text: str):
+            return text
+        executor = ToolExecutor([echo])
+        [result] = executor.run_calls([{"function": {"name": "echo",
+                                                     "arguments": '{"text": "hi"}'}}])
+        assert result["content"] == "hi"
+
+    def test_async_tools(self):
+        async def add(a: int, b: int):
+            await asyncio.sleep(0)
+            return a + b
+
+        executor = ToolExecutor([add])
+        assert executor.run_calls([_call("add", a=1, b=2)])[0]["content"] == "3"
+        results = asyncio.run(executor.arun_calls([_call("add", a=2, b=2)]))
+        assert results[0]["content"] == "4"
+
+    def test_bad_arguments_reported_to_model(self):
+        async def add(a: int, b: int):
+            return a + b
+
+        def echo(text: str):
+            return text
+
+        executor = ToolExecutor([add, echo])
+        calls = [_call("add", a=1), _call("add", a=1, b=2, c=3),
+                 {"function": {"name": "add", "arguments": [1, 2]}},
+                 {"function": {"name": "echo", "arguments": ["hi"]}},
+                 _call("echo", text="ok")]
+
+        results = executor.run_calls(calls)
+        assert [r["content"].startswith("Tool error:") for r in results] == [True] * 4 + [False]
+        assert results[4]["content"] == "ok"
+
+        results = asyncio.run(executor.arun_calls(calls))
+        assert [r["content"].startswith("Tool error:") for r in results] == [True] * 4 + [False]
+        assert executor.stats["errors"] == 8
+
+    def test_sync_tool_arguments_checked_before_submit(self):
+        def echo(text: str):
+            return text
+
+        executor = ToolExecutor([echo])
+        result = executor.run_calls([_call("echo", wrong=1)])[0]
+        assert result["content"].startswith("Tool error:")
+        assert executor._pool is None
+
+
+class TestChat:
+    """Test the tool-calling loop."""
+
+    def test_loop_feeds_results_back(self):
+        def add(a: int, b: int):
+            return a + b
+
+        fake, sent = scripted_chat(
+            {"role": "assistant", "content": "",
+             "tool_calls": [_call("add", a=1, b=2), _call("add", a=3, b=4)]},
+            {"role": "assistant", "content": "3 and 7"})
+        executor = ToolExecutor([add])
+        messages = [{"role": "user", "content": "add"}]
+        with patch('ollama_utils.chat.chat_with_model', side_effect=fake):
+            result = executor.chat("m", messages)
+
+        assert result.content == "3 and 7"
+        assert result.rounds == 2
+        assert [m["content"] for m in sent[1][2:]] == ["3", "7"]
+        assert len(messages) == 1
+        assert executor.stats["tool_calls"] == 2
+
+    def test_request_error(self):
+        executor = ToolExecutor([])
+        with patch('ollama_utils.chat.chat_with_model', return_value="Chat error: down"):
+            result = executor.chat("m", [])
+        assert result.content == "Chat error: down"
+        assert result.data is None
+
+    def test_achat(self):
+        fake, _ = scripted_chat({"role": "assistant", "content": "hi"})
+        with patch('ollama_utils.chat.chat_with_model', side_effect=fake):
+            result = asyncio.run(ToolExecutor([]).achat("m", []))
+        assert result.content == "hi"
+
+
+class TestChatTools:
+    """Test tools support in chat_with_model."""
+
+    @patch('ollama_utils.chat.requests.post')
+    def test_tools_sent_top_level_and_streamed_calls_collected(self, mock_post):
+        call = _call("f", x=1)
+        lines = [json.dumps({"message": {"content": "", "tool_calls": [call]}, "done": False}),
+                 json.dumps({"message": {"content": ""}, "done": True})]
+        mock_response = Mock()
+        mock_response.iter_lines.return_value = [l.encode() for l in lines]
+        mock_post.return_value = mock_response
+        final = []
+
+        list(chat_with_model("m", [], stream=True, tools=[{"type": "function"}],
+                             on_done=final.append))
+
+        assert mock_post.call_args.kwargs["json"]["tools"] == [{"type": "function"}]
+        assert final[0]["message"]["tool_calls"] == [call]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
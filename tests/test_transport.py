@@ -0,0 +1,164 @@
+"""
+Unit tests for ollama_utils.transport module.
+"""
+
+import json
+import os
+import socketserver
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from unittest.mock import Mock, patch
+
+from ollama_utils import transport
+from ollama_utils.chat import chat_with_model
+from ollama_utils.models import list_models
+from ollama_utils.transport import (
+    HTTPTransport,
+    UnixSocketTransport,
+    get_transport,
+    resolve_host,
+    use_transport,
+)
+
+
+class TestResolveHost:
+    """Test the resolve_host function."""
+
+    @pytest.mark.parametrize("host, expected", [
+        (None, "http://localhost:11434"),
+        ("example.com", "http://example.com:11434"),
+        ("10.0.0.5:8080", "http://10.0.0.5:8080"),
+        ("https://ollama.example.com", "https://ollama.example.com:443"),
+        ("http://gpu-a:11434/", "http://gpu-a:11434"),
+        ("unix:///run/ollama.sock", "unix:///run/ollama.sock"),
+    ])
+    def test_forms(self, host, expected, monkeypatch):
+        monkeypatch.delenv("OLLAMA_HOST", raising=False)
+        assert resolve_host(host) == expected
+
+    def test_environment(self, monkeypatch):
+        """Test that OLLAMA_HOST is honoured when no host is given."""
+        monkeypatch.setenv("OLLAMA_HOST", "0.0.0.0:9999")
+        assert resolve_host() == "http://0.0.0.0:9999"
+
+
+class TestGetTransport:
+    """Test transport selection."""
+
+    def test_cached_per_host(self):
+        """Test that transports are created once per host."""
+        t = get_transport("http://gpu-a:11434")
+        assert isinstance(t, HTTPTransport)
+        assert get_transport("gpu-a") is t
+        assert isinstance(get_transport("unix:///tmp/x.sock"), UnixSocketTransport)
+
+    def test_override(self):
+        """Test that use_transport routes every host through one transport, keeping the host."""
+        fake = Mock()
+        fake.get.return_value.json.return_value = {"models": [{"name": "m"}]}
+
+        with use_transport(fake):
+            assert list_models(host="http://elsewhere:1") == [{"name": "m"}]
+            assert list_models(host="http://other:2") == [{"name": "m"}]
+        assert [c[0][0] for c in fake.get.call_args_list] == [
+            "http://elsewhere:1/api/tags", "http://other:2/api/tags"]
+        assert transport._overrides == {}
+
+    def test_override_per_host(self):
+        """Test that an override for one host leaves the others alone."""
+        fake = Mock()
+        fake.url.side_effect = lambda path: "fake://" + path
+
+        with use_transport(fake, host="gpu-a"):
+            assert get_transport("http://gpu-a:11434") is fake
+            assert isinstance(get_transport("gpu-b"), HTTPTransport)
+        assert get_transport("gpu-a") is not fake
+
+    @patch('ollama_utils.transport.requests.post')
+    def test_host_argument(self, mock_post, monkeypatch):
+        """Test that chat_with_model sends to the requested host."""
+        monkeypatch.delenv("OLLAMA_HOST", raising=False)
+        mock_post.return_value.json.return_value = {"message": {"content": "hi"}}
+
+        chat_with_model("m", [], host="gpu-b")
+
+        assert mock_post.call_args[0][0] == "http://gpu-b:11434/api/chat"
+
+
+class TestConnectionPooling:
+    """Test keep-alive reuse over TCP."""
+
+    def test_session_reused(self, monkeypatch):
+        """Test that consecutive requests to one host share a connection."""
+        monkeypatch.setattr(transport, "POOL_CONNECTIONS", True)
+        peers = []
+
+        class Handler(_Handler):
+            def do_POST(self):
+                peers.append(self.client_address)
+                super().do_POST()
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            host = f"http://127.0.0.1:{server.server_address[1]}"
+            assert isinstance(get_transport(host).session, requests.Session)
+            assert chat_with_model("m1", [], host=host) == "echo m1"
+            assert chat_with_model("m2", [], host=host) == "echo m2"
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert len(peers) == 2 and peers[0] == peers[1]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def address_string(self):
+        return "unix"
+
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        request = json.loads(self.rfile.read(length))
+        body = json.dumps({"message": {"content": "echo " + request["model"]},
+                           "done": True}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("unix", 0)
+
+
+@pytest.mark.skipif(not hasattr(socketserver, "UnixStreamServer"), reason="no Unix sockets")
+class TestUnixSocketTransport:
+    """Test requests over a real Unix domain socket."""
+
+    def test_chat_over_unix_socket(self):
+        path = os.path.join(tempfile.mkdtemp(), "ollama.sock")
+        server = _Server(path, _Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            host = f"unix://{path}"
+            assert chat_with_model("m1", [], host=host) == "echo m1"
+            assert chat_with_model("m2", [], host=host) == "echo m2"
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])